@@ -2,44 +2,81 @@ import threading
 import queue
 import os
 import json
-from typing import Any, Dict, Optional
-from utils.llm_client import get_llm_client
-from utils.brave_client import BraveSearchClient
-from utils.logger import setup_logger
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
+from utils.llm_client import CANCELLED_RESPONSE, BaseLLMClient, get_llm_client
+from utils.llm_router import get_llm_router
+from utils.brave_client import get_search_client
+from utils.cancellation import CancellationToken, bind_token, current_token, put_unless_cancelled
+from utils.circuit_breaker import get_breaker
+from utils.json_stream import JSONFieldStream
+from utils.logger import setup_logger, bind_run, current_run_id
 
 logger = setup_logger("BaseAgent")
 
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+@lru_cache(maxsize=None)
+def load_prompt(filename: str) -> str:
+    """
+    Reads a prompt template once per process; every agent of a type shares it.
+    """
+    path = os.path.join(PROMPTS_DIR, filename)
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        logger.error(f"Prompt file not found: {path}")
+        return ""
+
 class BaseAgent(threading.Thread):
-    def __init__(self, input_queue: queue.Queue, output_queue: queue.Queue, prompt_file: str):
+    def __init__(self, input_queue: queue.Queue, output_queue: queue.Queue, prompt_file: str,
+                 cancel_token: Optional[CancellationToken] = None, budget=None, passed_steps=None):
         super().__init__()
         self.input_queue = input_queue
         self.output_queue = output_queue
+        # Shared, lazily built clients and templates
         self.llm_client = get_llm_client()
-        self.search_client = BraveSearchClient()
-        self.prompt_template = self._load_prompt(prompt_file)
+        self.search_client = get_search_client()
+        # Per-task clients, concurrency limits and stats
+        self.llm_router = get_llm_router()
+        self.prompt_template = load_prompt(prompt_file)
         self.running = True
+        # Agents log under the run of the thread that created them
+        self.log_run_id = current_run_id()
+        # Cancelling the run stops the loop, drops work in progress and aborts LLM calls
+        self.cancel_token = cancel_token or current_token()
+        # Optional per-trip BudgetGovernor (core/budget.py)
+        self.budget = budget
+        # Driving-horizon mode: steps the car has already passed (core/horizon.py)
+        self.passed_steps = passed_steps
 
-    def _load_prompt(self, filename: str) -> str:
-        path = os.path.join("agents", "prompts", filename)
-        try:
-            with open(path, 'r') as f:
-                return f.read()
-        except FileNotFoundError:
-            logger.error(f"Prompt file not found: {path}")
-            return ""
+    @property
+    def active(self) -> bool:
+        return self.running and not self.cancel_token.cancelled
+
+    def stop(self):
+        """
+        Stops after the current item (or within a second when idle).
+        """
+        self.running = False
 
     def run(self):
+        bind_run(self.log_run_id)
+        # Shared clients find the token through the thread (see utils/cancellation.py)
+        bind_token(self.cancel_token)
         logger.info(f"{self.__class__.__name__} started.")
-        while self.running:
+        while self.active:
             try:
-                # Timeout allows checking self.running periodically
+                # Timeout allows checking self.active periodically
                 item = self.input_queue.get(timeout=1)
                 if item is None: # Sentinel to stop
                     break
                 
                 result = self.process(item)
-                if result:
-                    self.output_queue.put(result)
+                if result and self.active:
+                    put_unless_cancelled(self.output_queue, result, self.cancel_token)
                 
                 self.input_queue.task_done()
             except queue.Empty:
@@ -74,3 +111,75 @@ class BaseAgent(threading.Thread):
         except json.JSONDecodeError:
             logger.error(f"Failed to parse JSON response: {response}")
             return {}
+
+    def _stream_json_response(self, prompt: str, task: str, cache_only: bool = False) -> JSONFieldStream:
+        """
+        Streams the LLM response through an incremental JSON parser, so
+        callers can act on a field as soon as it is complete.
+        `task` is the call's class (utils/llm_router.py), which picks the
+        client, concurrency limit and stats it is reported under.
+        With cache_only the model is never called; a cache miss is an empty stream.
+        The same happens while the LLM circuit breaker is open, so callers fall
+        back at once instead of waiting on a dependency that is down.
+        """
+        client = self.llm_router.client(task) or self.llm_client
+        # Cached responses are served without counting towards the budget or the breaker
+        cached = client.cached_text(prompt)
+        if cached is not None or cache_only:
+            if cached is not None:
+                self.llm_router.record_cached(task)
+            return JSONFieldStream(iter([cached] if cached is not None else []))
+        return JSONFieldStream(self._call(client, prompt, task))
+
+    def _cache_fields(self, prompt: str, task: str, fields: Dict[str, Any]):
+        """
+        Caches `fields` as the response to `prompt`, for a stream that is closed
+        as soon as they are complete (a cut-off response is never cached). A re-run
+        then reuses the same answer instead of asking the model for a new one,
+        which would also miss every cache keyed on it (searches, follow-up prompts).
+        """
+        client = self.llm_router.client(task) or self.llm_client
+        if client.cached_text(prompt) is None:
+            client.store_text(prompt, json.dumps(fields))
+
+    def _call(self, client: BaseLLMClient, prompt: str, task: str) -> Iterator[str]:
+        # Nothing happens until the stream is first read; from then on the
+        # call's outcome goes to the breaker, the tier stats and the budget.
+        # Clients signal failures with an "Error..." response rather than raising.
+        breaker = get_breaker("llm", self.llm_router.provider(task))
+        if not breaker.allow():
+            logger.warning(f"{self.__class__.__name__}: LLM circuit open, using fallback")
+            return
+        if not self.llm_router.acquire(task, self.cancel_token):
+            breaker.release()
+            return
+        if self.budget:
+            self.budget.record_call(prompt)
+
+        started = time.monotonic()
+        error = None
+        read = 0
+        chunks = client.stream_text(prompt)
+        try:
+            for chunk in chunks:
+                if error is None and chunk:
+                    error = chunk if chunk.startswith("Error") else ""
+                read += len(chunk)
+                yield chunk
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            chunks.close()
+            self.llm_router.release(task)
+            if self.budget:
+                # Counts what was actually read, also when the stream is closed early
+                self.budget.record_output(read)
+            if error is None or error == CANCELLED_RESPONSE or self.cancel_token.cancelled:
+                breaker.release()
+            else:
+                self.llm_router.record(task, time.monotonic() - started, len(prompt), read, error=bool(error))
+                if error:
+                    breaker.record_failure(error)
+                else:
+                    breaker.record_success()
@@ -1,39 +1,80 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from agents.base_agent import BaseAgent
+from core.budget import Tier
 from models.content import ContentCandidate
 from models.step import RouteStep
-from utils.logger import setup_logger
+from utils.llm_router import QUERY, SELECT
+from utils.logger import setup_logger, STEP_LOG
 
 logger = setup_logger("ContentAgents")
 
 class ContentAgent(BaseAgent):
-    def process(self, step: RouteStep) -> tuple[str, ContentCandidate]:
-        location = step.address if step.address else f"{step.end_location['lat']},{step.end_location['lng']}"
+    # Set by subclasses: candidate type, and the search used when the LLM budget is spent
+    CONTENT_TYPE = ""
+    SEARCH_TOPIC = ""
+
+    def process(self, step: RouteStep) -> Optional[tuple[str, ContentCandidate]]:
+        if self.passed_steps and step.id in self.passed_steps:
+            # The car is past this step; hand the judge a placeholder instead of calling the LLM
+            return (step.id, self._create_candidate({}))
+        
+        location = step.location
         instruction = step.instruction
+        tier = self.budget.tier(step.id) if self.budget else Tier.FULL
         
         # 1. Initial Prompt
         prompt = self.prompt_template.replace("{{location}}", str(location))
         prompt = prompt.replace("{{instruction}}", instruction)
         
-        response = self.llm_client.generate_text(prompt)
-        data = self._parse_json_response(response)
+        stream = self._stream_json_response(prompt, QUERY, cache_only=tier >= Tier.CACHE_ONLY)
+        query = stream.wait_for("search_query")
+        if self.cancel_token.cancelled:
+            stream.close()
+            return None
+        if query is not None:
+            # Search as soon as the query field is complete; the rest of the response is not needed
+            self._cache_fields(prompt, QUERY, {"search_query": query})
+        elif tier >= Tier.CACHE_ONLY and not stream.parser.text:
+            # Not cached and no LLM budget left: search for the place directly
+            query = f"{self.SEARCH_TOPIC} {location}"
+            self.budget.note("cache_only")
         
         # 2. Handle Search if needed
-        if "search_query" in data:
-            query = data["search_query"]
-            logger.info(f"{self.__class__.__name__} searching for: {query}")
+        if query is not None:
+            stream.close()
+            logger.info(f"{self.__class__.__name__} searching for: {query}", extra=STEP_LOG)
             
             results = self._perform_search(query)
+            if self.cancel_token.cancelled:
+                return None
             
             # 3. Follow-up Prompt with results
             results_str = "\n".join([f"- {r['title']}: {r['description']} ({r['url']})" for r in results])
             follow_up_prompt = f"{prompt}\n\nSearch Results:\n{results_str}\n\nNow select the best option based on these results."
             
-            response = self.llm_client.generate_text(follow_up_prompt)
-            data = self._parse_json_response(response)
+            if tier >= Tier.NO_FOLLOWUP:
+                # A cached follow-up is free; otherwise take the top search result
+                data = self._stream_json_response(follow_up_prompt, SELECT, cache_only=True).finish()
+                if not data:
+                    self.budget.note("no_followup")
+                    return (step.id, self._candidate_from_result(results[0] if results else None))
+            else:
+                data = self._stream_json_response(follow_up_prompt, SELECT).finish()
+        else:
+            data = stream.finish()
             
         return (step.id, self._create_candidate(data))
 
+    def _candidate_from_result(self, result: Optional[Dict[str, str]]) -> ContentCandidate:
+        result = result or {}
+        return ContentCandidate(
+            type=self.CONTENT_TYPE,
+            title=result.get("title", ""),
+            description=result.get("description", ""),
+            url=result.get("url") or None,
+            reasoning="Top search result (LLM budget spent)."
+        )
+
     def _perform_search(self, query: str) -> List[Dict[str, str]]:
         raise NotImplementedError
 
@@ -41,8 +82,11 @@ class ContentAgent(BaseAgent):
         raise NotImplementedError
 
 class YouTubeAgent(ContentAgent):
-    def __init__(self, input_queue, output_queue):
-        super().__init__(input_queue, output_queue, "youtube_agent.md")
+    CONTENT_TYPE = "video"
+    SEARCH_TOPIC = "road trip video"
+
+    def __init__(self, input_queue, output_queue, **kwargs):
+        super().__init__(input_queue, output_queue, "youtube_agent.md", **kwargs)
 
     def _perform_search(self, query: str) -> List[Dict[str, str]]:
         return self.search_client.search_videos(query)
@@ -58,8 +102,11 @@ class YouTubeAgent(ContentAgent):
         )
 
 class MusicAgent(ContentAgent):
-    def __init__(self, input_queue, output_queue):
-        super().__init__(input_queue, output_queue, "music_agent.md")
+    CONTENT_TYPE = "music"
+    SEARCH_TOPIC = "song about"
+
+    def __init__(self, input_queue, output_queue, **kwargs):
+        super().__init__(input_queue, output_queue, "music_agent.md", **kwargs)
 
     def _perform_search(self, query: str) -> List[Dict[str, str]]:
         return self.search_client.search_web(query)
@@ -75,8 +122,11 @@ class MusicAgent(ContentAgent):
         )
 
 class HistoryAgent(ContentAgent):
-    def __init__(self, input_queue, output_queue):
-        super().__init__(input_queue, output_queue, "history_agent.md")
+    CONTENT_TYPE = "history"
+    SEARCH_TOPIC = "history of"
+
+    def __init__(self, input_queue, output_queue, **kwargs):
+        super().__init__(input_queue, output_queue, "history_agent.md", **kwargs)
 
     def _perform_search(self, query: str) -> List[Dict[str, str]]:
         return self.search_client.search_web(query)
@@ -1,32 +1,59 @@
 import queue
-from typing import Dict, Any
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
 from agents.base_agent import BaseAgent
-from models.content import ContentCandidate, SelectedContent
-from utils.logger import setup_logger
+from agents.judge_rules import JudgeRule, apply_rules, heuristic_choice
+from core.budget import Tier
+from utils.cancellation import bind_token, put_unless_cancelled
+from config import Config
+from core.router import ALL_TYPES, AgentRouter, StepDispatch
+from models.content import ContentCandidate, SelectedContent, SkippedStep
+from models.step import RouteStep
+from utils.llm_router import JUDGE
+from utils.logger import setup_logger, bind_run, STEP_LOG
 
 logger = setup_logger("JudgeAgent")
 
 class JudgeAgent(BaseAgent):
-    def __init__(self, input_queue, output_queue):
-        super().__init__(input_queue, output_queue, "judge_agent.md")
+    def __init__(self, input_queue, output_queue, router: Optional[AgentRouter] = None,
+                 rules: Optional[List[JudgeRule]] = None, **kwargs):
+        super().__init__(input_queue, output_queue, "judge_agent.md", **kwargs)
         self.buffer: Dict[str, Dict[str, ContentCandidate]] = {}
+        # Which agent types were asked for each step (from the orchestrator's StepDispatch)
+        self.expected: Dict[str, Tuple[str, ...]] = {}
+        self.steps: Dict[str, RouteStep] = {}
+        self.router = router
+        # Deterministic pre-scorer; None means the default rules (see judge_rules.py)
+        self.rules = rules if Config.JUDGE_RULES_ENABLED else []
+        # How each step was decided ("llm", "routing", "rule:<name>")
+        self.decisions: Counter = Counter()
 
     def run(self):
         # Override run to handle buffering logic
+        bind_run(self.log_run_id)
+        bind_token(self.cancel_token)
         logger.info(f"{self.__class__.__name__} started.")
-        while self.running:
+        while self.active:
             try:
                 item = self.input_queue.get(timeout=1)
                 if item is None:
                     break
                 
+                if isinstance(item, StepDispatch):
+                    self.expected[item.step.id] = item.agent_types
+                    self.steps[item.step.id] = item.step
+                    self.input_queue.task_done()
+                    continue
+                
                 step_id, candidate = item
                 self._add_to_buffer(step_id, candidate)
                 
                 if self._is_ready(step_id):
-                    result = self._judge(step_id)
-                    self.output_queue.put(result)
+                    # _judge hands the finished result to the collector itself
+                    self._judge(step_id)
                     del self.buffer[step_id]
+                    self.expected.pop(step_id, None)
+                    self.steps.pop(step_id, None)
                 
                 self.input_queue.task_done()
             except queue.Empty:
@@ -34,20 +61,62 @@ class JudgeAgent(BaseAgent):
             except Exception as e:
                 logger.error(f"Error in JudgeAgent: {e}")
         
-        logger.info(f"{self.__class__.__name__} stopped.")
+        logger.info(f"{self.__class__.__name__} stopped. Decisions: {dict(self.decisions)}")
 
     def _add_to_buffer(self, step_id: str, candidate: ContentCandidate):
         if step_id not in self.buffer:
             self.buffer[step_id] = {}
         self.buffer[step_id][candidate.type] = candidate
-        logger.info(f"Judge received {candidate.type} for {step_id}. Have {len(self.buffer[step_id])}/3.")
+        expected = len(self.expected.get(step_id, ALL_TYPES))
+        logger.info(f"Judge received {candidate.type} for {step_id}. Have {len(self.buffer[step_id])}/{expected}.", extra=STEP_LOG)
 
     def _is_ready(self, step_id: str) -> bool:
-        # We expect 3 types: video, music, history
-        return len(self.buffer[step_id]) == 3
+        # All three types unless the router asked fewer agents for this step
+        return len(self.buffer[step_id]) >= len(self.expected.get(step_id, ALL_TYPES))
 
-    def _judge(self, step_id: str) -> SelectedContent:
+    def _judge(self, step_id: str) -> Optional[SelectedContent]:
         candidates = self.buffer[step_id]
+        if self.cancel_token.cancelled:
+            return None
+        if self.passed_steps and step_id in self.passed_steps:
+            put_unless_cancelled(self.output_queue, SkippedStep(step_id, "passed while queued"), self.cancel_token)
+            return None
+        
+        if len(candidates) == 1:
+            # Only one agent ran for this step; nothing to compare, so no LLM call
+            candidate = next(iter(candidates.values()))
+            result = SelectedContent(
+                step_id=step_id,
+                chosen_candidate=candidate,
+                judge_reasoning=f"Only the {candidate.type} agent ran for this step (adaptive routing).",
+                decided_by="routing"
+            )
+            return self._emit(result)
+        
+        # Obvious cases (e.g. other agents failed) are settled without the LLM.
+        # These reflect failures, not preferences, so the router does not learn from them.
+        decision = apply_rules(candidates, self.rules)
+        if decision:
+            logger.info(f"Judge rule '{decision.rule}' picked {decision.selected_type} for {step_id}", extra=STEP_LOG)
+            result = SelectedContent(
+                step_id=step_id,
+                chosen_candidate=candidates[decision.selected_type],
+                judge_reasoning=decision.reasoning,
+                decided_by=f"rule:{decision.rule}"
+            )
+            return self._emit(result)
+        
+        # LLM budget spent: pick heuristically instead of asking the model
+        if self.budget and self.budget.tier(step_id) >= Tier.HEURISTIC_JUDGE:
+            decision = heuristic_choice(candidates)
+            self.budget.note("heuristic_judge")
+            result = SelectedContent(
+                step_id=step_id,
+                chosen_candidate=candidates[decision.selected_type],
+                judge_reasoning=decision.reasoning,
+                decided_by="budget"
+            )
+            return self._emit(result)
         
         # Construct prompt
         # We need location/instruction. But Judge doesn't have RouteStep directly.
@@ -69,25 +138,41 @@ class JudgeAgent(BaseAgent):
         prompt = self.prompt_template.replace("{{location}}", "Current Step Location")
         prompt = prompt.replace("{{instruction}}", "Follow route instructions")
         
-        prompt = prompt.replace("{{video_candidate}}", f"{candidates['video'].title}: {candidates['video'].description}")
-        prompt = prompt.replace("{{music_candidate}}", f"{candidates['music'].title}: {candidates['music'].description}")
-        prompt = prompt.replace("{{history_candidate}}", f"{candidates['history'].title}: {candidates['history'].description}")
+        for agent_type in ALL_TYPES:
+            candidate = candidates.get(agent_type)
+            text = f"{candidate.title}: {candidate.description}" if candidate else "Not available for this step."
+            prompt = prompt.replace(f"{{{{{agent_type}_candidate}}}}", text)
         
-        response = self.llm_client.generate_text(prompt)
-        data = self._parse_json_response(response)
-        
-        selected_type = data.get("selected_type", "video")
-        reasoning = data.get("reasoning", "")
+        stream = self._stream_json_response(prompt, JUDGE)
+        selected_type = stream.wait_for("selected_type")
+        if self.cancel_token.cancelled:
+            stream.close()
+            return None
         
         # Fallback if LLM returns invalid type
-        if selected_type not in candidates:
-            selected_type = "video"
+        if not isinstance(selected_type, str) or selected_type not in candidates:
+            selected_type = next(t for t in ALL_TYPES if t in candidates)
             
-        return SelectedContent(
+        # The result is complete before it is emitted: the collector and UI keep the object they receive
+        data = stream.finish()
+        result = SelectedContent(
             step_id=step_id,
             chosen_candidate=candidates[selected_type],
-            judge_reasoning=reasoning
+            judge_reasoning=data.get("reasoning", "")
         )
+        self._emit(result)
+        
+        # Only full fan-outs are unbiased evidence for the router
+        if self.router and len(candidates) == len(ALL_TYPES) and step_id in self.steps:
+            self.router.record(self.steps[step_id], selected_type)
+        return result
+
+    def _emit(self, result: SelectedContent) -> SelectedContent:
+        if self.budget:
+            result.budget_tier = self.budget.step_tier(result.step_id).name.lower()
+        self.decisions[result.decided_by] += 1
+        put_unless_cancelled(self.output_queue, result, self.cancel_token)
+        return result
 
     def process(self, data: Any) -> Any:
         # Not used since we override run
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from core.router import ALL_TYPES
+from models.content import ContentCandidate
+
+# Titles ContentAgent._create_candidate falls back to when a response could not be parsed
+PLACEHOLDER_TITLES = {"Unknown Video", "Unknown by Unknown", "Unknown Story"}
+
+
+@dataclass
+class RuleDecision:
+    selected_type: str
+    reasoning: str
+    rule: str
+
+
+# A rule looks at a step's candidates and returns a decision, or None to pass
+JudgeRule = Callable[[Dict[str, ContentCandidate]], Optional[RuleDecision]]
+
+DEFAULT_RULES: List[JudgeRule] = []
+
+
+def register_rule(rule: JudgeRule) -> JudgeRule:
+    """
+    Adds a rule to DEFAULT_RULES (usable as a decorator). Rules run in registration order.
+    """
+    DEFAULT_RULES.append(rule)
+    return rule
+
+
+def is_placeholder(candidate: ContentCandidate) -> bool:
+    return not candidate.title.strip() or candidate.title in PLACEHOLDER_TITLES
+
+
+def has_content(candidate: ContentCandidate) -> bool:
+    """
+    A real title and description; videos also need a URL to be worth showing.
+    """
+    if is_placeholder(candidate) or not candidate.description.strip():
+        return False
+    if candidate.type == "video" and not candidate.url:
+        return False
+    return True
+
+
+@register_rule
+def no_real_candidates(candidates: Dict[str, ContentCandidate]) -> Optional[RuleDecision]:
+    if any(has_content(c) for c in candidates.values()):
+        return None
+    selected = next(t for t in ALL_TYPES if t in candidates)
+    return RuleDecision(selected, "No agent produced usable content for this step.", "no_real_candidates")
+
+
+@register_rule
+def single_real_candidate(candidates: Dict[str, ContentCandidate]) -> Optional[RuleDecision]:
+    real = [c for c in candidates.values() if has_content(c)]
+    if len(real) != 1:
+        return None
+    return RuleDecision(real[0].type, f"Only the {real[0].type} candidate has real content.", "single_real_candidate")
+
+
+def heuristic_choice(candidates: Dict[str, ContentCandidate]) -> RuleDecision:
+    """
+    Always decides: the real candidate with the most to say (ties go in ALL_TYPES order).
+    Used when the LLM budget is spent, not as a default rule.
+    """
+    ordered = [candidates[t] for t in ALL_TYPES if t in candidates]
+    pool = [c for c in ordered if has_content(c)] or ordered
+    best = max(pool, key=lambda c: len(c.description.strip()))
+    return RuleDecision(best.type, f"Picked the {best.type} candidate without the LLM judge (budget).", "heuristic")
+
+
+def apply_rules(candidates: Dict[str, ContentCandidate], rules: Optional[List[JudgeRule]] = None) -> Optional[RuleDecision]:
+    """
+    Returns the first rule decision, or None if the step needs the LLM judge.
+    """
+    for rule in DEFAULT_RULES if rules is None else rules:
+        decision = rule(candidates)
+        if decision is not None and decision.selected_type in candidates:
+            return decision
+    return None
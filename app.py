@@ -1,8 +1,14 @@
+import math
+import pydeck as pdk
 import streamlit as st
-import queue
-import time
+from config import Config
 from core.engine import TravelGuideEngine
-from utils.logger import log_queue
+from core.geometry import clip_path, viewport, visible_rows
+from models.step import step_id, step_index
+from utils.circuit_breaker import CLOSED, breaker_snapshots
+
+# Once per server process, not on every rerun
+Config.warn_missing()
 
 st.set_page_config(
     page_title="Agent-Based Travel Guide",
@@ -35,6 +41,207 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def render_card(number: int, result):
+    candidate = result.chosen_candidate
+    st.markdown(f"""
+    <div class="stCard">
+        <h3>Step {number}: {candidate.title}</h3>
+        <p><strong>Type:</strong> {candidate.type.upper()}</p>
+        <p>{candidate.description}</p>
+        <p><em>Judge's Reasoning: {result.judge_reasoning}</em></p>
+        {f'<a href="{candidate.url}" target="_blank">View Content</a>' if candidate.url else ''}
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_itinerary(results):
+    """
+    Renders one page of cards, so long itineraries only cost a page worth of markup.
+    """
+    if not results:
+        return
+
+    page_size_options = sorted({10, 20, 50, 100, Config.UI_PAGE_SIZE})
+    page_size = st.session_state.setdefault("page_size", Config.UI_PAGE_SIZE)
+    pages = max(1, (len(results) + page_size - 1) // page_size)
+
+    if pages > 1:
+        # Clamp before the widget is created (Streamlit forbids changing it afterwards)
+        st.session_state.page = min(max(st.session_state.get("page", 1), 1), pages)
+        col_page, col_size = st.columns([3, 1])
+        with col_size:
+            st.selectbox("Cards per page", page_size_options, key="page_size")
+        with col_page:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="page")
+    else:
+        page = 1
+
+    first = (page - 1) * page_size
+    for i, result in enumerate(results[first:first + page_size], start=first):
+        with st.container():
+            render_card(i + 1, result)
+
+# Marker colours per content type (RGB)
+MARKER_COLORS = {"video": [230, 57, 70], "music": [42, 157, 143], "history": [233, 196, 106]}
+MAP_WIDTH_PX, MAP_HEIGHT_PX = 800, 500
+
+def fit_zoom(bounds) -> int:
+    """
+    Zoom level at which `bounds` fills the map.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    lon_span = max(max_lon - min_lon, 1e-4)
+    lat_span = max((max_lat - min_lat) / math.cos(math.radians((min_lat + max_lat) / 2)), 1e-4)
+    zoom = math.log2(min(MAP_WIDTH_PX * 360 / (256 * lon_span), MAP_HEIGHT_PX * 360 / (256 * lat_span)))
+    return int(min(max(zoom, 3), 17))
+
+def render_map(engine):
+    """
+    Route map. The polyline comes pre-simplified for the chosen zoom (and is
+    clipped to the view), and only steps with content inside the view get a
+    marker, so long routes stay light in the browser.
+    """
+    route = engine.route
+    if route is None:
+        return
+    if not getattr(route, "complete", True):
+        # Multi-stop trips: the line is drawn once every leg has been routed
+        st.caption("🗺️ The route map appears once every leg has been routed.")
+        return
+    lod = st.session_state.get("route_lod")
+    if lod is None or st.session_state.get("route_lod_key") != route.key:
+        lod = route.simplified()
+        st.session_state.route_lod, st.session_state.route_lod_key = lod, route.key
+    if not lod.levels:
+        return
+
+    with st.expander("🗺️ Route Map", expanded=False):
+        steps = engine.steps
+        overview = fit_zoom(lod.bounds)
+        col_zoom, col_focus = st.columns([1, 3])
+        with col_zoom:
+            zoom = st.slider("Zoom", 3, 17, value=overview, key="map_zoom")
+        min_lon, min_lat, max_lon, max_lat = lod.bounds
+        center_lat, center_lng = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+        if zoom > overview and len(steps) > 1:
+            with col_focus:
+                row = st.slider("Center on step", 0, len(steps) - 1, key="map_focus")
+            if not math.isnan(steps.end_lat[row]):
+                center_lat, center_lng = steps.end_lat[row], steps.end_lng[row]
+        bounds = viewport(center_lat, center_lng, zoom, MAP_WIDTH_PX, MAP_HEIGHT_PX)
+
+        paths = clip_path(lod.for_zoom(zoom), bounds)
+        itinerary = st.session_state.itinerary
+        with_content = [row for row in range(len(steps)) if step_id(steps.index[row]) in itinerary]
+        markers = []
+        for row in visible_rows(steps.end_lat, steps.end_lng, bounds, Config.MAP_MAX_MARKERS, with_content):
+            result = itinerary[step_id(steps.index[row])]
+            candidate = result.chosen_candidate
+            markers.append({
+                "position": [steps.end_lng[row], steps.end_lat[row]],
+                "label": f"Step {steps.index[row] + 1}: [{candidate.type.upper()}] {candidate.title}",
+                "color": MARKER_COLORS.get(candidate.type, [100, 100, 100]),
+            })
+
+        layers = [
+            pdk.Layer("PathLayer", data=[{"path": path} for path in paths], get_path="path",
+                      get_color=[0, 102, 204], width_min_pixels=3),
+            pdk.Layer("ScatterplotLayer", data=markers, get_position="position", get_fill_color="color",
+                      radius_min_pixels=6, pickable=True),
+        ]
+        st.pydeck_chart(pdk.Deck(
+            layers=layers,
+            initial_view_state=pdk.ViewState(latitude=center_lat, longitude=center_lng, zoom=zoom),
+            tooltip={"text": "{label}"},
+        ))
+        st.caption(f"{sum(len(path) for path in paths)} of {lod.points} route points, "
+                   f"{len(markers)} of {len(with_content)} markers in view")
+
+def render_breakers():
+    """
+    One line per upstream whose circuit breaker is not closed (nothing when all are healthy).
+    """
+    for breaker in breaker_snapshots():
+        if breaker["state"] == CLOSED:
+            continue
+        retry = f", retrying in {breaker['retry_in']:g}s" if breaker["retry_in"] else ""
+        st.warning(f"⚡ {breaker['name']} is failing ({breaker['state'].replace('_', '-')}{retry}); "
+                   f"using cached or fallback content. Last error: {breaker['last_error']}")
+
+def pull_new_results(engine):
+    """
+    Merges only the results that arrived since the last refresh into the session's itinerary.
+    """
+    cursor, new_results = engine.get_new_results(st.session_state.result_cursor)
+    st.session_state.result_cursor = cursor
+    if new_results:
+        for result in new_results:
+            st.session_state.itinerary[result.step_id] = result
+        st.session_state.itinerary_sorted = sorted(
+            st.session_state.itinerary.values(), key=lambda r: step_index(r.step_id)
+        )
+
+@st.fragment(run_every=Config.UI_REFRESH_SECONDS)
+def live_view():
+    """
+    Refreshes only this fragment while the engine runs, instead of rerunning the whole page.
+    """
+    engine = st.session_state.engine
+    # Tells the engine someone is still watching; a closed tab stops sending these
+    engine.heartbeat()
+    pull_new_results(engine)
+
+    # Status Bar
+    progress = engine.get_progress()
+    st.progress(progress)
+    st.markdown(f"<p class='stStatus'>Agents are working... ({int(progress*100)}%)</p>", unsafe_allow_html=True)
+    if st.button("Stop Journey"):
+        engine.cancel("stopped by user")
+    render_breakers()
+
+    # Real-time Logs (Developer Console)
+    with st.expander("👨‍💻 Developer Console (Live Logs)", expanded=True):
+        # Display last 20 logs from this run's bounded buffer
+        log_text = "\n".join(engine.log_buffer.lines(last=20))
+        st.code(log_text, language="text")
+
+    render_map(engine)
+
+    # Cards appear as soon as the judge picks them
+    st.header("Your Itinerary")
+    render_itinerary(st.session_state.itinerary_sorted)
+
+    if not engine.is_alive():
+        # One full rerun to switch to the finished view
+        st.session_state.running = False
+        st.rerun()
+
+@st.fragment
+def final_view():
+    """
+    Final itinerary; paging only reruns this fragment.
+    """
+    engine = st.session_state.engine
+    pull_new_results(engine)
+    render_breakers()
+
+    with st.expander("👨‍💻 Developer Console (Live Logs)", expanded=False):
+        st.code("\n".join(engine.log_buffer.lines(last=20)), language="text")
+
+    render_map(engine)
+
+    st.header("Your Itinerary")
+    results = engine.results or st.session_state.itinerary_sorted
+    if engine.alternative_routes and engine.collector:
+        # Shared places were processed once; each route gets its own itinerary
+        routes = engine.alternative_routes.summary()["routes"]
+        labels = [f"Route {i + 1}: {r['distance_m'] / 1000:.1f} km, {r['duration_s'] / 60:.0f} min ({r['shared_steps']} shared steps)"
+                  for i, r in enumerate(routes)]
+        choice = st.radio("Alternative routes", range(len(labels)), format_func=lambda i: labels[i])
+        results = engine.get_itineraries()[choice]
+    if not results:
+        st.warning("No results generated.")
+    render_itinerary(results)
+
 def main():
     st.title("🚗 Agent-Based Travel Guide")
     st.markdown("Generate a multimedia-enriched itinerary for your road trip using AI Agents.")
@@ -44,81 +251,54 @@ def main():
         st.header("Configuration")
         start_loc = st.text_input("Start Location", "Times Square, NY")
         end_loc = st.text_input("Destination", "Bryant Park, NY")
+        via = st.text_area("Stops Along the Way", "", help="One per line, in order.")
         limit = st.number_input("Step Limit (0 for all)", min_value=0, value=3, help="Limit the number of steps to process to save tokens.")
+        alternatives = st.number_input("Alternative Routes", min_value=1, max_value=3, value=max(1, min(3, Config.ROUTE_ALTERNATIVES)),
+                                       help="Places shared by the routes are only processed once.")
         
         if st.button("Start Journey", type="primary"):
             if not start_loc or not end_loc:
                 st.error("Please provide both start and destination.")
             else:
-                st.session_state.engine = TravelGuideEngine(start_loc, end_loc, limit if limit > 0 else None)
+                # Stop the previous trip's agents (and their LLM calls) before starting another
+                previous = st.session_state.get("engine")
+                if previous is not None and previous.is_alive():
+                    previous.cancel("superseded by a new journey")
+                st.session_state.engine = TravelGuideEngine(start_loc, end_loc, limit if limit > 0 else None,
+                                                            heartbeat_timeout=Config.UI_HEARTBEAT_TIMEOUT or None,
+                                                            alternatives=alternatives,
+                                                            via=[line.strip() for line in via.splitlines() if line.strip()])
                 st.session_state.engine.start()
                 st.session_state.running = True
-                st.session_state.logs = []
+                st.session_state.result_cursor = 0
+                st.session_state.itinerary = {}
+                st.session_state.itinerary_sorted = []
+                st.session_state.page = 1
                 st.rerun()
 
     # Main Area
-    if "engine" in st.session_state and st.session_state.running:
+    if "engine" not in st.session_state:
+        return
+
+    if st.session_state.running:
+        live_view()
+    else:
         engine = st.session_state.engine
-        
-        # Status Bar
-        progress = engine.get_progress()
-        st.progress(progress)
-        
-        if engine.is_alive():
-            st.markdown(f"<p class='stStatus'>Agents are working... ({int(progress*100)}%)</p>", unsafe_allow_html=True)
+        st.progress(1.0)
+        if engine.cancelled:
+            st.warning(f"Journey stopped ({engine.cancel_token.reason}).")
         else:
-            st.session_state.running = False
             st.success("Journey Generation Complete!")
             if engine.error:
                 st.error(f"Error: {engine.error}")
-
-        # Real-time Logs (Developer Console)
-        with st.expander("👨‍💻 Developer Console (Live Logs)", expanded=True):
-            log_container = st.empty()
-            
-            # Poll log queue
-            while not log_queue.empty():
-                try:
-                    record = log_queue.get_nowait()
-                    msg = f"{record.asctime} - {record.name} - {record.levelname} - {record.message}"
-                    st.session_state.logs.append(msg)
-                except queue.Empty:
-                    break
-            
-            # Display last 20 logs
-            log_text = "\n".join(st.session_state.logs[-20:])
-            log_container.code(log_text, language="text")
-            
-        # Auto-refresh while running
-        if st.session_state.running:
-            time.sleep(1)
-            st.rerun()
-
-    # Results Display
-    if "engine" in st.session_state and st.session_state.engine.is_complete:
-        st.header("Your Itinerary")
-        results = st.session_state.engine.results
-        
-        if not results:
-            st.warning("No results generated.")
-        
-        for i, result in enumerate(results):
-            candidate = result.chosen_candidate
-            with st.container():
-                st.markdown(f"""
-                <div class="stCard">
-                    <h3>Step {i+1}: {candidate.title}</h3>
-                    <p><strong>Type:</strong> {candidate.type.upper()}</p>
-                    <p>{candidate.description}</p>
-                    <p><em>Judge's Reasoning: {result.judge_reasoning}</em></p>
-                    {f'<a href="{candidate.url}" target="_blank">View Content</a>' if candidate.url else ''}
-                </div>
-                """, unsafe_allow_html=True)
+        final_view()
 
 if __name__ == "__main__":
-    if "logs" not in st.session_state:
-        st.session_state.logs = []
     if "running" not in st.session_state:
         st.session_state.running = False
+    if "result_cursor" not in st.session_state:
+        st.session_state.result_cursor = 0
+        st.session_state.itinerary = {}
+        st.session_state.itinerary_sorted = []
         
     main()
@@ -0,0 +1,84 @@
+"""
+Stand-in for the `claude` executable used by the CLI benchmarks.
+
+Supports one-shot print mode (`claude -p "<prompt>"`) and the streaming
+session mode (`--input-format stream-json --output-format stream-json`), and
+answers with the same agent/judge JSON as MockLLMClient.
+FAKE_CLAUDE_STARTUP_MS simulates the fixed process start/auth cost,
+FAKE_CLAUDE_LATENCY_MS the model latency, and FAKE_CLAUDE_EXIT_AFTER makes a
+streaming session exit after that many turns (to exercise restarts).
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+STARTUP_MS = float(os.getenv("FAKE_CLAUDE_STARTUP_MS", "0"))
+LATENCY_MS = float(os.getenv("FAKE_CLAUDE_LATENCY_MS", "0"))
+EXIT_AFTER = int(os.getenv("FAKE_CLAUDE_EXIT_AFTER", "0"))
+
+
+def _responder():
+    # Keep config warnings and logs out of our stdout, which is the "model output"
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    with contextlib.redirect_stdout(io.StringIO()):
+        from utils.llm_client import MockLLMClient
+        return MockLLMClient(latency_ms=0, error_rate=0, seed=0)
+
+
+def _respond(prompt: str) -> str:
+    time.sleep(LATENCY_MS / 1000.0)
+    return json.dumps(_responder()._build_response(prompt))
+
+
+def _emit(event):
+    sys.stdout.write(json.dumps(event) + "\n")
+    sys.stdout.flush()
+
+
+def _stream_session() -> int:
+    """
+    One user message per stdin line; each turn ends with a `result` line.
+    """
+    session_id = f"fake-{os.getpid()}"
+    _emit({"type": "system", "subtype": "init", "session_id": session_id})
+    turns = 0
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        message = json.loads(line)
+        content = message["message"]["content"]
+        prompt = content if isinstance(content, str) else "".join(block.get("text", "") for block in content)
+
+        start = time.perf_counter()
+        text = _respond(prompt)
+        _emit({"type": "assistant", "session_id": session_id,
+               "message": {"role": "assistant", "content": [{"type": "text", "text": text}]}})
+        _emit({"type": "result", "subtype": "success", "is_error": False, "session_id": session_id,
+               "duration_ms": round((time.perf_counter() - start) * 1000, 2), "result": text})
+
+        turns += 1
+        if EXIT_AFTER and turns >= EXIT_AFTER:
+            return 0
+    return 0
+
+
+def main(argv):
+    time.sleep(STARTUP_MS / 1000.0)
+    if "-p" in argv and "stream-json" in argv:
+        return _stream_session()
+    if "-p" in argv:
+        index = argv.index("-p")
+        prompt = argv[index + 1] if index + 1 < len(argv) and not argv[index + 1].startswith("--") else sys.stdin.read()
+        print(_respond(prompt))
+        return 0
+    print("fake claude: unsupported arguments", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,255 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+
+class _FakeUpstream:
+    """
+    Base class for an in-process HTTP server running on a daemon thread.
+    Subclasses implement `handle(path, params, body)` and return (status, payload).
+    Setting `fail_status` (e.g. 429 or 503) makes every request fail, to simulate an outage.
+    """
+    def __init__(self, latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 fail_status: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.fail_status = fail_status
+        self.request_count = 0
+        # Distinct client (host, port) pairs seen, i.e. TCP connections opened
+        self.connections = set()
+        self._lock = threading.Lock()
+
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so clients can keep connections alive
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; avoid Nagle/delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def _serve(self, body: Optional[Any]):
+                parsed = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                with upstream._lock:
+                    upstream.request_count += 1
+                    upstream.connections.add(self.client_address)
+                if upstream.latency_ms > 0:
+                    time.sleep(upstream.latency_ms / 1000.0)
+
+                if upstream.fail_status:
+                    status, payload = upstream.fail_status, {"error": "simulated outage"}
+                else:
+                    status, payload = upstream.handle(parsed.path, params, body)
+                # A str payload is an already formatted server-sent event stream
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/event-stream"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve(None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+                self._serve(json.loads(raw) if raw else None)
+
+            def log_message(self, format, *args):
+                # Keep the benchmark output clean
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, path: str, params: Dict[str, str], body: Optional[Any] = None):
+        raise NotImplementedError
+
+
+class FakeORSServer(_FakeUpstream):
+    """
+    Serves the OpenRouteService endpoints used by RouteFinder:
+    /geocode/search, /v2/directions/driving-car and its POST /geojson form
+    (which honours `alternative_routes.target_count`).
+    Every route is a synthetic straight-ish line with `route_steps` steps.
+    """
+    def __init__(self, route_steps: int = 10, **kwargs):
+        super().__init__(**kwargs)
+        self.route_steps = route_steps
+
+    def handle(self, path: str, params: Dict[str, str], body: Optional[Any] = None):
+        if path == "/geocode/search":
+            # Deterministic coordinates derived from the text
+            seed = sum(ord(c) for c in params.get("text", ""))
+            lon = -74.0 + (seed % 100) / 100.0
+            lat = 40.7 + (seed % 37) / 100.0
+            return 200, {"features": [{"geometry": {"coordinates": [lon, lat]}}]}
+
+        if path == "/v2/directions/driving-car":
+            start = [float(x) for x in params.get("start", "0,0").split(",")]
+            end = [float(x) for x in params.get("end", "0,0").split(",")]
+            return 200, build_synthetic_route(start, end, self.route_steps)
+
+        if path == "/v2/directions/driving-car/geojson" and body:
+            start, end = body["coordinates"][0], body["coordinates"][-1]
+            count = body.get("alternative_routes", {}).get("target_count", 1)
+            return 200, build_synthetic_alternatives(start, end, self.route_steps, count)
+
+        return 404, {"error": f"unknown path {path}"}
+
+
+class FakeBraveServer(_FakeUpstream):
+    """
+    Serves the Brave /web and /videos search endpoints with synthetic results.
+    """
+    def __init__(self, results_per_query: int = 5, **kwargs):
+        super().__init__(**kwargs)
+        self.results_per_query = results_per_query
+
+    def _results(self, query: str, kind: str) -> List[Dict[str, str]]:
+        slug = "-".join(query.lower().split())[:60]
+        return [
+            {
+                "title": f"{kind.title()} result {i} for {query}",
+                "description": f"Synthetic {kind} result number {i}.",
+                "url": f"https://example.com/{kind}/{slug}/{i}"
+            }
+            for i in range(self.results_per_query)
+        ]
+
+    def handle(self, path: str, params: Dict[str, str], body: Optional[Any] = None):
+        query = params.get("q", "")
+        if path.endswith("/web"):
+            return 200, {"web": {"results": self._results(query, "web")}}
+        if path.endswith("/videos"):
+            return 200, {"results": self._results(query, "video")}
+        return 404, {"error": f"unknown path {path}"}
+
+
+class FakeMessagesServer(_FakeUpstream):
+    """
+    Stub of the HTTP messages API used by AnthropicHTTPClient.
+    Answers with the same agent/judge JSON as MockLLMClient, as one message
+    or, for `"stream": true` requests, as server-sent text deltas.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        from utils.llm_client import MockLLMClient
+        self._responder = MockLLMClient(latency_ms=0, error_rate=0, seed=0)
+
+    def handle(self, path: str, params: Dict[str, str], body: Optional[Any] = None):
+        if path != "/v1/messages" or not body:
+            return 404, {"type": "error", "error": {"message": f"unknown path {path}"}}
+        prompt = body["messages"][-1]["content"]
+        text = json.dumps(self._responder._build_response(prompt))
+        if body.get("stream"):
+            return 200, self._event_stream(text)
+        return 200, {
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": text}],
+            "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4},
+        }
+
+
+    @staticmethod
+    def _event_stream(text: str, chunk_chars: int = 8) -> str:
+        events = [{"type": "message_start", "message": {"role": "assistant", "content": []}},
+                  {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}]
+        for i in range(0, len(text), chunk_chars):
+            events.append({"type": "content_block_delta", "index": 0,
+                           "delta": {"type": "text_delta", "text": text[i:i + chunk_chars]}})
+        events += [{"type": "content_block_stop", "index": 0}, {"type": "message_stop"}]
+        return "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+
+
+_INSTRUCTIONS = [
+    "Head north on Synthetic Avenue {i}",
+    "Turn right onto Benchmark Street {i}",
+    "Turn left onto Route {i}",
+    "Keep left to stay on Interstate {i}",
+    "Take the exit toward Exit {i}",
+]
+
+
+def build_synthetic_route(start: List[float], end: List[float], steps: int) -> Dict[str, Any]:
+    """
+    Builds an ORS-shaped GeoJSON FeatureCollection with `steps` steps between
+    start and end ([lon, lat]). Each step spans four geometry points.
+    """
+    points_per_step = 4
+    total_points = steps * points_per_step + 1
+    coordinates = []
+    for p in range(total_points):
+        t = p / max(total_points - 1, 1)
+        coordinates.append([
+            start[0] + (end[0] - start[0]) * t,
+            start[1] + (end[1] - start[1]) * t
+        ])
+
+    step_list = []
+    for i in range(steps):
+        step_list.append({
+            "distance": 250.0 + (i % 7) * 10,
+            "duration": 20.0 + (i % 5),
+            "instruction": _INSTRUCTIONS[i % len(_INSTRUCTIONS)].format(i=i),
+            "way_points": [i * points_per_step, (i + 1) * points_per_step]
+        })
+
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "properties": {
+                "segments": [{
+                    "distance": sum(s["distance"] for s in step_list),
+                    "duration": sum(s["duration"] for s in step_list),
+                    "steps": step_list
+                }]
+            },
+            "geometry": {"type": "LineString", "coordinates": coordinates}
+        }]
+    }
+
+
+def build_synthetic_alternatives(start: List[float], end: List[float], steps: int, count: int) -> Dict[str, Any]:
+    """
+    Like build_synthetic_route, with `count` features. Alternative k follows
+    the first route except for a detour over its middle third of steps.
+    """
+    route = build_synthetic_route(start, end, steps)
+    base = route["features"][0]
+    points_per_step = 4
+    detour = range((steps // 3) * points_per_step + 1, (2 * steps // 3) * points_per_step)
+    for k in range(1, count):
+        coordinates = [
+            [lon, lat + 0.01 * k] if p in detour else [lon, lat]
+            for p, (lon, lat) in enumerate(base["geometry"]["coordinates"])
+        ]
+        route["features"].append({
+            "type": "Feature",
+            "properties": json.loads(json.dumps(base["properties"])),
+            "geometry": {"type": "LineString", "coordinates": coordinates}
+        })
+    return route
@@ -0,0 +1,135 @@
+"""
+Per-call overhead of the LLM clients, measured offline.
+
+Compares ClaudeCLIClient in one-shot mode (one process per call, using
+benchmarks/fake_claude.py as the `claude` executable), ClaudeCLIClient in
+persistent mode (a pool of warm stream-json sessions of the same fake) and
+AnthropicHTTPClient (pooled keep-alive connections to an in-process stub of
+the messages API). All fakes answer after the same simulated model latency,
+so the difference is client overhead.
+
+Usage:
+    python -m benchmarks.llm_overhead --calls 50 --concurrency 1,4 --model-latency-ms 20
+    python -m benchmarks.llm_overhead --clients cli,cli-persistent --cli-startup-ms 500
+"""
+import argparse
+import logging
+import os
+import stat
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_upstreams import FakeMessagesServer
+from benchmarks.pipeline_bench import _percentile, _int_list
+
+
+def _install_fake_claude(startup_ms: float, latency_ms: float) -> str:
+    """
+    Puts a `claude` wrapper around fake_claude.py first on PATH. Returns the directory.
+    """
+    bin_dir = tempfile.mkdtemp(prefix="fake_claude_")
+    script = os.path.abspath(os.path.join(os.path.dirname(__file__), "fake_claude.py"))
+    wrapper = os.path.join(bin_dir, "claude")
+    with open(wrapper, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+    os.chmod(wrapper, os.stat(wrapper).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    os.environ["FAKE_CLAUDE_STARTUP_MS"] = str(startup_ms)
+    os.environ["FAKE_CLAUDE_LATENCY_MS"] = str(latency_ms)
+    return bin_dir
+
+
+def _measure(client, prompt: str, calls: int, concurrency: int, warmup: int = 0) -> Dict[str, Any]:
+    if warmup:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: client.generate_text(prompt), range(warmup)))
+
+    def one_call(_):
+        start = time.perf_counter()
+        response = client.generate_text(prompt)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.startswith("Error")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one_call, range(calls)))
+    wall = time.perf_counter() - started
+
+    latencies = [elapsed for elapsed, _ in outcomes]
+    return {
+        "calls": calls,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, failed in outcomes if failed),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "calls_per_sec": round(calls / wall, 2) if wall > 0 else 0.0,
+    }
+
+
+def run(calls: int, concurrency_levels: List[int], model_latency_ms: float, cli_startup_ms: float,
+        clients: List[str]) -> List[Dict[str, Any]]:
+    from utils.claude_pool import ClaudeSessionPool
+    from utils.llm_client import ClaudeCLIClient, AnthropicHTTPClient
+
+    prompt = open(os.path.join("agents", "prompts", "judge_agent.md")).read()
+    results = []
+
+    if "cli" in clients or "cli-persistent" in clients:
+        _install_fake_claude(cli_startup_ms, model_latency_ms)
+
+    if "cli" in clients:
+        client = ClaudeCLIClient(mode="oneshot")
+        for concurrency in concurrency_levels:
+            results.append({"client": "cli", **_measure(client, prompt, calls, concurrency)})
+
+    if "cli-persistent" in clients:
+        for concurrency in concurrency_levels:
+            # Sessions are warmed up first; steady-state latency is what agents see
+            pool = ClaudeSessionPool(size=concurrency)
+            client = ClaudeCLIClient(mode="persistent", pool=pool)
+            result = _measure(client, prompt, calls, concurrency, warmup=concurrency)
+            result["restarts"] = pool.restarts
+            results.append({"client": "cli-persistent", **result})
+            pool.close()
+
+    if "http" in clients:
+        server = FakeMessagesServer(latency_ms=model_latency_ms).start()
+        for concurrency in concurrency_levels:
+            client = AnthropicHTTPClient(base_url=server.base_url, api_key="bench", max_concurrency=concurrency)
+            before = len(server.connections)
+            result = _measure(client, prompt, calls, concurrency)
+            result["connections_opened"] = len(server.connections) - before
+            results.append({"client": "http", **result})
+            client.close()
+        server.stop()
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LLM client per-call overhead benchmark")
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4])
+    parser.add_argument("--model-latency-ms", type=float, default=20.0, help="Simulated model time per call")
+    parser.add_argument("--cli-startup-ms", type=float, default=0.0,
+                        help="Extra simulated CLI start/auth time on top of the real process spawn")
+    parser.add_argument("--clients", default="cli,cli-persistent,http", help="Comma separated: cli, cli-persistent, http")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    results = run(args.calls, args.concurrency, args.model_latency_ms, args.cli_startup_ms, args.clients.split(","))
+
+    columns = ["client", "concurrency", "calls", "errors", "mean_ms", "p50_ms", "p95_ms", "calls_per_sec"]
+    print("  ".join(c.rjust(12) for c in columns))
+    for result in results:
+        print("  ".join(str(result[c]).rjust(12) for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Offline throughput benchmark for the agent pipeline.
+
+Runs RouteFinder -> Scheduler -> Orchestrator -> Collector against in-process
+fake ORS/Brave servers and the latency-modelled MockLLMClient, so no network
+access or API keys are needed. Each configuration runs in its own subprocess
+so peak RSS and thread counts are not polluted by previous runs.
+
+Usage:
+    python -m benchmarks.pipeline_bench --steps 10,100,1000 --pool-sizes 1,2,4 --latency-ms 50
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class _TimedQueue(queue.Queue):
+    """
+    Collector queue that records when each result is produced by the judge.
+    """
+    def __init__(self, on_complete=None):
+        super().__init__()
+        self.completed_at: Dict[str, float] = {}
+        self.on_complete = on_complete
+
+    def put(self, item, block=True, timeout=None):
+        step_id = getattr(item, "step_id", None)
+        if step_id is not None:
+            self.completed_at[step_id] = time.perf_counter()
+        super().put(item, block, timeout)
+        if step_id is not None and self.on_complete:
+            self.on_complete()
+
+
+class _ResourceMonitor(threading.Thread):
+    """
+    Samples RSS and thread count while the pipeline runs.
+    """
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_rss_kb = _current_rss_kb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss_kb = max(self.peak_rss_kb, _current_rss_kb())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _current_rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Fallback: lifetime peak (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_single(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs one benchmark configuration in the current process and returns its metrics.
+    """
+    from config import Config
+    from benchmarks.fake_upstreams import FakeORSServer, FakeBraveServer
+
+    cache_dir = tempfile.mkdtemp(prefix="bench_cache_")
+    ors = FakeORSServer(route_steps=settings["steps"], latency_ms=settings["upstream_latency_ms"]).start()
+    brave = FakeBraveServer(latency_ms=settings["upstream_latency_ms"]).start()
+
+    Config.ORS_API_KEY = "bench"
+    Config.BRAVE_SEARCH_API_KEY = "bench"
+    Config.ORS_BASE_URL = ors.base_url
+    Config.BRAVE_BASE_URL = brave.base_url
+    Config.CACHE_DIR = cache_dir
+    Config.LLM_PROVIDER = "mock"
+    # Measure the pipeline itself, not LLM response caching
+    Config.LLM_CACHE_ENABLED = False
+    Config.MOCK_LLM_LATENCY_DIST = settings["latency_dist"]
+    Config.MOCK_LLM_LATENCY_MS = settings["latency_ms"]
+    Config.MOCK_LLM_LATENCY_JITTER_MS = settings["jitter_ms"]
+    Config.MOCK_LLM_ERROR_RATE = settings["error_rate"]
+    Config.MOCK_LLM_SEED = str(settings["seed"])
+
+    # Imported after Config is patched so module-level setup sees the fakes
+    from core.mapper import RouteFinder
+    from core.orchestrator import Orchestrator
+    from core.collector import Collector
+
+    monitor = _ResourceMonitor()
+    monitor.start()
+    start = time.perf_counter()
+
+    steps = RouteFinder().get_route("Bench Origin", "Bench Destination")
+    route_time = time.perf_counter() - start
+
+    # The batch size caps how many steps are in flight at once (0 = no cap),
+    # released as the judge hands results to the collector.
+    dispatched_at: Dict[str, float] = {}
+    window = threading.Semaphore(settings["batch_size"]) if settings["batch_size"] > 0 else None
+
+    task_queue = queue.Queue()
+    collector_queue = _TimedQueue(on_complete=window.release if window else None)
+    orchestrator = Orchestrator(task_queue, collector_queue, workers_per_agent=settings["pool_size"])
+    collector = Collector(collector_queue, total_steps=len(steps))
+
+    def feed():
+        for step in steps:
+            if window:
+                window.acquire()
+            dispatched_at[step.id] = time.perf_counter()
+            task_queue.put(step)
+        task_queue.put(None)
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    pipeline_start = time.perf_counter()
+    collector.start()
+    feeder.start()
+    orchestrator.start()
+    collector.join()
+    elapsed = time.perf_counter() - pipeline_start
+
+    monitor.stop()
+    ors.stop()
+    brave.stop()
+
+    latencies = [
+        collector_queue.completed_at[step_id] - dispatched_at[step_id]
+        for step_id in collector_queue.completed_at
+        if step_id in dispatched_at
+    ]
+    # Agents share one client per process; count each distinct client once
+    clients = {id(agent.llm_client): agent.llm_client for agent in orchestrator.agents}.values()
+    llm_calls = sum(getattr(getattr(c, "inner", c), "call_count", 0) for c in clients)
+
+    return {
+        **settings,
+        "completed_steps": len(collector.results),
+        "route_seconds": round(route_time, 4),
+        "pipeline_seconds": round(elapsed, 4),
+        "steps_per_sec": round(len(collector.results) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_step_latency_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_step_latency_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "peak_rss_mb": round(monitor.peak_rss_kb / 1024, 1),
+        "peak_threads": monitor.peak_threads,
+        "llm_calls": llm_calls,
+        "search_requests": brave.request_count,
+    }
+
+
+def _run_isolated(settings: Dict[str, Any], verbose: bool) -> Dict[str, Any]:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as out:
+        output_path = out.name
+    cmd = [sys.executable, "-m", "benchmarks.pipeline_bench",
+           "--single", json.dumps(settings), "--single-output", output_path]
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    stream = None if verbose else subprocess.DEVNULL
+    subprocess.run(cmd, cwd=root, stdout=stream, stderr=stream, check=True)
+    with open(output_path) as f:
+        result = json.load(f)
+    os.remove(output_path)
+    return result
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def _print_table(results: List[Dict[str, Any]]):
+    columns = ["steps", "pool_size", "batch_size", "steps_per_sec", "p50_step_latency_ms",
+               "p95_step_latency_ms", "peak_rss_mb", "peak_threads", "llm_calls"]
+    widths = [max(len(c), 8) for c in columns]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[c]).rjust(w) for c, w in zip(columns, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline pipeline throughput benchmark")
+    parser.add_argument("--steps", type=_int_list, default=[10, 100], help="Comma separated route lengths (10-5000)")
+    parser.add_argument("--pool-sizes", type=_int_list, default=[1, 2], help="Comma separated workers per agent type")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[0], help="Comma separated max in-flight steps (0 = unbounded)")
+    parser.add_argument("--latency-dist", default="lognormal", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mean mock LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Mock LLM latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock LLM calls that fail")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0, help="Latency added by the fake ORS/Brave servers")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", dest="json_output", help="Write all results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    parser.add_argument("--single-output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        if not args.verbose:
+            logging.disable(logging.CRITICAL)
+        result = run_single(json.loads(args.single))
+        with open(args.single_output, "w") as f:
+            json.dump(result, f)
+        return
+
+    for steps in args.steps:
+        if not 1 <= steps <= 5000:
+            parser.error("--steps values must be between 1 and 5000")
+
+    results = []
+    for steps, pool_size, batch_size in itertools.product(args.steps, args.pool_sizes, args.batch_sizes):
+        settings = {
+            "steps": steps,
+            "pool_size": pool_size,
+            "batch_size": batch_size,
+            "latency_dist": args.latency_dist,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "upstream_latency_ms": args.upstream_latency_ms,
+            "seed": args.seed,
+        }
+        print(f"Running steps={steps} pool={pool_size} batch={batch_size}...", flush=True)
+        results.append(_run_isolated(settings, args.verbose))
+
+    print()
+    _print_table(results)
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
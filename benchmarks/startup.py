@@ -0,0 +1,158 @@
+"""
+Startup benchmark: import time and time to the first scheduled step.
+
+Measures, each in a fresh subprocess:
+  * how long `import core.engine` takes (everything the UI and CLI load), and
+  * how long a TravelGuideEngine takes from construction until the first
+    step reaches a content agent (route lookup + building every agent),
+    for search caches of different sizes.
+Fake ORS/Brave servers and the mock LLM are used, so no network is needed.
+
+Usage:
+    python -m benchmarks.startup --cache-entries 0,10000,100000 --repeat 3
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.pipeline_bench import _current_rss_kb, _int_list
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class _FirstPutQueue(queue.Queue):
+    """
+    Agent input queue that records when the first step is put on it.
+    """
+    def __init__(self):
+        super().__init__()
+        self.first_put = threading.Event()
+        self.first_put_at = 0.0
+
+    def put(self, item, block=True, timeout=None):
+        if item is not None and not self.first_put.is_set():
+            self.first_put_at = time.perf_counter()
+            self.first_put.set()
+        super().put(item, block, timeout)
+
+
+def measure_import(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def populate_search_cache(cache_dir: str, entries: int):
+    from utils.cache import CacheNamespace
+    results = [{"title": f"Result {i}", "description": "Synthetic cached result.", "url": f"https://example.com/{i}"}
+               for i in range(5)]
+    cache = CacheNamespace("search", os.path.join(cache_dir, "search.json"), flush_interval=0)
+    cache.import_mapping({f"web:cached query {i}": results for i in range(entries)})
+
+
+def run_single(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs one engine start in the current process and returns its timings.
+    """
+    from config import Config
+    from benchmarks.fake_upstreams import FakeORSServer, FakeBraveServer
+
+    ors = FakeORSServer(route_steps=settings["steps"]).start()
+    brave = FakeBraveServer().start()
+    Config.ORS_API_KEY = "bench"
+    Config.BRAVE_SEARCH_API_KEY = "bench"
+    Config.ORS_BASE_URL = ors.base_url
+    Config.BRAVE_BASE_URL = brave.base_url
+    Config.CACHE_DIR = settings["cache_dir"]
+    Config.LLM_PROVIDER = "mock"
+    Config.LLM_CACHE_ENABLED = False
+    Config.MOCK_LLM_LATENCY_MS = 0
+
+    import_start = time.perf_counter()
+    from core.engine import TravelGuideEngine
+    import_seconds = time.perf_counter() - import_start
+
+    start = time.perf_counter()
+    engine = TravelGuideEngine("Bench Origin", "Bench Destination", limit=settings["steps"])
+    init_seconds = time.perf_counter() - start
+    first_step = _FirstPutQueue()
+    engine.orchestrator.yt_queue = first_step
+    engine.start()
+    first_step.first_put.wait(timeout=60)
+    rss_kb = _current_rss_kb()
+    engine.join()
+
+    ors.stop()
+    brave.stop()
+    return {
+        **settings,
+        "import_ms": round(import_seconds * 1000, 2),
+        "engine_init_ms": round(init_seconds * 1000, 2),
+        "first_step_ms": round((first_step.first_put_at - start) * 1000, 2),
+        "rss_mb": round(rss_kb / 1024, 1),
+        "completed_steps": len(engine.results),
+    }
+
+
+def _run_isolated(settings: Dict[str, Any]) -> Dict[str, Any]:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as out:
+        output_path = out.name
+    cmd = [sys.executable, "-m", "benchmarks.startup", "--single", json.dumps(settings), "--single-output", output_path]
+    subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    with open(output_path) as f:
+        result = json.load(f)
+    os.remove(output_path)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("--cache-entries", type=_int_list, default=[0, 10000],
+                        help="Comma separated search cache sizes to start with")
+    parser.add_argument("--steps", type=int, default=3, help="Route length")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (median is reported)")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    parser.add_argument("--single-output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        logging.disable(logging.CRITICAL)
+        result = run_single(json.loads(args.single))
+        with open(args.single_output, "w") as f:
+            json.dump(result, f)
+        return
+
+    print("Import time (median of {}):".format(args.repeat))
+    for module in ("config", "core.engine"):
+        samples = [measure_import(module) for _ in range(args.repeat)]
+        print(f"  {module:<12} {statistics.median(samples) * 1000:8.2f} ms")
+
+    columns = ["cache_entries", "import_ms", "engine_init_ms", "first_step_ms", "rss_mb"]
+    rows: List[Dict[str, Any]] = []
+    for entries in args.cache_entries:
+        cache_dir = tempfile.mkdtemp(prefix="startup_cache_")
+        populate_search_cache(cache_dir, entries)
+        runs = [_run_isolated({"cache_entries": entries, "cache_dir": cache_dir, "steps": args.steps})
+                for _ in range(args.repeat)]
+        rows.append({c: statistics.median(run[c] for run in runs) if c != "cache_entries" else entries
+                     for c in columns})
+
+    print()
+    print("  ".join(c.rjust(14) for c in columns))
+    for row in rows:
+        print("  ".join(str(round(row[c], 2)).rjust(14) for c in columns))
+
+
+if __name__ == "__main__":
+    main()
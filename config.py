@@ -9,12 +9,199 @@ class Config:
     BRAVE_SEARCH_API_KEY = os.getenv("BRAVE_SEARCH_API_KEY")
     LLM_API_KEY = os.getenv("LLM_API_KEY")
     LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
-    
-    if not ORS_API_KEY:
-        print("Warning: ORS_API_KEY not found in environment variables.")
-
-    if not BRAVE_SEARCH_API_KEY:
-        print("Warning: BRAVE_SEARCH_API_KEY not found in environment variables.")
-    
-    if not LLM_API_KEY:
-        print("Warning: LLM_API_KEY not found in environment variables.")
+
+    # Direct HTTP messages API (LLM_PROVIDER=anthropic)
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.anthropic.com")
+    LLM_API_VERSION = os.getenv("LLM_API_VERSION", "2023-06-01")
+    LLM_MODEL = os.getenv("LLM_MODEL", "claude-sonnet-4-5")
+    LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1024"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+    # Max in-flight requests (and pooled keep-alive connections) per client
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+    # Tiered routing (utils/llm_router.py): each task class can run on its own
+    # provider, model, timeout and concurrency limit. Empty/0 values use the
+    # defaults above (and the shared client). Tasks: QUERY = a content agent's
+    # first call (emits the search query), SELECT = its pick from the search
+    # results, JUDGE = the judge's decision. COST_PER_MTOK (USD per million
+    # estimated tokens) is only used for the per-tier report.
+    LLM_QUERY_PROVIDER = os.getenv("LLM_QUERY_PROVIDER", "")
+    LLM_QUERY_MODEL = os.getenv("LLM_QUERY_MODEL", "")
+    LLM_QUERY_TIMEOUT = float(os.getenv("LLM_QUERY_TIMEOUT", "0"))
+    LLM_QUERY_CONCURRENCY = int(os.getenv("LLM_QUERY_CONCURRENCY", "0"))
+    LLM_QUERY_COST_PER_MTOK = float(os.getenv("LLM_QUERY_COST_PER_MTOK", "0"))
+    LLM_SELECT_PROVIDER = os.getenv("LLM_SELECT_PROVIDER", "")
+    LLM_SELECT_MODEL = os.getenv("LLM_SELECT_MODEL", "")
+    LLM_SELECT_TIMEOUT = float(os.getenv("LLM_SELECT_TIMEOUT", "0"))
+    LLM_SELECT_CONCURRENCY = int(os.getenv("LLM_SELECT_CONCURRENCY", "0"))
+    LLM_SELECT_COST_PER_MTOK = float(os.getenv("LLM_SELECT_COST_PER_MTOK", "0"))
+    LLM_JUDGE_PROVIDER = os.getenv("LLM_JUDGE_PROVIDER", "")
+    LLM_JUDGE_MODEL = os.getenv("LLM_JUDGE_MODEL", "")
+    LLM_JUDGE_TIMEOUT = float(os.getenv("LLM_JUDGE_TIMEOUT", "0"))
+    LLM_JUDGE_CONCURRENCY = int(os.getenv("LLM_JUDGE_CONCURRENCY", "0"))
+    LLM_JUDGE_COST_PER_MTOK = float(os.getenv("LLM_JUDGE_COST_PER_MTOK", "0"))
+
+    # Upstream endpoints (overridable so the benchmarks can point at local fakes)
+    ORS_BASE_URL = os.getenv("ORS_BASE_URL", "https://api.openrouteservice.org")
+    BRAVE_BASE_URL = os.getenv("BRAVE_BASE_URL", "https://api.search.brave.com/res/v1")
+    CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+
+    # Cache limits per namespace (0 = unlimited). TTLs are in seconds.
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(7 * 24 * 3600)))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "50000"))
+    SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+    ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", str(30 * 24 * 3600)))
+    ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "5000"))
+    ROUTE_CACHE_MAX_BYTES = int(os.getenv("ROUTE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    # LLM responses keyed by provider, model and prompt (errors are never cached)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+    # Seconds between cache writes to disk (they are also flushed at exit)
+    CACHE_FLUSH_INTERVAL = float(os.getenv("CACHE_FLUSH_INTERVAL", "5"))
+
+    # Record/replay of ORS, Brave and Claude CLI traffic
+    # TRAFFIC_MODE is one of: live, record, replay
+    TRAFFIC_MODE = os.getenv("TRAFFIC_MODE", "live")
+    TRAFFIC_ARCHIVE = os.getenv("TRAFFIC_ARCHIVE", "fixtures/traffic.jsonl.gz")
+    # Replay timing is one of: original, fast
+    TRAFFIC_REPLAY_TIMING = os.getenv("TRAFFIC_REPLAY_TIMING", "fast")
+
+    # Logging
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # Max records waiting for the log listener thread; extra records are dropped
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Lines kept per run for the UI console
+    LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", "500"))
+    # Chatty per-step messages: minimum level and keep 1 in N
+    LOG_STEP_MIN_LEVEL = os.getenv("LOG_STEP_MIN_LEVEL", "INFO")
+    LOG_STEP_SAMPLE_EVERY = int(os.getenv("LOG_STEP_SAMPLE_EVERY", "1"))
+
+    # Streamlit UI
+    UI_REFRESH_SECONDS = float(os.getenv("UI_REFRESH_SECONDS", "1"))
+    UI_PAGE_SIZE = int(os.getenv("UI_PAGE_SIZE", "20"))
+    # The UI cancels a run when its page stops refreshing for this long (closed tab); 0 disables
+    UI_HEARTBEAT_TIMEOUT = float(os.getenv("UI_HEARTBEAT_TIMEOUT", "30"))
+
+    # Route map: zoom level -> Douglas-Peucker tolerance in meters. Each level is
+    # used from its zoom up to the next one.
+    MAP_ZOOM_TOLERANCES = os.getenv("MAP_ZOOM_TOLERANCES", "4:5000,7:1000,10:150,13:20,16:3")
+    # Most step markers drawn at once (only steps inside the view are drawn)
+    MAP_MAX_MARKERS = int(os.getenv("MAP_MAX_MARKERS", "300"))
+
+    # Number of worker threads per content agent type
+    AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "1"))
+
+    # Adaptive agent routing: skip content agents that rarely win in a context
+    ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+    ROUTER_EXPLORATION_RATE = float(os.getenv("ROUTER_EXPLORATION_RATE", "0.1"))
+    ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "20"))
+    ROUTER_TOP1_CONFIDENCE = float(os.getenv("ROUTER_TOP1_CONFIDENCE", "0.8"))
+    ROUTER_TOP2_CONFIDENCE = float(os.getenv("ROUTER_TOP2_CONFIDENCE", "0.9"))
+    ROUTER_MAX_SAMPLES = int(os.getenv("ROUTER_MAX_SAMPLES", "500"))
+
+    # Resolve obvious judge decisions (e.g. failed candidates) without an LLM call
+    JUDGE_RULES_ENABLED = os.getenv("JUDGE_RULES_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # Per-trip LLM budget (0 = unlimited). As it runs down the trip degrades
+    # through the tiers in core/budget.py; thresholds are the used shares at
+    # which each next tier starts.
+    BUDGET_MAX_LLM_CALLS = int(os.getenv("BUDGET_MAX_LLM_CALLS", "0"))
+    BUDGET_MAX_SECONDS = float(os.getenv("BUDGET_MAX_SECONDS", "0"))
+    BUDGET_MAX_TOKENS = int(os.getenv("BUDGET_MAX_TOKENS", "0"))
+    BUDGET_TIER_THRESHOLDS = os.getenv("BUDGET_TIER_THRESHOLDS", "0.5,0.7,0.85,0.95")
+    # In the sampled tier only every k-th step is processed
+    BUDGET_SAMPLE_EVERY = int(os.getenv("BUDGET_SAMPLE_EVERY", "4"))
+
+    # Driving-horizon mode (--positions): only steps starting within this many
+    # seconds (and/or meters, 0 = off) ahead of the car are scheduled
+    HORIZON_SECONDS = float(os.getenv("HORIZON_SECONDS", "600"))
+    HORIZON_METERS = float(os.getenv("HORIZON_METERS", "0"))
+    # Positions farther than this from the route are ignored (e.g. a detour)
+    HORIZON_OFF_ROUTE_METERS = float(os.getenv("HORIZON_OFF_ROUTE_METERS", "150"))
+    # Simulated drive: seconds between positions and speed relative to real time
+    HORIZON_SIM_INTERVAL = float(os.getenv("HORIZON_SIM_INTERVAL", "1"))
+    HORIZON_SIM_SPEEDUP = float(os.getenv("HORIZON_SIM_SPEEDUP", "1"))
+    # Connect timeout for tcp: position feeds
+    HORIZON_FEED_TIMEOUT = float(os.getenv("HORIZON_FEED_TIMEOUT", "10"))
+
+    # Search queries whose MinHash similarity to an earlier query (after case,
+    # stopword and word order normalisation) reaches SEARCH_SIMILARITY_THRESHOLD
+    # reuse its cached results. PERMUTATIONS / BANDS rows per LSH band; SEED is
+    # how many cached queries from earlier runs are indexed on first use.
+    SEARCH_SIMILARITY_ENABLED = os.getenv("SEARCH_SIMILARITY_ENABLED", "true").lower() in ("1", "true", "yes")
+    SEARCH_SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.8"))
+    SEARCH_SIMILARITY_PERMUTATIONS = int(os.getenv("SEARCH_SIMILARITY_PERMUTATIONS", "64"))
+    SEARCH_SIMILARITY_BANDS = int(os.getenv("SEARCH_SIMILARITY_BANDS", "16"))
+    SEARCH_SIMILARITY_MAX_ENTRIES = int(os.getenv("SEARCH_SIMILARITY_MAX_ENTRIES", "20000"))
+    SEARCH_SIMILARITY_SEED = int(os.getenv("SEARCH_SIMILARITY_SEED", "500"))
+
+    # Multi-stop trips (--via): legs routed, and stops geocoded, at once
+    ROUTE_LEG_CONCURRENCY = int(os.getenv("ROUTE_LEG_CONCURRENCY", "4"))
+
+    # Alternative routes (--alternatives): ORS returns up to ROUTE_ALTERNATIVES
+    # routes (it allows 3, and only for trips under ~100 km). Steps whose start
+    # and end points agree to ROUTE_ALTERNATIVE_MATCH_DECIMALS decimal degrees
+    # count as the same place, and get their content once for every route
+    ROUTE_ALTERNATIVES = int(os.getenv("ROUTE_ALTERNATIVES", "1"))
+    ROUTE_ALTERNATIVE_SHARE_FACTOR = float(os.getenv("ROUTE_ALTERNATIVE_SHARE_FACTOR", "0.6"))
+    ROUTE_ALTERNATIVE_WEIGHT_FACTOR = float(os.getenv("ROUTE_ALTERNATIVE_WEIGHT_FACTOR", "1.4"))
+    ROUTE_ALTERNATIVE_MATCH_DECIMALS = int(os.getenv("ROUTE_ALTERNATIVE_MATCH_DECIMALS", "4"))
+
+    # Circuit breakers around the LLM, Brave and ORS (utils/circuit_breaker.py):
+    # a breaker opens when at least BREAKER_ERROR_RATE of the last
+    # BREAKER_WINDOW calls failed (after BREAKER_MIN_CALLS), then probes again
+    # after BREAKER_COOLDOWN_SECONDS
+    BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "true").lower() in ("1", "true", "yes")
+    BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+    BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+    BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+    BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+
+    # Seconds to wait for agent threads after a run is cancelled
+    CANCEL_JOIN_TIMEOUT = float(os.getenv("CANCEL_JOIN_TIMEOUT", "5"))
+
+    # Inter-stage queue capacities (0 = unbounded). Producers block when a
+    # queue is full, so in-flight work stays bounded on long routes.
+    TASK_QUEUE_SIZE = int(os.getenv("TASK_QUEUE_SIZE", "16"))
+    AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "8"))
+    JUDGE_QUEUE_SIZE = int(os.getenv("JUDGE_QUEUE_SIZE", "24"))
+    COLLECTOR_QUEUE_SIZE = int(os.getenv("COLLECTOR_QUEUE_SIZE", "16"))
+
+    # Batch mode: concurrent route fetches
+    BATCH_ROUTE_CONCURRENCY = int(os.getenv("BATCH_ROUTE_CONCURRENCY", "4"))
+
+    # Claude CLI (default provider)
+    # Mode is "oneshot" (one process per call) or "persistent" (pool of warm stream-json sessions)
+    CLAUDE_CLI_PATH = os.getenv("CLAUDE_CLI_PATH", "claude")
+    CLAUDE_CLI_MODE = os.getenv("CLAUDE_CLI_MODE", "oneshot")
+    CLAUDE_CLI_TIMEOUT = float(os.getenv("CLAUDE_CLI_TIMEOUT", "120"))
+    # Defaults to one session per agent worker (3 content agent types + the judge)
+    CLAUDE_POOL_SIZE = int(os.getenv("CLAUDE_POOL_SIZE", str(3 * AGENT_POOL_SIZE + 1)))
+
+    # Mock LLM latency model (LLM_PROVIDER=mock)
+    # Distribution is one of: fixed, uniform, exponential, lognormal
+    MOCK_LLM_LATENCY_DIST = os.getenv("MOCK_LLM_LATENCY_DIST", "fixed")
+    MOCK_LLM_LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", "0"))
+    MOCK_LLM_LATENCY_JITTER_MS = float(os.getenv("MOCK_LLM_LATENCY_JITTER_MS", "0"))
+    MOCK_LLM_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+    MOCK_LLM_SEED = os.getenv("MOCK_LLM_SEED")
+
+    _warned = False
+
+    @classmethod
+    def warn_missing(cls):
+        """
+        Prints a warning for each missing API key, once per process.
+        Called by the entry points rather than at import time.
+        """
+        if cls._warned:
+            return
+        cls._warned = True
+        if not cls.ORS_API_KEY:
+            print("Warning: ORS_API_KEY not found in environment variables.")
+        if not cls.BRAVE_SEARCH_API_KEY:
+            print("Warning: BRAVE_SEARCH_API_KEY not found in environment variables.")
+        if not cls.LLM_API_KEY:
+            print("Warning: LLM_API_KEY not found in environment variables.")
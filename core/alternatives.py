@@ -0,0 +1,109 @@
+import dataclasses
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+from config import Config
+from models.content import SelectedContent
+from models.step import RouteStep, step_id
+from models.step_table import StepTable
+from utils.logger import setup_logger
+
+logger = setup_logger("Alternatives")
+
+
+def shared_step_key(step: RouteStep, decimals: int) -> Optional[Hashable]:
+    """
+    Where a step is, for matching it across alternative routes: its start and
+    end points rounded to `decimals` decimal degrees (4 is about 10 m).
+    None for steps without coordinates, which are never shared.
+    """
+    if step.start_lat is None or step.end_lat is None:
+        return None
+    return (round(step.start_lat, decimals), round(step.start_lng, decimals),
+            round(step.end_lat, decimals), round(step.end_lng, decimals))
+
+
+class AlternativeRoutes:
+    """
+    Several alternative routes sharing one run of the content pipeline.
+
+    Steps are matched across the routes by geometry (see shared_step_key), so
+    a stretch the routes have in common is scheduled once. `steps` holds the
+    unique steps, numbered from 0 in order of first appearance (the first
+    route's steps keep their own indices). itinerary() fans the results for
+    those steps back out to each route under the route's own step ids.
+    """
+    def __init__(self, routes: Iterable[Iterable[RouteStep]], decimals: Optional[int] = None):
+        decimals = Config.ROUTE_ALTERNATIVE_MATCH_DECIMALS if decimals is None else decimals
+        self.routes: List[StepTable] = []
+        self.steps: List[RouteStep] = []
+        # Per route: row -> index of the unique step scheduled for it
+        self.assignments: List[List[int]] = []
+
+        seen: Dict[Hashable, int] = {}
+        for route in routes:
+            table = StepTable.from_steps(route)
+            assignment = []
+            for step in table:
+                key = shared_step_key(step, decimals)
+                unique_index = seen.get(key) if key is not None else None
+                if unique_index is None:
+                    unique_index = len(self.steps)
+                    self.steps.append(dataclasses.replace(step, index=unique_index))
+                    if key is not None:
+                        seen[key] = unique_index
+                assignment.append(unique_index)
+            self.routes.append(table)
+            self.assignments.append(assignment)
+        summary = self.summary()
+        logger.info(f"{summary['alternatives']} alternatives: {summary['steps']} steps, "
+                    f"{summary['unique_steps']} unique ({summary['shared_share']:.0%} shared)")
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def itinerary(self, route: int, results: Iterable[SelectedContent]) -> List[SelectedContent]:
+        """
+        Results for one alternative, in its step order and under its own step ids.
+        """
+        by_unique = {result.step_id: result for result in results}
+        itinerary = []
+        for row, unique_index in enumerate(self.assignments[route]):
+            result = by_unique.get(step_id(unique_index))
+            if result is not None:
+                itinerary.append(dataclasses.replace(result, step_id=step_id(self.routes[route].index[row])))
+        return itinerary
+
+    def summary(self) -> Dict[str, Any]:
+        total = sum(len(route) for route in self.routes)
+        # How many routes each unique step appears on
+        routes_per_step = Counter(i for assignment in self.assignments for i in set(assignment))
+        return {
+            "alternatives": len(self.routes),
+            "steps": total,
+            "unique_steps": len(self.steps),
+            "shared_share": round(1 - len(self.steps) / total, 3) if total else 0.0,
+            "routes": [
+                {
+                    "steps": len(route),
+                    "distance_m": round(sum(route.distance_m), 1),
+                    "duration_s": round(sum(route.duration_s), 1),
+                    "shared_steps": sum(1 for unique_index in assignment if routes_per_step[unique_index] > 1),
+                }
+                for route, assignment in zip(self.routes, self.assignments)
+            ],
+        }
+
+    def print_report(self, results: List[SelectedContent]):
+        summary = self.summary()
+        print("\n" + "="*50)
+        print("ALTERNATIVE ROUTES")
+        print("="*50)
+        print(f"{summary['steps']} steps over {summary['alternatives']} routes, content computed for "
+              f"{summary['unique_steps']} unique places ({summary['shared_share']:.0%} shared)")
+        for number, route in enumerate(summary["routes"]):
+            print("-" * 30)
+            print(f"Route {number + 1}: {route['distance_m'] / 1000:.1f} km, {route['duration_s'] / 60:.0f} min, "
+                  f"{route['steps']} steps ({route['shared_steps']} shared)")
+            for result in self.itinerary(number, results):
+                candidate = result.chosen_candidate
+                print(f"  {result.step_id}: [{candidate.type.upper()}] {candidate.title}")
@@ -0,0 +1,180 @@
+import csv
+import dataclasses
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config import Config
+from core.mapper import RouteFinder
+from core.scheduler import Scheduler
+from core.orchestrator import Orchestrator
+from core.collector import Collector
+from models.step import RouteStep
+from utils.cache import get_cache
+from utils.logger import setup_logger
+
+logger = setup_logger("Batch")
+
+_ORIGIN_FIELDS = ("origin", "start", "from")
+_DESTINATION_FIELDS = ("destination", "end", "to")
+
+
+def _pick(row: Dict[str, Any], names: Tuple[str, ...]) -> Optional[str]:
+    for name in names:
+        if row.get(name):
+            return str(row[name]).strip()
+    return None
+
+
+def load_trips(path: str) -> List[Tuple[str, str]]:
+    """
+    Reads (origin, destination) pairs from a .csv file (with an
+    origin/destination header, or two plain columns) or a JSONL file
+    (objects with origin/destination, or two-element lists).
+    """
+    trips = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = list(csv.reader(f))
+        if rows and {c.strip().lower() for c in rows[0]} & set(_ORIGIN_FIELDS):
+            header = [c.strip().lower() for c in rows[0]]
+            rows = [dict(zip(header, row)) for row in rows[1:]]
+        for row in rows:
+            if isinstance(row, dict):
+                trips.append((_pick(row, _ORIGIN_FIELDS), _pick(row, _DESTINATION_FIELDS)))
+            elif len(row) >= 2:
+                trips.append((row[0].strip(), row[1].strip()))
+    else:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if isinstance(row, dict):
+                    trips.append((_pick(row, _ORIGIN_FIELDS), _pick(row, _DESTINATION_FIELDS)))
+                else:
+                    trips.append((str(row[0]).strip(), str(row[1]).strip()))
+
+    valid = [(o, d) for o, d in trips if o and d]
+    if len(valid) < len(trips):
+        logger.warning(f"Skipped {len(trips) - len(valid)} rows without an origin and destination")
+    return valid
+
+
+def step_work_key(step: RouteStep) -> Tuple[str, str]:
+    """
+    What the content agents actually see for a step (same location text and
+    instruction as ContentAgent's prompt), so equal keys mean equal work.
+    """
+    return step.location, step.instruction
+
+
+class BatchRunner:
+    """
+    Pre-warms the route, search and LLM caches for many trips at once.
+
+    Routes are fetched with bounded concurrency, identical trips and steps
+    are deduplicated across the whole batch, and the agents run once per
+    unique step. Concurrent identical searches and prompts are collapsed by
+    the cache layer (CacheNamespace.get_or_compute).
+    """
+    def __init__(self, trips: List[Tuple[str, str]], limit: Optional[int] = None,
+                 route_concurrency: Optional[int] = None):
+        self.trips = trips
+        self.limit = limit
+        self.route_concurrency = max(1, route_concurrency or Config.BATCH_ROUTE_CONCURRENCY)
+        self.failed_trips: List[Tuple[str, str]] = []
+
+    def _unique_trips(self) -> List[Tuple[str, str]]:
+        # Same normalisation as the route cache key
+        seen = {}
+        for origin, destination in self.trips:
+            seen.setdefault((origin.lower(), destination.lower()), (origin, destination))
+        return list(seen.values())
+
+    def fetch_routes(self, mapper: RouteFinder, trips: List[Tuple[str, str]]) -> List[List[RouteStep]]:
+        def fetch(trip):
+            try:
+                return mapper.get_route(*trip)
+            except Exception as e:
+                logger.error(f"Failed to get route for {trip[0]} -> {trip[1]}: {e}")
+                return []
+
+        with ThreadPoolExecutor(max_workers=self.route_concurrency) as pool:
+            routes = list(pool.map(fetch, trips))
+
+        for trip, steps in zip(trips, routes):
+            if not steps:
+                self.failed_trips.append(trip)
+        return routes
+
+    def unique_steps(self, routes: List[List[RouteStep]]) -> List[RouteStep]:
+        unique: Dict[Tuple[str, str], RouteStep] = {}
+        for steps in routes:
+            if self.limit and self.limit > 0:
+                steps = steps[:self.limit]
+            for step in steps:
+                key = step_work_key(step)
+                if key not in unique:
+                    # Ids must be unique across the batch for the judge and collector
+                    unique[key] = dataclasses.replace(step, index=len(unique))
+        return list(unique.values())
+
+    def run_agents(self, steps: List[RouteStep]) -> Collector:
+        task_queue = queue.Queue(maxsize=Config.TASK_QUEUE_SIZE)
+        collector_queue = queue.Queue(maxsize=Config.COLLECTOR_QUEUE_SIZE)
+        scheduler = Scheduler(task_queue)
+        orchestrator = Orchestrator(task_queue, collector_queue)
+        collector = Collector(collector_queue, total_steps=len(steps))
+
+        collector.start()
+        scheduler.start(steps)
+        orchestrator.start() # Blocks until agents are done
+        collector.join()
+        return collector
+
+    def run(self) -> Dict[str, Any]:
+        mapper = RouteFinder()
+        namespaces = {"routes": mapper.cache.index, "search": get_cache("search"), "llm": get_cache("llm")}
+        before = {name: ns.stats() for name, ns in namespaces.items()}
+
+        started = time.perf_counter()
+        trips = self._unique_trips()
+        logger.info(f"Batch: {len(self.trips)} trips, {len(trips)} unique. Fetching routes...")
+        routes = self.fetch_routes(mapper, trips)
+        route_seconds = time.perf_counter() - started
+
+        total_steps = sum(min(len(s), self.limit) if self.limit and self.limit > 0 else len(s) for s in routes)
+        steps = self.unique_steps(routes)
+        logger.info(f"Batch: {total_steps} steps, {len(steps)} unique. Running agents...")
+
+        agents_started = time.perf_counter()
+        collector = self.run_agents(steps) if steps else None
+        agent_seconds = time.perf_counter() - agents_started
+        elapsed = time.perf_counter() - started
+
+        cache_stats = {}
+        for name, ns in namespaces.items():
+            after = ns.stats()
+            cache_stats[name] = {
+                "hits": after["hits"] - before[name]["hits"],
+                "misses": after["misses"] - before[name]["misses"],
+                "entries": after["entries"],
+            }
+
+        return {
+            "trips": len(self.trips),
+            "unique_trips": len(trips),
+            "failed_trips": len(self.failed_trips),
+            "steps": total_steps,
+            "unique_steps": len(steps),
+            "dedup_ratio": round(1 - len(steps) / total_steps, 3) if total_steps else 0.0,
+            "completed_steps": len(collector.results) if collector else 0,
+            "route_seconds": round(route_seconds, 2),
+            "agent_seconds": round(agent_seconds, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "trips_per_sec": round(len(self.trips) / elapsed, 2) if elapsed > 0 else 0.0,
+            "unique_steps_per_sec": round(len(steps) / agent_seconds, 2) if steps and agent_seconds > 0 else 0.0,
+            "caches": cache_stats,
+        }
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import Counter
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+from config import Config
+from models.step import RouteStep
+from utils.logger import setup_logger
+
+logger = setup_logger("Budget")
+
+# Rough size of a token, for estimating spend from prompt/response lengths
+CHARS_PER_TOKEN = 4
+
+
+class Tier(IntEnum):
+    """
+    Degradation tiers, cheapest last. Each tier also applies the ones before it.
+    """
+    FULL = 0
+    NO_FOLLOWUP = 1       # content agents pick the top search result instead of a second LLM call
+    CACHE_ONLY = 2        # content agents only use cached LLM responses
+    HEURISTIC_JUDGE = 3   # the judge picks without the LLM
+    SAMPLED = 4           # only every k-th step is processed
+
+
+def _parse_thresholds(value: str) -> List[float]:
+    thresholds = [float(x) for x in value.split(",") if x.strip()]
+    if len(thresholds) != len(Tier) - 1:
+        raise ValueError(f"Expected {len(Tier) - 1} budget tier thresholds, got {value!r}")
+    return thresholds
+
+
+class BudgetGovernor:
+    """
+    Tracks LLM calls, estimated tokens and wall time for one trip.
+
+    The tier is picked from the most used of the three budgets: once that
+    share passes each of `thresholds`, the next Tier applies. From
+    HEURISTIC_JUDGE on no LLM calls are made, so spend stays within the caps
+    (plus calls already in flight). Each later step is then charged the
+    average calls and tokens of the steps before it, so a call or token
+    budget still runs down to SAMPLED. A limit of 0/None means no limit.
+    """
+    def __init__(self, max_calls: Optional[int] = None, max_seconds: Optional[float] = None,
+                 max_tokens: Optional[int] = None, sample_every: Optional[int] = None,
+                 thresholds: Optional[List[float]] = None):
+        self.max_calls = max_calls or 0
+        self.max_seconds = max_seconds or 0.0
+        self.max_tokens = max_tokens or 0
+        self.sample_every = max(1, sample_every or Config.BUDGET_SAMPLE_EVERY)
+        self.thresholds = thresholds or _parse_thresholds(Config.BUDGET_TIER_THRESHOLDS)
+        self.started_at = time.monotonic()
+        self.calls = 0
+        self.tokens = 0
+        # Steps admitted so far, and (steps, calls, tokens) when the LLM stopped being used
+        self.steps = 0
+        self._llm_stopped_at: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+        self._tier = Tier.FULL
+        # Step id at which each tier was first reached
+        self.transitions: Dict[str, str] = {}
+        # Degradations applied, e.g. {"no_followup": 12, "heuristic_judge": 3}
+        self.actions: Counter = Counter()
+        self._step_tiers: Dict[str, Tier] = {}
+
+    @classmethod
+    def from_config(cls) -> Optional["BudgetGovernor"]:
+        """
+        A governor for the BUDGET_* settings, or None when none of the limits is set.
+        """
+        if not (Config.BUDGET_MAX_LLM_CALLS or Config.BUDGET_MAX_SECONDS or Config.BUDGET_MAX_TOKENS):
+            return None
+        return cls(Config.BUDGET_MAX_LLM_CALLS, Config.BUDGET_MAX_SECONDS, Config.BUDGET_MAX_TOKENS)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def used_fraction(self) -> float:
+        with self._lock:
+            calls, tokens = self.calls, self.tokens
+            if self._llm_stopped_at is not None:
+                steps, stopped_calls, stopped_tokens = self._llm_stopped_at
+                later_steps = self.steps - steps
+                calls += later_steps * stopped_calls / max(steps, 1)
+                tokens += later_steps * stopped_tokens / max(steps, 1)
+        shares = []
+        if self.max_calls:
+            shares.append(calls / self.max_calls)
+        if self.max_tokens:
+            shares.append(tokens / self.max_tokens)
+        if self.max_seconds:
+            shares.append(self.elapsed / self.max_seconds)
+        return max(shares, default=0.0)
+
+    def tier(self, step_id: Optional[str] = None) -> Tier:
+        """
+        The current tier. With a step id it is also remembered as that step's tier
+        (the highest seen for it), for the report.
+        """
+        used = self.used_fraction()
+        tier = Tier(sum(1 for t in self.thresholds if used >= t))
+        with self._lock:
+            # Tiers only go up, so a trip does not flap between behaviours
+            if tier > self._tier:
+                for reached in range(self._tier + 1, tier + 1):
+                    self.transitions.setdefault(Tier(reached).name.lower(), step_id or "?")
+                logger.warning(f"Budget {used:.0%} used, degrading to {tier.name.lower()}")
+                self._tier = tier
+                if tier >= Tier.HEURISTIC_JUDGE and self._llm_stopped_at is None:
+                    self._llm_stopped_at = (self.steps, self.calls, self.tokens)
+            tier = self._tier
+            if step_id is not None:
+                self._step_tiers[step_id] = max(tier, self._step_tiers.get(step_id, Tier.FULL))
+        return tier
+
+    def step_tier(self, step_id: str) -> Tier:
+        with self._lock:
+            return self._step_tiers.get(step_id, Tier.FULL)
+
+    def admit(self, step: RouteStep) -> bool:
+        """
+        False for steps dropped by sampling (every `sample_every`-th step is kept).
+        """
+        with self._lock:
+            self.steps += 1
+        if self.tier(step.id) < Tier.SAMPLED:
+            return True
+        if step.index % self.sample_every == 0:
+            return True
+        self.note("sampled_out")
+        return False
+
+    def record_call(self, prompt: str):
+        with self._lock:
+            self.calls += 1
+            self.tokens += len(prompt) // CHARS_PER_TOKEN
+
+    def record_output(self, chars: int):
+        with self._lock:
+            self.tokens += chars // CHARS_PER_TOKEN
+
+    def note(self, action: str):
+        with self._lock:
+            self.actions[action] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "llm_calls": self.calls,
+                "max_llm_calls": self.max_calls or None,
+                "estimated_tokens": self.tokens,
+                "max_tokens": self.max_tokens or None,
+                "seconds": round(self.elapsed, 1),
+                "max_seconds": self.max_seconds or None,
+                "tier": self._tier.name.lower(),
+                "tier_reached_at": dict(self.transitions),
+                "degradations": dict(self.actions),
+            }
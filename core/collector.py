@@ -1,25 +1,58 @@
 import threading
 import queue
 import json
-from typing import List, Dict
-from models.content import SelectedContent
-from utils.logger import setup_logger
+from typing import Any, List, Dict, Optional, Tuple
+from models.content import SelectedContent, SkippedStep
+from models.step import step_index
+from utils.circuit_breaker import breaker_snapshots
+from utils.llm_router import get_llm_router
+from utils.query_similarity import query_index_summaries
+from utils.cancellation import CancellationToken, current_token
+from utils.logger import setup_logger, bind_run, current_run_id, STEP_LOG
 
 logger = setup_logger("Collector")
 
+
+def stats_baseline() -> Dict[str, Any]:
+    """
+    The process-wide LLM tier and circuit breaker counters as of now. Taken
+    when a trip starts, so its report only counts what happened since.
+    """
+    return {"llm_tiers": get_llm_router().snapshot(), "breakers": breaker_snapshots()}
+
+
 class Collector(threading.Thread):
-    def __init__(self, input_queue: queue.Queue, total_steps: int):
+    def __init__(self, input_queue: queue.Queue, total_steps: int, cancel_token: Optional[CancellationToken] = None,
+                 budget=None, total_final: bool = True, baseline: Optional[Dict[str, Any]] = None):
         super().__init__()
         self.input_queue = input_queue
         self.total_steps = total_steps
+        # False while the total can still grow (later legs of a multi-stop trip); see set_total()
+        self.total_final = total_final
+        self._total_lock = threading.Lock()
         self.results: Dict[str, SelectedContent] = {}
+        # Same results keyed by integer step index, for cheap ordering
+        self._by_index: Dict[int, SelectedContent] = {}
+        # Results whose ids are not "step_<n>", in arrival order (listed after the numbered ones)
+        self._unnumbered: Dict[str, SelectedContent] = {}
+        # Results in arrival order, so readers can pick up only what is new
+        self.arrivals: List[SelectedContent] = []
+        # Steps that were not processed (they still count towards total_steps)
+        self.skipped: List[SkippedStep] = []
+        # Optional BudgetGovernor, summarised in the report
+        self.budget = budget
+        # See stats_baseline(); defaults to the counters when the collector is created
+        self.baseline = baseline or stats_baseline()
         self.running = True
+        self.log_run_id = current_run_id()
+        self.cancel_token = cancel_token or current_token()
 
     def run(self):
+        bind_run(self.log_run_id)
         logger.info("Collector started.")
         processed_count = 0
         
-        while self.running:
+        while self.running and not self.cancel_token.cancelled:
             try:
                 item = self.input_queue.get(timeout=1)
                 if item is None:
@@ -27,29 +60,79 @@ class Collector(threading.Thread):
                 
                 if isinstance(item, SelectedContent):
                     self.results[item.step_id] = item
+                    index = step_index(item.step_id)
+                    if index >= 0:
+                        self._by_index[index] = item
+                    else:
+                        self._unnumbered[item.step_id] = item
+                    self.arrivals.append(item)
+                    processed_count += 1
+                    logger.info(f"Collected result for {item.step_id}. ({processed_count}/{self._total_label()})", extra=STEP_LOG)
+                    
+                    if self._all_collected(processed_count):
+                        logger.info("All steps collected.")
+                        self.running = False
+                
+                elif isinstance(item, SkippedStep):
+                    self.skipped.append(item)
                     processed_count += 1
-                    logger.info(f"Collected result for {item.step_id}. ({processed_count}/{self.total_steps})")
+                    logger.info(f"Skipped {item.step_id} ({item.reason}). ({processed_count}/{self._total_label()})", extra=STEP_LOG)
                     
-                    if processed_count >= self.total_steps:
+                    if self._all_collected(processed_count):
                         logger.info("All steps collected.")
                         self.running = False
                 
                 self.input_queue.task_done()
             except queue.Empty:
+                # The total may have been settled after the last step arrived
+                if self._all_collected(processed_count):
+                    logger.info("All steps collected.")
+                    self.running = False
                 continue
             except Exception as e:
                 logger.error(f"Error in Collector: {e}")
         
         logger.info("Collector stopped.")
 
+    def set_total(self, total_steps: int, final: bool = True):
+        """
+        Updates the number of steps to wait for, e.g. as the legs of a trip arrive.
+        Once a final total is set, only a larger final total replaces it.
+        """
+        with self._total_lock:
+            if self.total_final and (not final or total_steps < self.total_steps):
+                return
+            self.total_steps = total_steps
+            self.total_final = final
+
+    def _all_collected(self, processed_count: int) -> bool:
+        return self.total_final and processed_count >= self.total_steps
+
+    def _total_label(self) -> str:
+        return f"{self.total_steps}" if self.total_final else f"{self.total_steps}+"
+
+    def results_since(self, cursor: int) -> Tuple[int, List[SelectedContent]]:
+        """
+        Returns (new_cursor, results collected since `cursor`).
+        """
+        new_items = self.arrivals[cursor:]
+        return cursor + len(new_items), new_items
+
     def get_results(self) -> List[SelectedContent]:
-        # Return results sorted by step_id (assuming step_0, step_1...)
-        # We can sort by the integer part of the ID
-        try:
-            sorted_keys = sorted(self.results.keys(), key=lambda x: int(x.split('_')[1]))
-            return [self.results[k] for k in sorted_keys]
-        except Exception:
-            return list(self.results.values())
+        # Results sorted by step index (ids were parsed once, on arrival), then any others as they arrived
+        return [self._by_index[i] for i in sorted(self._by_index)] + list(self._unnumbered.values())
+
+    def llm_tiers(self) -> Dict[str, Dict[str, Any]]:
+        """
+        LLM calls per tier during this trip (see LLMRouter.summary).
+        """
+        return get_llm_router().summary(since=self.baseline["llm_tiers"])
+
+    def breakers(self) -> List[Dict[str, Any]]:
+        """
+        Circuit breaker states, with counters for this trip only.
+        """
+        return breaker_snapshots(since=self.baseline["breakers"])
 
     def generate_report(self):
         results = self.get_results()
@@ -65,4 +148,62 @@ class Collector(threading.Thread):
             if candidate.url:
                 print(f"URL: {candidate.url}")
             print(f"Reasoning: {result.judge_reasoning}")
+            if result.decided_by != "llm":
+                print(f"Decided by: {result.decided_by}")
+            if result.budget_tier != "full":
+                print(f"Budget tier: {result.budget_tier}")
             print("-" * 30)
+
+        if self.skipped:
+            reasons: Dict[str, List[str]] = {}
+            for skipped in self.skipped:
+                reasons.setdefault(skipped.reason, []).append(skipped.step_id)
+            print()
+            for reason, step_ids in reasons.items():
+                print(f"Skipped {len(step_ids)} steps ({reason}): " + ", ".join(step_ids))
+
+        tiers = self.llm_tiers()
+        if tiers:
+            print("\n" + "="*50)
+            print("LLM TIERS")
+            print("="*50)
+            for task, tier in tiers.items():
+                cost = f", ~${tier['estimated_cost']}" if tier["estimated_cost"] is not None else ""
+                print(f"{task} ({tier['provider']} {tier['model'] or 'default model'}): {tier['calls']} calls, "
+                      f"{tier['cached']} cached, {tier['errors']} errors, "
+                      f"p50 {tier['p50_ms']} ms, p95 {tier['p95_ms']} ms, ~{tier['estimated_tokens']} tokens{cost}")
+
+        matching = query_index_summaries()
+        if matching:
+            print("\n" + "="*50)
+            print("SEARCH QUERY MATCHING")
+            print("="*50)
+            for index in matching:
+                print(f"{index['name']}: {index['exact']} normalised and {index['near']} near-duplicate matches "
+                      f"in {index['lookups']} lookups (threshold {index['threshold']})")
+                print("  Best candidate similarity: " + ", ".join(f"{k}: {v}" for k, v in index["best_similarity"].items()))
+
+        tripped = [b for b in self.breakers() if b["times_opened"] or b["short_circuited"]]
+        if tripped:
+            print("\n" + "="*50)
+            print("CIRCUIT BREAKERS")
+            print("="*50)
+            for breaker in tripped:
+                print(f"{breaker['name']}: {breaker['state']}, opened {breaker['times_opened']}x, "
+                      f"{breaker['short_circuited']} calls short-circuited, "
+                      f"{breaker['failures']}/{breaker['calls']} calls failed")
+                if breaker["last_error"]:
+                    print(f"  Last error: {breaker['last_error']}")
+
+        if self.budget:
+            summary = self.budget.summary()
+            print("\n" + "="*50)
+            print("LLM BUDGET")
+            print("="*50)
+            for name, limit in (("llm_calls", "max_llm_calls"), ("estimated_tokens", "max_tokens"), ("seconds", "max_seconds")):
+                print(f"{name}: {summary[name]}" + (f" / {summary[limit]}" if summary[limit] else ""))
+            print(f"Final tier: {summary['tier']}")
+            for tier, step_id in summary["tier_reached_at"].items():
+                print(f"  {tier} from {step_id}")
+            if summary["degradations"]:
+                print("Degradations: " + ", ".join(f"{k} x{v}" for k, v in summary["degradations"].items()))
@@ -1,62 +1,163 @@
+import itertools
 import queue
 import threading
 import time
-from typing import Optional, List
-from core.mapper import RouteFinder
+import uuid
+from typing import Iterable, Iterator, Optional, List, Tuple, Union
+from core.alternatives import AlternativeRoutes
+from core.budget import BudgetGovernor
+from core.horizon import HorizonScheduler, PassedSteps
+from core.mapper import RouteFinder, RouteStream, TripStream
 from core.scheduler import Scheduler
 from core.orchestrator import Orchestrator
-from core.collector import Collector
+from core.collector import Collector, stats_baseline
 from models.content import SelectedContent
-from utils.logger import setup_logger
+from models.step import RouteStep
+from models.step_table import StepTable
+from config import Config
+from utils.cancellation import CancellationToken, bind_token
+from utils.logger import setup_logger, bind_run, LogBuffer, attach_log_buffer
 
 logger = setup_logger("Engine")
 
 class TravelGuideEngine(threading.Thread):
-    def __init__(self, start_location: str, destination: str, limit: Optional[int] = None):
+    def __init__(self, start_location: str, destination: str, limit: Optional[int] = None,
+                 heartbeat_timeout: Optional[float] = None, budget: Optional[BudgetGovernor] = None,
+                 positions: Optional[str] = None, alternatives: Optional[int] = None,
+                 via: Optional[List[str]] = None):
         super().__init__()
         self.start_location = start_location
         self.destination = destination
+        # Stops between start and destination, in order
+        self.via = [stop for stop in via or [] if stop]
         self.limit = limit
         self.running = True
         self.results: List[SelectedContent] = []
         self.error: Optional[str] = None
         self.is_complete = False
+
+        # cancel() stops every stage: queued work is dropped and in-flight LLM calls are aborted
+        self.cancel_token = CancellationToken()
+        # With a heartbeat timeout the run cancels itself once heartbeat() stops being called
+        self.heartbeat_timeout = heartbeat_timeout
+        self.last_heartbeat = time.monotonic()
+        # Per-trip LLM budget (None = unlimited); defaults to the BUDGET_* settings
+        self.budget = budget or BudgetGovernor.from_config()
+        # Driving-horizon mode: a position feed spec (sim, file:PATH, tcp:HOST:PORT)
+        # that decides when each step is scheduled; None schedules the whole route
+        self.positions = positions
+        self.passed_steps = PassedSteps() if positions else None
+        # Alternative routes to offer (1 = just the best route); their shared steps
+        # are processed once. Not combined with the driving horizon, which follows one route,
+        # or with stops (ORS only offers alternatives between two points).
+        self.alternatives = 1 if positions or self.via else max(1, alternatives or Config.ROUTE_ALTERNATIVES)
+        self.alternative_routes: Optional[AlternativeRoutes] = None
+
+        # Bounded log buffer holding only this run's records (shown in the UI).
+        # It is weakly referenced by the logger, so it goes away with the engine.
+        self.run_id = uuid.uuid4().hex[:8]
+        self.log_buffer = attach_log_buffer(LogBuffer(self.run_id, Config.LOG_BUFFER_SIZE))
         
-        # Queues
-        self.task_queue = queue.Queue()
-        self.collector_queue = queue.Queue()
+        # Bounded queues: producers block, so memory does not grow with route length
+        self.task_queue = queue.Queue(maxsize=Config.TASK_QUEUE_SIZE)
+        self.collector_queue = queue.Queue(maxsize=Config.COLLECTOR_QUEUE_SIZE)
         
         # Components
-        self.scheduler = Scheduler(self.task_queue)
-        self.orchestrator = Orchestrator(self.task_queue, self.collector_queue)
+        self.scheduler = Scheduler(self.task_queue, cancel_token=self.cancel_token)
+        self.orchestrator = Orchestrator(self.task_queue, self.collector_queue, cancel_token=self.cancel_token,
+                                         budget=self.budget, passed_steps=self.passed_steps)
         self.collector = None # Initialized after route is found
+        # The route, and the steps handed to the pipeline so far (for the map view)
+        self.route: Optional[Union[RouteStream, TripStream]] = None
+        self.steps = StepTable()
+
+    def cancel(self, reason: str = "cancelled"):
+        """
+        Stops the run from any thread. Returns immediately; join() waits for the threads.
+        """
+        self.cancel_token.cancel(reason)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+    def heartbeat(self):
+        """
+        Called by the UI on every refresh while it is watching this run.
+        """
+        self.last_heartbeat = time.monotonic()
+
+    def _watch_heartbeat(self):
+        interval = min(1.0, self.heartbeat_timeout / 2)
+        while not self.cancel_token.wait(interval) and not self.is_complete:
+            if time.monotonic() - self.last_heartbeat > self.heartbeat_timeout:
+                self.cancel(f"no heartbeat for {self.heartbeat_timeout:g}s")
 
     def run(self):
+        bind_run(self.run_id)
+        bind_token(self.cancel_token)
+        if self.heartbeat_timeout:
+            self.heartbeat()
+            threading.Thread(target=self._watch_heartbeat, name="EngineWatchdog", daemon=True).start()
         try:
             logger.info(f"Starting engine for {self.start_location} -> {self.destination}")
+            # Stats are process-wide; the report only counts this trip's share
+            baseline = stats_baseline()
             
-            # 1. Get Route
+            # 1. Get Route (steps are parsed lazily as the scheduler feeds them)
             mapper = RouteFinder()
-            steps = mapper.get_route(self.start_location, self.destination)
+            if self.alternatives > 1:
+                routes = mapper.stream_alternatives(self.start_location, self.destination, self.alternatives)
+                route = routes[0] if routes else None
+            elif self.via:
+                # Returns after the first leg; later legs keep arriving while it runs
+                route = mapper.stream_trip([self.start_location, *self.via, self.destination])
+            else:
+                route = mapper.stream_route(self.start_location, self.destination)
+            
+            if self.cancelled:
+                self._finish_cancelled()
+                return
             
-            if not steps:
+            if not route:
                 self.error = "No route found."
                 logger.error(self.error)
                 self.is_complete = True
                 return
 
-            if self.limit and self.limit > 0:
-                logger.info(f"Limiting to {self.limit} steps.")
-                steps = steps[:self.limit]
+            self.route = route
+            if self.alternatives > 1:
+                # Every alternative is parsed up front to find the steps they share
+                limited = [itertools.islice(r, self.limit) if self.limit and self.limit > 0 else r for r in routes]
+                self.alternative_routes = AlternativeRoutes(limited)
+                total_steps = len(self.alternative_routes.steps)
+                steps = self._record_steps(self.alternative_routes.steps)
+            else:
+                total_steps = route.step_count
+                steps = self._record_steps(route)
+                if self.limit and self.limit > 0:
+                    logger.info(f"Limiting to {self.limit} steps.")
+                    total_steps = min(total_steps, self.limit)
+                    steps = itertools.islice(steps, self.limit)
 
             # 2. Initialize Collector
-            self.collector = Collector(self.collector_queue, total_steps=len(steps))
-            
-            # 3. Schedule
-            self.scheduler.schedule_steps(steps)
+            self.collector = Collector(self.collector_queue, total_steps=total_steps, cancel_token=self.cancel_token,
+                                       budget=self.budget, total_final=not isinstance(route, TripStream),
+                                       baseline=baseline)
+            if isinstance(route, TripStream):
+                # The total grows as legs arrive
+                route.on_progress(self._update_total)
             
-            # 4. Start Components
+            # 3. Start Components; the scheduler produces on its own thread
             self.collector.start()
+            if self.positions:
+                # Steps are queued as the car approaches them
+                self.scheduler, positions = HorizonScheduler.for_route(
+                    self.task_queue, route.geometry(), steps, self.positions, self.passed_steps, self.cancel_token
+                )
+                self.scheduler.start(positions)
+            else:
+                self.scheduler.start(steps)
             self.orchestrator.start() # Blocks until agents are done
             
             # 5. Wait for Collector
@@ -64,6 +165,14 @@ class TravelGuideEngine(threading.Thread):
             
             # 6. Get Results
             self.results = self.collector.get_results()
+            if self.scheduler.error:
+                self.error = self.scheduler.error
+            if isinstance(route, TripStream) and route.failed_legs:
+                self.error = "No route found for " + ", ".join(f"{a} -> {b}" for a, b in route.failed_legs)
+                logger.error(self.error)
+            if self.cancelled:
+                self._finish_cancelled()
+                return
             self.is_complete = True
             logger.info("Engine execution complete.")
             
@@ -72,6 +181,40 @@ class TravelGuideEngine(threading.Thread):
             logger.error(f"Engine error: {e}")
             self.is_complete = True
 
+    def _update_total(self, step_count: int, complete: bool):
+        if self.limit and self.limit > 0 and step_count >= self.limit:
+            self.collector.set_total(self.limit)
+        else:
+            self.collector.set_total(step_count, final=complete)
+
+    def _record_steps(self, steps: Iterable[RouteStep]) -> Iterator[RouteStep]:
+        # Compact copy of each step as it is scheduled
+        for step in steps:
+            self.steps.append(step)
+            yield step
+
+    def _finish_cancelled(self):
+        self.error = f"Cancelled: {self.cancel_token.reason}"
+        self.is_complete = True
+        logger.info(f"Engine stopped early. {self.error}")
+
+    def get_new_results(self, cursor: int) -> Tuple[int, List[SelectedContent]]:
+        """
+        Incremental view of the results for the UI: returns (new_cursor, new results).
+        """
+        if not self.collector:
+            return cursor, []
+        return self.collector.results_since(cursor)
+
+    def get_itineraries(self) -> List[List[SelectedContent]]:
+        """
+        One itinerary per alternative route (just the results without alternatives).
+        """
+        results = self.collector.get_results() if self.collector else []
+        if not self.alternative_routes:
+            return [results]
+        return [self.alternative_routes.itinerary(i, results) for i in range(len(self.alternative_routes))]
+
     def get_progress(self) -> float:
         if not self.collector:
             return 0.0
@@ -86,7 +229,7 @@ class TravelGuideEngine(threading.Thread):
         # We can check how many results are in.
         # But Collector.results is a dict.
         try:
-            current = len(self.collector.results)
+            current = len(self.collector.results) + len(self.collector.skipped)
             total = self.collector.total_steps
             return current / total if total > 0 else 0.0
         except:
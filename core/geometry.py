@@ -0,0 +1,193 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import Config
+from utils.cache import get_cache
+from utils.logger import setup_logger
+
+logger = setup_logger("Geometry")
+
+EARTH_RADIUS_M = 6371000.0
+
+# (min_lon, min_lat, max_lon, max_lat)
+Bounds = Tuple[float, float, float, float]
+
+
+def parse_zoom_tolerances(value: str) -> Dict[int, float]:
+    """
+    "5:2000,8:300" -> {5: 2000.0, 8: 300.0} (zoom level -> tolerance in meters).
+    """
+    tolerances = {}
+    for part in value.split(","):
+        if part.strip():
+            zoom, meters = part.split(":")
+            tolerances[int(zoom)] = float(meters)
+    return dict(sorted(tolerances.items()))
+
+
+def _project(points: Sequence[Sequence[float]]) -> List[Tuple[float, float]]:
+    # Equirectangular projection around the route's mean latitude; plenty
+    # accurate for comparing distances of a few meters to a few km
+    mean_lat = math.radians(sum(p[1] for p in points) / len(points))
+    kx = math.cos(mean_lat) * math.pi / 180 * EARTH_RADIUS_M
+    ky = math.pi / 180 * EARTH_RADIUS_M
+    return [(p[0] * kx, p[1] * ky) for p in points]
+
+
+def douglas_peucker(points: Sequence[Sequence[float]], tolerance_m: float,
+                    indices: Optional[List[int]] = None) -> List[int]:
+    """
+    Indices of the [lon, lat] points kept by Douglas–Peucker at `tolerance_m`.
+    `indices` restricts the input to a subset (e.g. a finer level's result),
+    which is how coarser levels are derived cheaply. Iterative, so long
+    routes do not hit the recursion limit.
+    """
+    indices = list(range(len(points))) if indices is None else indices
+    if len(indices) < 3:
+        return list(indices)
+    xy = _project([points[i] for i in indices])
+    keep = [False] * len(indices)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance_m * tolerance_m
+
+    stack = [(0, len(indices) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+        farthest, farthest_sq = -1, tolerance_sq
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if length_sq:
+                t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+                ex, ey = x1 + t * dx - px, y1 + t * dy - py
+            else:
+                ex, ey = px - x1, py - y1
+            distance_sq = ex * ex + ey * ey
+            if distance_sq > farthest_sq:
+                farthest, farthest_sq = i, distance_sq
+        if farthest >= 0:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [index for index, kept in zip(indices, keep) if kept]
+
+
+def bounds_of(points: Sequence[Sequence[float]]) -> Bounds:
+    lons = [p[0] for p in points]
+    lats = [p[1] for p in points]
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def viewport(center_lat: float, center_lng: float, zoom: float,
+             width_px: int = 800, height_px: int = 500) -> Bounds:
+    """
+    Approximate bounds of a Web-Mercator map view (256 px tiles).
+    """
+    degrees_per_px = 360.0 / (256 * 2 ** zoom)
+    half_w = width_px / 2 * degrees_per_px
+    half_h = height_px / 2 * degrees_per_px * math.cos(math.radians(center_lat))
+    return center_lng - half_w, center_lat - half_h, center_lng + half_w, center_lat + half_h
+
+
+def clip_path(path: List[Sequence[float]], bounds: Bounds) -> List[List[Sequence[float]]]:
+    """
+    Splits a polyline into the runs of segments that may cross `bounds`
+    (by bounding box, so a long segment passing through the view is kept).
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    runs, current = [], []
+    for a, b in zip(path, path[1:]):
+        crosses = (min(a[0], b[0]) <= max_lon and max(a[0], b[0]) >= min_lon
+                   and min(a[1], b[1]) <= max_lat and max(a[1], b[1]) >= min_lat)
+        if crosses:
+            if not current:
+                current.append(a)
+            current.append(b)
+        elif current:
+            runs.append(current)
+            current = []
+    if current:
+        runs.append(current)
+    return runs
+
+
+def visible_rows(lats: Sequence[float], lngs: Sequence[float], bounds: Bounds, limit: int,
+                 rows: Optional[Sequence[int]] = None) -> List[int]:
+    """
+    Rows (of parallel lat/lng columns) inside `bounds`, thinned evenly to at
+    most `limit`. `rows` restricts the candidates, e.g. to steps with content.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounds
+    candidates = range(min(len(lats), len(lngs))) if rows is None else rows
+    inside = [row for row in candidates if min_lat <= lats[row] <= max_lat and min_lon <= lngs[row] <= max_lon]
+    if limit and len(inside) > limit:
+        stride = len(inside) / limit
+        inside = [inside[int(i * stride)] for i in range(limit)]
+    return inside
+
+
+class SimplifiedRoute:
+    """
+    A route polyline at several levels of detail, one per zoom tolerance.
+    Levels are derived finest first, each from the previous one, so the
+    full-resolution geometry is scanned once.
+    """
+    def __init__(self, levels: Dict[int, List[List[float]]], bounds: Bounds, points: int):
+        self.levels = dict(sorted(levels.items()))
+        self.bounds = bounds
+        # Points in the full-resolution geometry
+        self.points = points
+
+    @classmethod
+    def build(cls, geometry: Sequence[Sequence[float]],
+              tolerances: Optional[Dict[int, float]] = None) -> "SimplifiedRoute":
+        tolerances = tolerances or parse_zoom_tolerances(Config.MAP_ZOOM_TOLERANCES)
+        if not geometry:
+            return cls({}, (0.0, 0.0, 0.0, 0.0), 0)
+        levels = {}
+        indices = None
+        # Finest (highest zoom, smallest tolerance) first
+        for zoom, tolerance in sorted(tolerances.items(), key=lambda item: item[1]):
+            indices = douglas_peucker(geometry, tolerance, indices)
+            levels[zoom] = [[round(geometry[i][0], 6), round(geometry[i][1], 6)] for i in indices]
+        return cls(levels, bounds_of(geometry), len(geometry))
+
+    def for_zoom(self, zoom: float) -> List[List[float]]:
+        """
+        The level meant for `zoom`: the most detailed one at or below it.
+        """
+        if not self.levels:
+            return []
+        chosen = next(iter(self.levels))
+        for level in self.levels:
+            if level <= zoom:
+                chosen = level
+        return self.levels[chosen]
+
+    def to_dict(self) -> Dict:
+        return {"levels": {str(z): path for z, path in self.levels.items()},
+                "bounds": list(self.bounds), "points": self.points}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SimplifiedRoute":
+        return cls({int(z): path for z, path in data["levels"].items()}, tuple(data["bounds"]), data["points"])
+
+
+def simplified_route(key: str, geometry_loader) -> SimplifiedRoute:
+    """
+    The cached level-of-detail polylines for a route (see RouteFinder's cache
+    key), computed on first use from `geometry_loader()`.
+    """
+    cache = get_cache("route_lod")
+    tolerances = Config.MAP_ZOOM_TOLERANCES
+    # The tolerances are part of the key, so changing them recomputes
+    cache_key = f"{key}|{tolerances}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return SimplifiedRoute.from_dict(cached)
+    route = SimplifiedRoute.build(geometry_loader(), parse_zoom_tolerances(tolerances))
+    logger.info(f"Simplified route {key[:8]}: {route.points} points -> "
+                + ", ".join(f"z{z}: {len(path)}" for z, path in route.levels.items()))
+    cache.put(cache_key, route.to_dict())
+    return route
@@ -0,0 +1,346 @@
+import bisect
+import json
+import math
+import queue
+import socket
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from config import Config
+from models.content import SkippedStep
+from models.step import RouteStep
+from utils.cancellation import CancellationToken, current_token, put_unless_cancelled
+from utils.logger import setup_logger, bind_run, current_run_id
+
+logger = setup_logger("Horizon")
+
+EARTH_RADIUS_M = 6371000.0
+
+
+@dataclass
+class Position:
+    lat: float
+    lng: float
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class PassedSteps:
+    """
+    Thread-safe set of step ids the vehicle has already driven past.
+    Agents check it to drop queued work for those steps.
+    """
+    def __init__(self):
+        self._ids: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, step_id: str):
+        with self._lock:
+            self._ids.add(step_id)
+
+    def __contains__(self, step_id: str) -> bool:
+        with self._lock:
+            return step_id in self._ids
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ids)
+
+
+class RouteTracker:
+    """
+    Maps positions onto the route polyline.
+
+    Progress is measured in meters along the geometry and in seconds along
+    the steps' ORS durations. It only moves forward, so GPS jitter near a
+    step boundary does not un-pass a step.
+    """
+    # Segments searched around the last match before falling back to the whole route
+    SEARCH_BEHIND = 5
+    SEARCH_AHEAD = 200
+
+    def __init__(self, geometry: Sequence[Sequence[float]], steps: List[RouteStep]):
+        # Geometry comes as [lon, lat]
+        self.points: List[Tuple[float, float]] = [(p[1], p[0]) for p in geometry]
+        self.cumulative = [0.0]
+        for a, b in zip(self.points, self.points[1:]):
+            self.cumulative.append(self.cumulative[-1] + haversine_m(a[0], a[1], b[0], b[1]))
+        self.total_m = self.cumulative[-1]
+
+        self.steps = steps
+        # Per step: (start_m, end_m, start_s, end_s)
+        self.spans: List[Tuple[float, float, float, float]] = []
+        meters = seconds = 0.0
+        for step in steps:
+            if step.way_points and self.points:
+                first = min(step.way_points[0], len(self.cumulative) - 1)
+                last = min(step.way_points[-1], len(self.cumulative) - 1)
+                start_m, end_m = self.cumulative[first], self.cumulative[last]
+            else:
+                start_m = end_m = meters
+            duration = step.duration_s
+            self.spans.append((start_m, end_m, seconds, seconds + duration))
+            meters, seconds = end_m, seconds + duration
+        self.total_s = seconds
+        self._starts_m = [span[0] for span in self.spans]
+
+        self.progress_m = 0.0
+        self.off_route_m = 0.0
+        self._segment = 0
+
+    def _project(self, lat: float, lng: float, start: int, end: int) -> Tuple[float, float, int]:
+        """
+        Closest point on segments [start, end): (meters along, distance off route, segment).
+        Uses a local flat projection, which is accurate at segment scale.
+        """
+        best = (self.progress_m, float("inf"), self._segment)
+        cos_lat = math.cos(math.radians(lat))
+        for i in range(start, end):
+            (lat1, lng1), (lat2, lng2) = self.points[i], self.points[i + 1]
+            ax, ay = (lng1 - lng) * cos_lat, lat1 - lat
+            bx, by = (lng2 - lng) * cos_lat, lat2 - lat
+            dx, dy = bx - ax, by - ay
+            length2 = dx * dx + dy * dy
+            t = 0.0 if length2 == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / length2))
+            off = math.hypot(ax + t * dx, ay + t * dy) * (math.pi / 180) * EARTH_RADIUS_M
+            if off < best[1]:
+                along = self.cumulative[i] + t * (self.cumulative[i + 1] - self.cumulative[i])
+                best = (along, off, i)
+        return best
+
+    def locate(self, position: Position) -> float:
+        """
+        Updates and returns the progress in meters for a new position.
+        """
+        segments = len(self.points) - 1
+        if segments < 1:
+            return self.progress_m
+        start = max(0, self._segment - self.SEARCH_BEHIND)
+        end = min(segments, self._segment + self.SEARCH_AHEAD)
+        along, off, segment = self._project(position.lat, position.lng, start, end)
+        if off > Config.HORIZON_OFF_ROUTE_METERS and (start > 0 or end < segments):
+            along, off, segment = self._project(position.lat, position.lng, 0, segments)
+
+        self.off_route_m = off
+        if off > Config.HORIZON_OFF_ROUTE_METERS:
+            logger.warning(f"Position is {off:.0f} m off the route; keeping progress at {self.progress_m:.0f} m")
+        elif along >= self.progress_m:
+            self.progress_m, self._segment = along, segment
+        return self.progress_m
+
+    def seconds_at(self, meters: float) -> float:
+        """
+        Estimated driving time from the start to `meters`, from the step durations.
+        """
+        i = max(0, bisect.bisect_right(self._starts_m, meters) - 1)
+        if not self.spans:
+            return 0.0
+        start_m, end_m, start_s, end_s = self.spans[i]
+        if end_m <= start_m:
+            return end_s if meters >= end_m else start_s
+        fraction = min(1.0, max(0.0, (meters - start_m) / (end_m - start_m)))
+        return start_s + fraction * (end_s - start_s)
+
+    def point_at(self, meters: float) -> Position:
+        if not self.points:
+            return Position(0.0, 0.0)
+        meters = max(0.0, min(meters, self.total_m))
+        i = min(max(0, bisect.bisect_right(self.cumulative, meters) - 1), len(self.points) - 2)
+        if i < 0:
+            return Position(*self.points[0])
+        length = self.cumulative[i + 1] - self.cumulative[i]
+        t = 0.0 if length == 0 else (meters - self.cumulative[i]) / length
+        (lat1, lng1), (lat2, lng2) = self.points[i], self.points[i + 1]
+        return Position(lat1 + t * (lat2 - lat1), lng1 + t * (lng2 - lng1))
+
+
+# ------------------------------------------------------------ position sources
+
+def parse_position(line: str) -> Optional[Position]:
+    """
+    Accepts `{"lat": .., "lng": ..}` (or "lon") JSON, or `lat,lng` text.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    try:
+        if line.startswith("{"):
+            data = json.loads(line)
+            return Position(float(data["lat"]), float(data.get("lng", data.get("lon"))))
+        lat, lng = line.split(",")[:2]
+        return Position(float(lat), float(lng))
+    except (ValueError, KeyError, TypeError):
+        logger.warning(f"Ignoring unreadable position: {line[:80]}")
+        return None
+
+
+def simulated_positions(tracker: RouteTracker, speedup: float = 1.0, interval: float = 1.0,
+                        cancel_token: Optional[CancellationToken] = None) -> Iterator[Position]:
+    """
+    Replays a drive along the route geometry at the route's average speed,
+    one position every `interval` seconds (`speedup` times faster than real time).
+    """
+    token = cancel_token or current_token()
+    speed = tracker.total_m / tracker.total_s if tracker.total_s > 0 else 13.9
+    meters = 0.0
+    while meters < tracker.total_m:
+        yield tracker.point_at(meters)
+        if token.wait(interval):
+            return
+        meters += speed * interval * speedup
+    yield tracker.point_at(tracker.total_m)
+
+
+def file_positions(path: str) -> Iterator[Position]:
+    with open(path) as f:
+        for line in f:
+            position = parse_position(line)
+            if position:
+                yield position
+
+
+def socket_positions(host: str, port: int, cancel_token: Optional[CancellationToken] = None) -> Iterator[Position]:
+    """
+    Reads newline-separated positions from a TCP feed until it closes.
+    """
+    token = cancel_token or current_token()
+    with socket.create_connection((host, port), timeout=Config.HORIZON_FEED_TIMEOUT) as conn:
+        # The timeout is for connecting; a parked car may send nothing for a while
+        conn.settimeout(None)
+        with token.on_cancel(lambda: conn.shutdown(socket.SHUT_RDWR)):
+            for line in conn.makefile("r"):
+                position = parse_position(line)
+                if position:
+                    yield position
+
+
+def open_position_source(spec: str, tracker: RouteTracker,
+                         cancel_token: Optional[CancellationToken] = None) -> Iterator[Position]:
+    """
+    `sim[:SPEEDUP]`, `file:PATH` (or a plain path) or `tcp:HOST:PORT`.
+    """
+    kind, _, rest = spec.partition(":")
+    if kind == "sim":
+        return simulated_positions(tracker, float(rest) if rest else Config.HORIZON_SIM_SPEEDUP,
+                                   Config.HORIZON_SIM_INTERVAL, cancel_token)
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        return socket_positions(host or "localhost", int(port), cancel_token)
+    return file_positions(rest if kind == "file" else spec)
+
+
+# ------------------------------------------------------------------ scheduler
+
+class HorizonScheduler:
+    """
+    Scheduler for the driving-horizon mode: steps are queued only once they
+    start within `horizon_seconds` (or `horizon_meters`) ahead of the car.
+
+    Steps the car has passed are added to `passed` so agents drop queued work
+    for them; steps passed before they were ever queued go to the collector
+    as skipped. Same start() interface as Scheduler.
+    """
+    def __init__(self, task_queue: queue.Queue, tracker: RouteTracker, passed: PassedSteps,
+                 horizon_seconds: Optional[float] = None, horizon_meters: Optional[float] = None,
+                 cancel_token: Optional[CancellationToken] = None):
+        self.task_queue = task_queue
+        self.tracker = tracker
+        self.passed = passed
+        self.horizon_seconds = Config.HORIZON_SECONDS if horizon_seconds is None else horizon_seconds
+        self.horizon_meters = Config.HORIZON_METERS if horizon_meters is None else horizon_meters
+        self.cancel_token = cancel_token or current_token()
+        # Why scheduling stopped early, if the position feed failed
+        self.error: Optional[str] = None
+        self.scheduled = 0
+        self.skipped = 0
+        self._next_schedule = 0
+        self._next_pass = 0
+
+    def _in_horizon(self, index: int, progress_m: float, progress_s: float) -> bool:
+        start_m, _, start_s, _ = self.tracker.spans[index]
+        if self.horizon_meters and start_m - progress_m <= self.horizon_meters:
+            return True
+        return bool(self.horizon_seconds) and start_s - progress_s <= self.horizon_seconds
+
+    def _put(self, item) -> bool:
+        return put_unless_cancelled(self.task_queue, item, self.cancel_token)
+
+    def _skip(self, step: RouteStep, reason: str) -> bool:
+        self.skipped += 1
+        return self._put(SkippedStep(step.id, reason))
+
+    def update(self, position: Position) -> bool:
+        """
+        Handles one position. Returns False once cancelled.
+        """
+        steps, spans = self.tracker.steps, self.tracker.spans
+        progress_m = self.tracker.locate(position)
+        progress_s = self.tracker.seconds_at(progress_m)
+
+        # Steps that end behind the car (the final step only on arrival)
+        while self._next_pass < len(steps) and (
+                spans[self._next_pass][1] < progress_m or progress_m >= self.tracker.total_m):
+            step = steps[self._next_pass]
+            self._next_pass += 1
+            if self._next_pass > self._next_schedule:
+                # Never queued: nothing to cancel, just account for it
+                self._next_schedule = self._next_pass
+                if not self._skip(step, "passed before it was scheduled"):
+                    return False
+            else:
+                self.passed.add(step.id)
+
+        while self._next_schedule < len(steps) and self._in_horizon(self._next_schedule, progress_m, progress_s):
+            if not self._put(steps[self._next_schedule]):
+                return False
+            self._next_schedule += 1
+            self.scheduled += 1
+        return True
+
+    def schedule_positions(self, positions: Iterable[Position]):
+        logger.info(f"Horizon scheduling {len(self.tracker.steps)} steps "
+                    f"({self.horizon_seconds:g} s / {self.horizon_meters:g} m ahead)...")
+        try:
+            for position in positions:
+                if not self.update(position):
+                    logger.info("Horizon scheduling cancelled.")
+                    return
+        except Exception as e:
+            self.error = f"Position feed failed: {e}"
+            logger.error(self.error)
+
+        # Feed ended (arrival or disconnect): account for whatever was never queued
+        for step in self.tracker.steps[self._next_schedule:]:
+            if not self._skip(step, "position feed ended"):
+                return
+        self._next_schedule = len(self.tracker.steps)
+        put_unless_cancelled(self.task_queue, None, self.cancel_token)
+        logger.info(f"Horizon scheduling complete ({self.scheduled} scheduled, {self.skipped} skipped, "
+                    f"{len(self.passed)} passed while queued).")
+
+    @classmethod
+    def for_route(cls, task_queue: queue.Queue, geometry: Sequence[Sequence[float]], steps: Iterable[RouteStep],
+                  positions: str, passed: PassedSteps, cancel_token: Optional[CancellationToken] = None,
+                  **kwargs) -> Tuple["HorizonScheduler", Iterator[Position]]:
+        """
+        Builds the tracker and scheduler for a route plus the position source for `positions` (see open_position_source).
+        """
+        tracker = RouteTracker(geometry, list(steps))
+        scheduler = cls(task_queue, tracker, passed, cancel_token=cancel_token, **kwargs)
+        return scheduler, open_position_source(positions, tracker, cancel_token)
+
+    def start(self, positions: Iterable[Position]) -> threading.Thread:
+        run_id = current_run_id()
+
+        def produce():
+            bind_run(run_id)
+            self.schedule_positions(positions)
+
+        producer = threading.Thread(target=produce, name="HorizonScheduler", daemon=True)
+        producer.start()
+        return producer
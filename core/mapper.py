@@ -1,14 +1,150 @@
-import requests
-import json
+import dataclasses
 import os
 import hashlib
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple, Union
 from config import Config
+from core.geometry import SimplifiedRoute, simplified_route
+from core.route_cache import CachedRoute, RouteCache
 from models.step import RouteStep
-from utils.logger import setup_logger
+from models.step_table import StepTable
+from utils.cancellation import bind_token, current_token
+from utils.circuit_breaker import get_breaker, is_failure_status
+from utils.logger import setup_logger, bind_run, current_run_id
+from utils.replay import get_recorder
 
 logger = setup_logger("RouteFinder")
 
+class RouteStream:
+    """
+    A route whose RouteSteps are built lazily. `step_count` is known up
+    front (the collector needs it); iterating starts a fresh pass.
+    """
+    def __init__(self, step_count: int, factory: Callable[[], Iterator[RouteStep]],
+                 geometry: Optional[Callable[[], List[Sequence[float]]]] = None, key: str = "",
+                 points: Optional[Callable[[], int]] = None):
+        self.step_count = step_count
+        self._factory = factory
+        self._geometry = geometry
+        # Cheap geometry length, when it can be had without loading the points
+        self._points = points
+        # Route cache key, also used for derived data such as the map polylines
+        self.key = key
+
+    def geometry(self) -> List[Sequence[float]]:
+        """
+        The route polyline as [lon, lat] points (loaded on demand).
+        """
+        return self._geometry() if self._geometry else []
+
+    def point_count(self) -> int:
+        return self._points() if self._points else len(self.geometry())
+
+    def simplified(self) -> SimplifiedRoute:
+        """
+        Level-of-detail polylines for the map, computed once per route and cached.
+        """
+        return simplified_route(self.key, self.geometry)
+
+    def __len__(self) -> int:
+        return self.step_count
+
+    def __iter__(self) -> Iterator[RouteStep]:
+        return self._factory()
+
+    def table(self) -> StepTable:
+        """
+        All steps, materialised column-wise.
+        """
+        return StepTable.from_steps(self)
+
+class TripStream:
+    """
+    A route through several stops, made of one RouteStream per leg.
+
+    Legs arrive on their own threads (see RouteFinder.stream_trip). Iterating
+    yields every leg's steps in order, renumbered trip-wide, with way points
+    into the concatenated geometry; it only waits for the leg it is about to
+    yield. `step_count` grows as legs arrive and is final once `complete`.
+    Legs without a route are skipped and listed in `failed_legs`.
+    """
+    def __init__(self, legs: List[Tuple[str, str]], futures: List[Future], key: str = ""):
+        self.legs = legs
+        self._futures = futures
+        self.key = key
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[int, bool], None]] = []
+        for future in futures:
+            future.add_done_callback(lambda _: self._notify())
+
+    def _arrived(self) -> List[Optional[RouteStream]]:
+        return [future.result() for future in self._futures if future.done()]
+
+    @property
+    def complete(self) -> bool:
+        return all(future.done() for future in self._futures)
+
+    @property
+    def step_count(self) -> int:
+        return sum(leg.step_count for leg in self._arrived() if leg)
+
+    @property
+    def failed_legs(self) -> List[Tuple[str, str]]:
+        return [leg for leg, future in zip(self.legs, self._futures) if future.done() and future.result() is None]
+
+    def on_progress(self, callback: Callable[[int, bool], None]):
+        """
+        Calls `callback(step_count, complete)` now and whenever a leg arrives.
+        """
+        with self._lock:
+            self._listeners.append(callback)
+            callback(self.step_count, self.complete)
+
+    def _notify(self):
+        # Snapshots are taken and delivered under the lock, so legs finishing at
+        # the same time cannot deliver an older count after a newer one
+        with self._lock:
+            step_count, complete = self.step_count, self.complete
+            for callback in self._listeners:
+                callback(step_count, complete)
+
+    def routes(self) -> Iterator[Optional[RouteStream]]:
+        """
+        Each leg's route in order, waiting for legs still being fetched.
+        """
+        for future in self._futures:
+            yield future.result()
+
+    def geometry(self) -> List[Sequence[float]]:
+        """
+        All legs' polylines joined (waits for every leg).
+        """
+        return [point for leg in self.routes() if leg for point in leg.geometry()]
+
+    def simplified(self) -> SimplifiedRoute:
+        return simplified_route(self.key, self.geometry)
+
+    def __len__(self) -> int:
+        return self.step_count
+
+    def __iter__(self) -> Iterator[RouteStep]:
+        first_step, first_point = 0, 0
+        for (origin, destination), leg in zip(self.legs, self.routes()):
+            if leg is None:
+                logger.warning(f"No route for leg {origin} -> {destination}; skipping it")
+                continue
+            for step in leg:
+                way_points = step.way_points
+                if way_points:
+                    way_points = (way_points[0] + first_point, way_points[1] + first_point)
+                yield dataclasses.replace(step, index=first_step + step.index, way_points=way_points)
+            first_step += leg.step_count
+            first_point += leg.point_count()
+
+    def table(self) -> StepTable:
+        return StepTable.from_steps(self)
+
 class RouteFinder:
     def __init__(self):
         if not Config.ORS_API_KEY:
@@ -16,38 +152,49 @@ class RouteFinder:
             raise ValueError("ORS_API_KEY is required.")
         
         self.api_key = Config.ORS_API_KEY
-        self.base_url = "https://api.openrouteservice.org/v2/directions/driving-car"
-        self.cache_dir = "cache"
-        self.cache_file = os.path.join(self.cache_dir, "route_cache.json")
+        self.base_url = f"{Config.ORS_BASE_URL}/v2/directions/driving-car"
+        self.cache_dir = Config.CACHE_DIR
+        # Geocoding and directions share one breaker; cached routes are served while it is open
+        self.breaker = get_breaker("ors", Config.ORS_BASE_URL)
         
         # Ensure cache directory exists
         os.makedirs(self.cache_dir, exist_ok=True)
         
-        # Load cache
-        self.cache = self._load_cache()
-
-    def _load_cache(self) -> Dict[str, Any]:
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                logger.warning("Cache file is corrupted. Starting with empty cache.")
-                return {}
-        return {}
-
-    def _save_cache(self):
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=4)
-        except Exception as e:
-            logger.error(f"Failed to save cache: {e}")
+        # Compact per-route cache; the old single JSON file is migrated on first use
+        self.cache = RouteCache(
+            os.path.join(self.cache_dir, "routes"),
+            legacy_file=os.path.join(self.cache_dir, "route_cache.json")
+        )
 
     def _get_cache_key(self, origin: str, destination: str) -> str:
         # Create a unique key based on origin and destination
         key_str = f"{origin.lower()}|{destination.lower()}"
         return hashlib.md5(key_str.encode()).hexdigest()
 
+    def _ors_get(self, url: str, params: Dict[str, Any]):
+        """
+        GET against ORS through the circuit breaker.
+        Returns None without a request while the breaker is open.
+        """
+        return self._ors_request("GET", url, params=params)
+
+    def _ors_request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                     json_body: Optional[Any] = None, headers: Optional[Dict[str, str]] = None):
+        if not self.breaker.allow():
+            logger.warning(f"ORS circuit open, not calling {url}")
+            return None
+        try:
+            response = get_recorder().http_request("ors", method, url, params=params,
+                                                   json_body=json_body, headers=headers)
+        except Exception as e:
+            self.breaker.record_failure(str(e))
+            raise
+        if is_failure_status(response.status_code):
+            self.breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.breaker.record_success()
+        return response
+
     def _geocode(self, address: str) -> Optional[List[float]]:
         """
         Helper to geocode an address using ORS Geocoding API.
@@ -61,15 +208,15 @@ class RouteFinder:
         # The requirements said "Start address" and "Destination address".
         # So we MUST geocode.
         
-        geocode_url = "https://api.openrouteservice.org/geocode/search"
+        geocode_url = f"{Config.ORS_BASE_URL}/geocode/search"
         params = {
             "api_key": self.api_key,
             "text": address,
             "size": 1
         }
         try:
-            response = requests.get(geocode_url, params=params)
-            if response.status_code == 200:
+            response = self._ors_get(geocode_url, params)
+            if response is not None and response.status_code == 200:
                 data = response.json()
                 if data['features']:
                     # ORS returns [lon, lat]
@@ -79,115 +226,244 @@ class RouteFinder:
         
         return None
 
-    def get_route(self, origin: str, destination: str) -> List[RouteStep]:
+    def get_route(self, origin: str, destination: str, via: Optional[List[str]] = None) -> StepTable:
+        """
+        Fetches the route from ORS API or cache, through the `via` stops if given.
+        """
+        route = self.stream_trip([origin, *via, destination]) if via else self.stream_route(origin, destination)
+        return route.table() if route else StepTable()
+
+    def stream_trip(self, stops: List[str]) -> Optional[Union[RouteStream, "TripStream"]]:
+        """
+        A route through every stop, in order. Each leg is routed (or read from
+        the cache) on its own and concurrently; stops of uncached legs are
+        geocoded in parallel. Returns once the first leg is known, so the
+        pipeline can start while later legs are still being fetched.
+        Returns None if the first leg has no route.
+        """
+        if len(stops) == 2:
+            return self.stream_route(*stops)
+        legs = list(zip(stops, stops[1:]))
+        workers = max(1, Config.ROUTE_LEG_CONCURRENCY)
+
+        # Geocoding and leg requests run in separate pools, so legs waiting on
+        # their stops can never hold every worker
+        geocode_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Geocode")
+        leg_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="RouteLeg")
+        uncached = {stop for origin, destination in legs
+                    if self._get_cache_key(origin, destination) not in self.cache for stop in (origin, destination)}
+        coordinates = {stop: geocode_pool.submit(self._geocode, stop) for stop in stops if stop in uncached}
+        geocoder = lambda stop: coordinates[stop].result() if stop in coordinates else self._geocode(stop)
+        run_id, token = current_run_id(), current_token()
+
+        def route_leg(origin: str, destination: str) -> Optional[RouteStream]:
+            bind_run(run_id)
+            bind_token(token)
+            try:
+                return self.stream_route(origin, destination, geocoder=geocoder)
+            except Exception as e:
+                logger.error(f"Failed to route leg {origin} -> {destination}: {e}")
+                return None
+
+        logger.info(f"Routing {len(legs)} legs through {len(stops) - 2} stops ({len(uncached)} stops to geocode)")
+        futures = [leg_pool.submit(route_leg, origin, destination) for origin, destination in legs]
+        geocode_pool.shutdown(wait=False)
+        leg_pool.shutdown(wait=False)
+
+        if futures[0].result() is None:
+            logger.error(f"No route found for the first leg {legs[0][0]} -> {legs[0][1]}.")
+            return None
+        key = hashlib.md5("|".join(s.lower() for s in stops).encode()).hexdigest()
+        return TripStream(legs, futures, key=key)
+
+    def stream_route(self, origin: str, destination: str,
+                     geocoder: Optional[Callable[[str], Optional[List[float]]]] = None) -> Optional[RouteStream]:
         """
-        Fetches the route from ORS API or cache.
+        Like get_route, but RouteSteps are built lazily while the pipeline consumes them.
+        Returns None if no route was found. `geocoder` replaces _geocode (see stream_trip).
         """
         cache_key = self._get_cache_key(origin, destination)
         
-        if cache_key in self.cache:
+        cached = self.cache.get(cache_key)
+        if cached:
             logger.info(f"Route found in cache for {origin} -> {destination}")
-            route_data = self.cache[cache_key]
-        else:
-            logger.info(f"Fetching route from ORS for {origin} -> {destination}")
+            return self._cached_stream(cached, cache_key)
+
+        logger.info(f"Fetching route from ORS for {origin} -> {destination}")
+        
+        # Geocode origin and destination
+        geocoder = geocoder or self._geocode
+        start_coords = geocoder(origin)
+        end_coords = geocoder(destination)
+        
+        if not start_coords or not end_coords:
+            logger.error("Failed to geocode origin or destination.")
+            return None
+        
+        try:
+            # Request driving directions
+            # ORS expects [[start_lon, start_lat], [end_lon, end_lat]]
+            params = {
+                "api_key": self.api_key,
+                "start": f"{start_coords[0]},{start_coords[1]}",
+                "end": f"{end_coords[0]},{end_coords[1]}"
+            }
             
-            # Geocode origin and destination
-            start_coords = self._geocode(origin)
-            end_coords = self._geocode(destination)
+            # Using GET request for simplicity
+            response = self._ors_get(self.base_url, params)
+            if response is None:
+                return None
             
-            if not start_coords or not end_coords:
-                logger.error("Failed to geocode origin or destination.")
-                return []
+            if response.status_code != 200:
+                logger.error(f"ORS API Error: {response.text}")
+                return None
             
+            route_data = response.json()
+            
+            # Update cache
             try:
-                # Request driving directions
-                # ORS expects [[start_lon, start_lat], [end_lon, end_lat]]
-                params = {
-                    "api_key": self.api_key,
-                    "start": f"{start_coords[0]},{start_coords[1]}",
-                    "end": f"{end_coords[0]},{end_coords[1]}"
-                }
-                
-                # Using GET request for simplicity
-                response = requests.get(self.base_url, params=params)
-                
-                if response.status_code != 200:
-                    logger.error(f"ORS API Error: {response.text}")
-                    return []
-                
-                route_data = response.json()
-                
-                # Update cache
-                self.cache[cache_key] = route_data
-                self._save_cache()
-                
+                self.cache.put(cache_key, route_data)
             except Exception as e:
-                logger.error(f"Error fetching route: {e}")
+                logger.error(f"Failed to save cache: {e}")
+            
+        except Exception as e:
+            logger.error(f"Error fetching route: {e}")
+            return None
+
+        return self._json_stream(route_data, cache_key)
+
+    def stream_alternatives(self, origin: str, destination: str, count: Optional[int] = None) -> List[RouteStream]:
+        """
+        Up to `count` alternative routes (ORS `alternative_routes`), best first.
+        Each alternative is cached as a route of its own. Returns [] if no
+        route was found.
+        """
+        count = max(1, count or Config.ROUTE_ALTERNATIVES)
+        base_key = self._get_cache_key(origin, destination) + f"-alt{count}"
+
+        cached_routes = []
+        while len(cached_routes) < count:
+            cached = self.cache.get(f"{base_key}-{len(cached_routes)}")
+            if not cached:
+                break
+            cached_routes.append(cached)
+        if cached_routes:
+            logger.info(f"{len(cached_routes)} alternative routes found in cache for {origin} -> {destination}")
+            return [self._cached_stream(cached, f"{base_key}-{i}") for i, cached in enumerate(cached_routes)]
+
+        logger.info(f"Fetching {count} alternative routes from ORS for {origin} -> {destination}")
+        start_coords = self._geocode(origin)
+        end_coords = self._geocode(destination)
+        if not start_coords or not end_coords:
+            logger.error("Failed to geocode origin or destination.")
+            return []
+
+        # Alternatives are only offered by the POST endpoint
+        body = {"coordinates": [start_coords[:2], end_coords[:2]]}
+        if count > 1:
+            body["alternative_routes"] = {
+                "target_count": count,
+                "share_factor": Config.ROUTE_ALTERNATIVE_SHARE_FACTOR,
+                "weight_factor": Config.ROUTE_ALTERNATIVE_WEIGHT_FACTOR
+            }
+        try:
+            response = self._ors_request("POST", f"{self.base_url}/geojson", json_body=body,
+                                         headers={"Authorization": self.api_key})
+            if response is None:
+                return []
+            if response.status_code != 200:
+                logger.error(f"ORS API Error: {response.text}")
                 return []
+            features = response.json().get('features', [])
+        except Exception as e:
+            logger.error(f"Error fetching alternative routes: {e}")
+            return []
+
+        streams = []
+        for feature in features[:count]:
+            # One single-feature collection per alternative, the shape stream_route caches
+            route_data = {"type": "FeatureCollection", "features": [feature]}
+            key = f"{base_key}-{len(streams)}"
+            stream = self._json_stream(route_data, key)
+            if stream is None:
+                continue
+            try:
+                self.cache.put(key, route_data)
+            except Exception as e:
+                logger.error(f"Failed to save cache: {e}")
+            streams.append(stream)
+        logger.info(f"ORS returned {len(streams)} alternative routes for {origin} -> {destination}")
+        return streams
 
-        return self.parse_route(route_data)
+    def _cached_stream(self, cached: CachedRoute, key: str) -> RouteStream:
+        return RouteStream(cached.step_count, lambda: self._iter_cached(cached),
+                           geometry=lambda: self._load_cached_geometry(cached), key=key,
+                           points=lambda: self._cached_point_count(cached))
 
-    def parse_route(self, route_json: Dict[str, Any]) -> List[RouteStep]:
+    def _json_stream(self, route_data: Dict[str, Any], key: str) -> Optional[RouteStream]:
+        step_count = len(self._route_step_list(route_data))
+        if not step_count:
+            return None
+        return RouteStream(step_count, lambda: self.parse_route(route_data),
+                           geometry=lambda: route_data['features'][0]['geometry']['coordinates'], key=key)
+
+    @staticmethod
+    def _route_step_list(route_json: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not route_json or not route_json.get('features'):
+            return []
+        segments = route_json['features'][0].get('properties', {}).get('segments', [])
+        # One segment per leg; way points index the whole route's geometry, so steps simply concatenate
+        return [step for segment in segments for step in segment.get('steps', [])]
+
+    def parse_route(self, route_json: Dict[str, Any]) -> Iterator[RouteStep]:
         """
-        Parses the ORS route JSON into a list of RouteStep objects.
+        Lazily parses the ORS route JSON into RouteStep objects.
         """
-        steps: List[RouteStep] = []
-        
-        if not route_json or 'features' not in route_json:
-            return steps
+        step_list = self._route_step_list(route_json)
+        if not step_list:
+            return
             
-        # ORS returns a GeoJSON FeatureCollection
-        feature = route_json['features'][0]
-        properties = feature.get('properties', {})
-        segments = properties.get('segments', [])
+        # Geometry coordinates for the entire route (ORS returns a GeoJSON FeatureCollection)
+        geometry = route_json['features'][0]['geometry']['coordinates']
         
-        if not segments:
-            return steps
-            
-        # We assume single segment for simple A to B routes
-        segment = segments[0]
-        
-        # Geometry coordinates for the entire route
-        geometry = feature['geometry']['coordinates']
-        
-        for i, step_data in enumerate(segment.get('steps', [])):
-            # Generate a unique ID for the step
-            step_id = f"step_{i}"
-            
-            instruction = step_data.get('instruction', '')
-            distance = f"{step_data.get('distance', 0)} m"
-            duration = f"{step_data.get('duration', 0)} s"
-            
-            # ORS gives way_points indices into the geometry array
-            # start_index = step_data.get('way_points', [0, 0])[0]
-            # end_index = step_data.get('way_points', [0, 0])[1]
-            
+        yield from self._build_steps(step_list, geometry)
+
+    @staticmethod
+    def _cached_point_count(cached: CachedRoute) -> int:
+        with cached.open_geometry() as geometry:
+            return len(geometry)
+
+    @staticmethod
+    def _load_cached_geometry(cached: CachedRoute) -> List[Sequence[float]]:
+        with cached.open_geometry() as geometry:
+            return list(geometry)
+
+    def _iter_cached(self, cached: CachedRoute) -> Iterator[RouteStep]:
+        # The geometry stays mapped only while steps are being consumed
+        with cached.open_geometry() as geometry:
+            yield from self._build_steps(cached.steps(), geometry)
+
+    def _build_steps(self, step_list: Iterable[Dict[str, Any]], geometry: Sequence) -> Iterator[RouteStep]:
+        """
+        Yields RouteStep objects built from ORS-shaped step dicts.
+        `geometry` is anything indexable by point index returning (lon, lat).
+        """
+        for i, step_data in enumerate(step_list):
+            step = RouteStep(
+                index=i,
+                instruction=step_data.get('instruction', ''),
+                distance_m=float(step_data.get('distance', 0)),
+                duration_s=float(step_data.get('duration', 0)),
+            )
+
             # Let's just take the location of the maneuver
             # The 'way_points' are indices into the geometry coordinates list
             way_points = step_data.get('way_points', [])
             if way_points:
                 start_idx = way_points[0]
                 end_idx = way_points[-1]
-                
-                start_coord = geometry[start_idx] # [lon, lat]
-                end_coord = geometry[end_idx]     # [lon, lat]
-                
-                start_loc = {"lat": start_coord[1], "lng": start_coord[0]}
-                end_loc = {"lat": end_coord[1], "lng": end_coord[0]}
-            else:
-                start_loc = {}
-                end_loc = {}
 
-            step = RouteStep(
-                id=step_id,
-                instruction=instruction,
-                distance=distance,
-                duration=duration,
-                start_location=start_loc,
-                end_location=end_loc,
-                html_instructions=instruction, # ORS sends plain text usually
-                address=None 
-            )
-            steps.append(step)
-            
-        return steps
+                step.start_lng, step.start_lat = geometry[start_idx][:2] # [lon, lat]
+                step.end_lng, step.end_lat = geometry[end_idx][:2]
+                step.way_points = (start_idx, end_idx)
+            yield step
@@ -1,34 +1,60 @@
 import threading
 import queue
-from typing import List
+import time
+from typing import List, Optional
 from agents.content_agents import YouTubeAgent, MusicAgent, HistoryAgent
 from agents.judge_agent import JudgeAgent
+from config import Config
+from core.budget import BudgetGovernor
+from core.router import ALL_TYPES, AgentRouter, StepDispatch
+from models.content import SkippedStep
+from utils.cancellation import (CancellationToken, CancelledError, current_token, drain,
+                                get_unless_cancelled, put_unless_cancelled)
 from utils.logger import setup_logger
 
 logger = setup_logger("Orchestrator")
 
 class Orchestrator:
-    def __init__(self, task_queue: queue.Queue, collector_queue: queue.Queue):
+    def __init__(self, task_queue: queue.Queue, collector_queue: queue.Queue, workers_per_agent: Optional[int] = None,
+                 cancel_token: Optional[CancellationToken] = None, budget: Optional[BudgetGovernor] = None,
+                 passed_steps=None):
         self.task_queue = task_queue
         self.collector_queue = collector_queue
+        self.cancel_token = cancel_token or current_token()
+        self.budget = budget
+        # Driving-horizon mode: ids of steps the car has passed (see core/horizon.py)
+        self.passed_steps = passed_steps
+        # Number of threads consuming each content agent queue
+        self.workers_per_agent = max(1, workers_per_agent or Config.AGENT_POOL_SIZE)
         
-        # Internal queues
-        self.yt_queue = queue.Queue()
-        self.music_queue = queue.Queue()
-        self.history_queue = queue.Queue()
-        self.judge_queue = queue.Queue()
+        # Internal queues, bounded so a slow agent pushes back on the distributor
+        self.yt_queue = queue.Queue(maxsize=Config.AGENT_QUEUE_SIZE)
+        self.music_queue = queue.Queue(maxsize=Config.AGENT_QUEUE_SIZE)
+        self.history_queue = queue.Queue(maxsize=Config.AGENT_QUEUE_SIZE)
+        self.judge_queue = queue.Queue(maxsize=Config.JUDGE_QUEUE_SIZE)
+        self.type_queues = {"video": self.yt_queue, "music": self.music_queue, "history": self.history_queue}
+
+        # Decides which content agents run for each step (None = always all of them)
+        self.router = AgentRouter() if Config.ROUTER_ENABLED else None
         
         # Agents
         self.agents = []
+        self.content_agents = []
+        self.judge = None
 
     def start(self):
         logger.info("Starting Orchestrator...")
         
         # Initialize Agents
-        self.agents.append(YouTubeAgent(self.yt_queue, self.judge_queue))
-        self.agents.append(MusicAgent(self.music_queue, self.judge_queue))
-        self.agents.append(HistoryAgent(self.history_queue, self.judge_queue))
-        self.agents.append(JudgeAgent(self.judge_queue, self.collector_queue))
+        # Several workers of the same type share one input queue
+        shared = {"cancel_token": self.cancel_token, "budget": self.budget, "passed_steps": self.passed_steps}
+        for _ in range(self.workers_per_agent):
+            self.content_agents.append(YouTubeAgent(self.yt_queue, self.judge_queue, **shared))
+            self.content_agents.append(MusicAgent(self.music_queue, self.judge_queue, **shared))
+            self.content_agents.append(HistoryAgent(self.history_queue, self.judge_queue, **shared))
+        # A single judge, since it buffers candidates per step
+        self.judge = JudgeAgent(self.judge_queue, self.collector_queue, router=self.router, **shared)
+        self.agents = self.content_agents + [self.judge]
         
         # Start Agents
         for agent in self.agents:
@@ -42,35 +68,89 @@ class Orchestrator:
 
     def _distribute_tasks(self):
         logger.info("Distributing tasks to agents...")
+        token = self.cancel_token
         while True:
-            item = self.task_queue.get()
+            try:
+                item = get_unless_cancelled(self.task_queue, token)
+            except CancelledError:
+                break
             if item is None:
                 break
             
-            # Fan-out to content agents
-            self.yt_queue.put(item)
-            self.music_queue.put(item)
-            self.history_queue.put(item)
+            # Skips decided upstream (horizon mode) go straight to the collector
+            if isinstance(item, SkippedStep):
+                put_unless_cancelled(self.collector_queue, item, token)
+                self.task_queue.task_done()
+                continue
+            if self.passed_steps and item.id in self.passed_steps:
+                put_unless_cancelled(self.collector_queue, SkippedStep(item.id, "passed while queued"), token)
+                self.task_queue.task_done()
+                continue
+            
+            # Budget sampling: the step goes straight to the collector as skipped
+            if self.budget and not self.budget.admit(item):
+                put_unless_cancelled(self.collector_queue, SkippedStep(item.id, "budget sampling"), token)
+                self.task_queue.task_done()
+                continue
+            
+            # Tell the judge which candidates to expect, then fan out to those agents
+            agent_types = self.router.select(item) if self.router else ALL_TYPES
+            put_unless_cancelled(self.judge_queue, StepDispatch(item, agent_types), token)
+            for agent_type in agent_types:
+                put_unless_cancelled(self.type_queues[agent_type], item, token)
             
             self.task_queue.task_done()
         
         logger.info("Task distribution complete.")
 
+    def _join(self, agents: List[threading.Thread]):
+        # Polls, so a cancellation during a normal shutdown is noticed
+        for agent in agents:
+            while agent.is_alive() and not self.cancel_token.cancelled:
+                agent.join(timeout=1)
+
     def _shutdown(self):
         logger.info("Shutting down agents...")
+        token = self.cancel_token
         
-        # Stop Content Agents
-        self.yt_queue.put(None)
-        self.music_queue.put(None)
-        self.history_queue.put(None)
+        # Stop Content Agents (one sentinel per worker)
+        for _ in range(self.workers_per_agent):
+            put_unless_cancelled(self.yt_queue, None, token)
+            put_unless_cancelled(self.music_queue, None, token)
+            put_unless_cancelled(self.history_queue, None, token)
         
         # Wait for Content Agents to finish
-        # We assume the first 3 are content agents
-        for agent in self.agents[:3]:
-            agent.join()
+        self._join(self.content_agents)
             
         # Stop Judge Agent
-        self.judge_queue.put(None)
-        self.agents[3].join()
+        put_unless_cancelled(self.judge_queue, None, token)
+        self._join([self.judge])
         
+        # Everything was judged: end the collector even if fewer steps came than it expects
+        # (e.g. the route failed part way)
+        put_unless_cancelled(self.collector_queue, None, token)
+        
+        if token.cancelled:
+            self._abandon()
+        
+        if self.router:
+            logger.info(f"Router summary: {self.router.summary()}")
+        if self.budget:
+            logger.info(f"Budget summary: {self.budget.summary()}")
         logger.info("Orchestrator stopped.")
+
+    def _abandon(self):
+        """
+        After a cancellation: drops queued work and gives the agents a bounded
+        time to notice (their in-flight LLM calls are aborted by the token).
+        """
+        queues = [self.task_queue, self.judge_queue] + list(self.type_queues.values())
+        dropped = sum(drain(q) for q in queues)
+        logger.info(f"Run cancelled ({self.cancel_token.reason}); dropped {dropped} queued items.")
+        
+        deadline = time.monotonic() + Config.CANCEL_JOIN_TIMEOUT
+        for agent in self.agents:
+            agent.join(timeout=max(0.0, deadline - time.monotonic()))
+        stuck = [agent.name for agent in self.agents if agent.is_alive()]
+        if stuck:
+            logger.warning(f"{len(stuck)} agents still running {Config.CANCEL_JOIN_TIMEOUT}s after cancellation: {', '.join(stuck)}")
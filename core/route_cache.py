@@ -0,0 +1,213 @@
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from utils.cache import get_cache
+from utils.logger import setup_logger
+
+logger = setup_logger("RouteCache")
+
+# Geometry points are packed as little-endian (lon, lat) float64 pairs
+_POINT = struct.Struct("<2d")
+
+
+class GeometryView:
+    """
+    Read-only, memory-mapped view over a route's packed geometry.
+    Points are decoded on access, so looking up a few step locations
+    never reads the whole coordinate array.
+    """
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map empty files
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._count = size // _POINT.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Tuple[float, float]:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("geometry index out of range")
+        return _POINT.unpack_from(self._map, index * _POINT.size)
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CachedRoute:
+    """
+    A cached route: compact step metadata plus lazily mapped geometry.
+    """
+    def __init__(self, meta: Dict[str, Any], geometry_path: str):
+        self.meta = meta
+        self.geometry_path = geometry_path
+
+    @property
+    def step_count(self) -> int:
+        return len(self.meta["instruction"])
+
+    def steps(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields step dicts in the same shape as ORS `segments[].steps[]`.
+        """
+        for i in range(self.step_count):
+            yield {
+                "instruction": self.meta["instruction"][i],
+                "distance": self.meta["distance"][i],
+                "duration": self.meta["duration"][i],
+                "way_points": self.meta["way_points"][i]
+            }
+
+    def open_geometry(self) -> GeometryView:
+        return GeometryView(self.geometry_path)
+
+
+class RouteCache:
+    """
+    File-per-route cache replacing the single `route_cache.json`.
+
+    Layout under `directory`:
+        index.json      the "routes" cache namespace: key -> {"steps", "points"}
+        <key>.json      step metadata stored column-wise (no geometry)
+        <key>.geo       geometry as packed float64 pairs, memory-mapped on read
+
+    Only the index is read, and only on first use, so startup and lookup cost
+    do not depend on how many routes are cached. TTL, size caps and LRU
+    eviction come from the shared cache layer; evicting an entry deletes
+    its files.
+    """
+    def __init__(self, directory: str, legacy_file: Optional[str] = None):
+        self.directory = directory
+        self.legacy_file = legacy_file
+        os.makedirs(directory, exist_ok=True)
+        self.index = get_cache("routes", path=os.path.join(directory, "index.json"), on_evict=self._delete_files)
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return os.path.join(self.directory, f"{key}.json"), os.path.join(self.directory, f"{key}.geo")
+
+    def _delete_files(self, key: str, value: Any = None):
+        for path in self._paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def migrate_legacy(self):
+        """
+        Imports the old single-file cache the first time it is seen.
+        """
+        if self.legacy_file and os.path.exists(self.legacy_file):
+            self._migrate_legacy()
+
+    # ------------------------------------------------------------ public API
+
+    def __contains__(self, key: str) -> bool:
+        self.migrate_legacy()
+        return key in self.index
+
+    def get(self, key: str) -> Optional[CachedRoute]:
+        self.migrate_legacy()
+        if self.index.get(key) is None:
+            return None
+        meta_path, geo_path = self._paths(key)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Dropping unreadable cached route {key}: {e}")
+            self.remove(key)
+            return None
+        return CachedRoute(meta, geo_path)
+
+    def put(self, key: str, route_json: Dict[str, Any]):
+        """
+        Splits a raw ORS response into compact metadata and packed geometry.
+        """
+        meta, coordinates = self.compact(route_json)
+        meta_path, geo_path = self._paths(key)
+
+        with open(geo_path, "wb") as f:
+            buffer = bytearray(_POINT.size * len(coordinates))
+            for i, (lon, lat) in enumerate(coordinates):
+                _POINT.pack_into(buffer, i * _POINT.size, lon, lat)
+            f.write(buffer)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f, separators=(",", ":"))
+
+        size = os.path.getsize(meta_path) + os.path.getsize(geo_path)
+        self.index.put(key, {"steps": len(meta["instruction"]), "points": len(coordinates)}, size=size)
+
+    def remove(self, key: str):
+        self.index.delete(key)
+        self._delete_files(key)
+
+    def remove_orphans(self) -> int:
+        """
+        Deletes route files that are no longer referenced by the index.
+        """
+        known = {key for key, _ in self.index.items()}
+        removed = 0
+        for filename in os.listdir(self.directory):
+            key, ext = os.path.splitext(filename)
+            if ext in (".json", ".geo") and filename != "index.json" and key not in known:
+                os.remove(os.path.join(self.directory, filename))
+                removed += 1
+        return removed
+
+    # --------------------------------------------------------------- helpers
+
+    @staticmethod
+    def compact(route_json: Dict[str, Any]) -> Tuple[Dict[str, Any], List[List[float]]]:
+        """
+        Returns (column-wise step metadata, coordinates) for an ORS response.
+        All segments are kept, flattened in order.
+        """
+        meta = {"instruction": [], "distance": [], "duration": [], "way_points": [], "summary": {}}
+        if not route_json or not route_json.get("features"):
+            return meta, []
+
+        feature = route_json["features"][0]
+        properties = feature.get("properties", {})
+        for segment in properties.get("segments", []):
+            for step in segment.get("steps", []):
+                meta["instruction"].append(step.get("instruction", ""))
+                meta["distance"].append(step.get("distance", 0))
+                meta["duration"].append(step.get("duration", 0))
+                meta["way_points"].append(step.get("way_points", []))
+        meta["summary"] = properties.get("summary", {})
+        coordinates = feature.get("geometry", {}).get("coordinates", [])
+        return meta, [c[:2] for c in coordinates]
+
+    def _migrate_legacy(self):
+        """
+        One-off conversion of the old single-file `route_cache.json`.
+        """
+        legacy_file, self.legacy_file = self.legacy_file, None
+        try:
+            with open(legacy_file, "r") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not migrate legacy route cache: {e}")
+            return
+
+        logger.info(f"Migrating {len(legacy)} routes from {legacy_file}")
+        for key, route_json in legacy.items():
+            if key not in self.index:
+                self.put(key, route_json)
+        self.index.flush()
+        os.replace(legacy_file, f"{legacy_file}.migrated")
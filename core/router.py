@@ -0,0 +1,128 @@
+import math
+import random
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from config import Config
+from models.step import RouteStep
+from utils.cache import get_cache
+from utils.logger import setup_logger, STEP_LOG
+
+logger = setup_logger("AgentRouter")
+
+# Content agent types, in the judge's fallback order
+ALL_TYPES = ("video", "music", "history")
+
+_HIGHWAY = re.compile(r"\b(highway|interstate|motorway|freeway|expressway|turnpike|parkway|i-\d+|us-\d+|exit|ramp)\b", re.I)
+_ARTERIAL = re.compile(r"\b(avenue|boulevard|road|route|drive|bridge|tunnel)\b", re.I)
+
+# Steps shorter than this are treated as urban driving
+_URBAN_STEP_METERS = 1500.0
+
+
+@dataclass
+class StepDispatch:
+    """
+    Sent to the judge before a step fans out, so it knows which candidates to wait for.
+    """
+    step: RouteStep
+    agent_types: Tuple[str, ...]
+
+
+def step_context(step: RouteStep) -> str:
+    """
+    Coarse context key for a step: road type (from the instruction),
+    urban/rural (from the step length) and a 1-degree region cell.
+    """
+    if _HIGHWAY.search(step.instruction or ""):
+        road = "highway"
+    elif _ARTERIAL.search(step.instruction or ""):
+        road = "arterial"
+    else:
+        road = "local"
+
+    area = "urban" if step.distance_m < _URBAN_STEP_METERS else "rural"
+
+    if step.end_lat is not None and step.end_lng is not None:
+        region = f"{math.floor(step.end_lat)}:{math.floor(step.end_lng)}"
+    else:
+        region = "unknown"
+    return f"{road}|{area}|{region}"
+
+
+class AgentRouter:
+    """
+    Picks which content agents to run for a step from how often each type
+    has won the judge's vote in the same context.
+
+    Every agent runs until a context has `min_samples` decisions. After that
+    only the top type runs when its share is at least `top1_confidence`, or
+    the top two when their combined share is at least `top2_confidence`. A
+    fraction `exploration_rate` of steps still runs every agent, and only
+    those full fan-outs update the stats, so skipped types can win back.
+    Counts are halved once a context passes `max_samples`, keeping them recent.
+    Stats persist in the "router" cache namespace.
+    """
+    def __init__(self, exploration_rate: Optional[float] = None, min_samples: Optional[int] = None,
+                 top1_confidence: Optional[float] = None, top2_confidence: Optional[float] = None,
+                 max_samples: Optional[int] = None, seed: Optional[int] = None):
+        self.exploration_rate = Config.ROUTER_EXPLORATION_RATE if exploration_rate is None else exploration_rate
+        self.min_samples = Config.ROUTER_MIN_SAMPLES if min_samples is None else min_samples
+        self.top1_confidence = top1_confidence or Config.ROUTER_TOP1_CONFIDENCE
+        self.top2_confidence = top2_confidence or Config.ROUTER_TOP2_CONFIDENCE
+        self.max_samples = max_samples or Config.ROUTER_MAX_SAMPLES
+        self.stats = get_cache("router")
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.steps_routed = 0
+        self.agent_runs = 0
+
+    def _counts(self, context: str) -> Dict[str, int]:
+        counts = self.stats.get(context) or {}
+        return {t: counts.get(t, 0) for t in ALL_TYPES}
+
+    def select(self, step: RouteStep) -> Tuple[str, ...]:
+        context = step_context(step)
+        with self._lock:
+            counts = self._counts(context)
+            explore = self._random.random() < self.exploration_rate
+        total = sum(counts.values())
+
+        selected = ALL_TYPES
+        if total >= self.min_samples and not explore:
+            ranked = sorted(ALL_TYPES, key=lambda t: counts[t], reverse=True)
+            if counts[ranked[0]] / total >= self.top1_confidence:
+                selected = (ranked[0],)
+            elif (counts[ranked[0]] + counts[ranked[1]]) / total >= self.top2_confidence:
+                selected = tuple(ranked[:2])
+
+        with self._lock:
+            self.steps_routed += 1
+            self.agent_runs += len(selected)
+        if len(selected) < len(ALL_TYPES):
+            logger.info(f"Routing {step.id} ({context}) to {', '.join(selected)} only", extra=STEP_LOG)
+        return selected
+
+    def record(self, step: RouteStep, selected_type: str):
+        """
+        Counts a judge decision. Only call this for steps that ran every agent.
+        """
+        if selected_type not in ALL_TYPES:
+            return
+        context = step_context(step)
+        with self._lock:
+            counts = self._counts(context)
+            counts[selected_type] += 1
+            if sum(counts.values()) > self.max_samples:
+                counts = {t: c // 2 for t, c in counts.items()}
+            self.stats.put(context, counts)
+
+    def summary(self) -> Dict[str, float]:
+        possible = self.steps_routed * len(ALL_TYPES)
+        return {
+            "steps": self.steps_routed,
+            "agent_runs": self.agent_runs,
+            "skipped_runs": possible - self.agent_runs,
+            "skipped_share": round(1 - self.agent_runs / possible, 3) if possible else 0.0,
+        }
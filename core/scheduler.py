@@ -1,27 +1,59 @@
 import queue
-from typing import List
+import threading
+from typing import Iterable, Optional
 from models.step import RouteStep
-from utils.logger import setup_logger
+from utils.cancellation import CancellationToken, current_token, put_unless_cancelled
+from utils.logger import setup_logger, bind_run, current_run_id
 
 logger = setup_logger("Scheduler")
 
 class Scheduler:
-    def __init__(self, task_queue: queue.Queue):
+    def __init__(self, task_queue: queue.Queue, cancel_token: Optional[CancellationToken] = None):
         self.task_queue = task_queue
+        self.cancel_token = cancel_token or current_token()
+        # Why scheduling stopped before the end of the route, if it failed
+        self.error: Optional[str] = None
 
-    def schedule_steps(self, steps: List[RouteStep]):
+    def schedule_steps(self, steps: Iterable[RouteStep]):
         """
         Enqueues all route steps into the task queue.
+        Blocks while a bounded task queue is full, so `steps` can be a lazy
+        generator that is only parsed as fast as the agents consume it.
+        If `steps` raises, the error is kept in `error` and the steps queued
+        so far are still processed.
         """
-        logger.info(f"Scheduling {len(steps)} steps...")
-        for step in steps:
-            self.task_queue.put(step)
-        
-        # Add None sentinel to indicate end of tasks?
-        # Or Orchestrator handles it.
-        # Typically, we might want to signal end of input.
-        # But since we have multiple agents consuming, we need to be careful.
-        # The Orchestrator will likely consume these steps and spawn agents.
-        # So one sentinel for the Orchestrator is enough.
-        self.task_queue.put(None)
-        logger.info("Scheduling complete.")
+        logger.info("Scheduling steps...")
+        count = 0
+        cancelled = False
+        try:
+            for step in steps:
+                if not put_unless_cancelled(self.task_queue, step, self.cancel_token):
+                    # Cancelled: the rest of the route is never parsed
+                    logger.info(f"Scheduling cancelled after {count} steps.")
+                    cancelled = True
+                    return
+                count += 1
+        except Exception as e:
+            self.error = f"Failed to read route step {count}: {e}"
+            logger.error(self.error)
+        finally:
+            # One sentinel tells the orchestrator (and through it the collector) that input has ended;
+            # without it they would wait forever
+            if not cancelled:
+                put_unless_cancelled(self.task_queue, None, self.cancel_token)
+        logger.info(f"Scheduling complete ({count} steps).")
+
+    def start(self, steps: Iterable[RouteStep]) -> threading.Thread:
+        """
+        Runs schedule_steps on a producer thread, so it can block on a full
+        queue while the orchestrator drains it.
+        """
+        run_id = current_run_id()
+
+        def produce():
+            bind_run(run_id)
+            self.schedule_steps(steps)
+
+        producer = threading.Thread(target=produce, name="Scheduler", daemon=True)
+        producer.start()
+        return producer
@@ -1,62 +1,246 @@
 import argparse
+import itertools
+import json
+import os
 import queue
 import sys
-from core.mapper import RouteFinder
+import time
+from core.alternatives import AlternativeRoutes
+from core.batch import BatchRunner, load_trips
+from core.budget import BudgetGovernor
+from core.horizon import HorizonScheduler, PassedSteps
+from core.mapper import RouteFinder, TripStream
 from core.scheduler import Scheduler
 from core.orchestrator import Orchestrator
-from core.collector import Collector
+from core.collector import Collector, stats_baseline
+from core.route_cache import RouteCache
+from config import Config
+from utils.cache import get_cache
+from utils.cancellation import CancellationToken
 from utils.logger import setup_logger
+from utils.replay import TrafficRecorder, set_recorder
 
 logger = setup_logger("Main")
 
+def _cache_namespaces(name=None):
+    search = get_cache("search")
+    search.migrate_file(os.path.join(Config.CACHE_DIR, "search_cache.json"))
+    routes = RouteCache(os.path.join(Config.CACHE_DIR, "routes"), legacy_file=os.path.join(Config.CACHE_DIR, "route_cache.json"))
+    routes.migrate_legacy()
+    namespaces = {"search": search, "routes": routes.index, "llm": get_cache("llm"),
+                  "router": get_cache("router"), "route_lod": get_cache("route_lod")}
+    if name:
+        return {name: namespaces[name]}
+    return namespaces
+
+def cache_main(argv):
+    """
+    `main.py cache <stats|prune|compact|export>`: inspect and maintain the caches.
+    """
+    parser = argparse.ArgumentParser(prog="main.py cache", description="Inspect and maintain the caches")
+    parser.add_argument("action", choices=["stats", "prune", "compact", "export"])
+    parser.add_argument("--namespace", choices=["search", "routes", "llm", "router", "route_lod"], help="Only act on this namespace")
+    parser.add_argument("--output", help="File to export to (default: stdout)")
+    args = parser.parse_args(argv)
+
+    namespaces = _cache_namespaces(args.namespace)
+
+    if args.action == "stats":
+        print(json.dumps([ns.stats() for ns in namespaces.values()], indent=4))
+
+    elif args.action == "prune":
+        for name, ns in namespaces.items():
+            removed = ns.prune()
+            print(f"{name}: removed {removed['expired']} expired and {removed['evicted']} over-cap entries")
+
+    elif args.action == "compact":
+        for name, ns in namespaces.items():
+            before = ns.stats()["file_bytes"]
+            removed = ns.prune()
+            ns.flush()
+            message = f"{name}: {before} -> {ns.stats()['file_bytes']} bytes, removed {removed['expired'] + removed['evicted']} entries"
+            if name == "routes":
+                orphans = RouteCache(os.path.join(Config.CACHE_DIR, "routes")).remove_orphans()
+                message += f", deleted {orphans} orphaned route files"
+            print(message)
+
+    elif args.action == "export":
+        data = {name: dict(ns.items()) for name, ns in namespaces.items()}
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(data, f, indent=4)
+            print(f"Exported {sum(len(v) for v in data.values())} entries to {args.output}")
+        else:
+            print(json.dumps(data, indent=4))
+
+def batch_main(argv):
+    """
+    `main.py batch FILE`: pre-warm the caches for many trips (JSONL or CSV of origin/destination pairs).
+    """
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Pre-warm the caches for many trips at once")
+    parser.add_argument("file", help="JSONL or CSV file of origin/destination pairs")
+    parser.add_argument("--limit", type=int, help="Limit the number of steps processed per trip", default=None)
+    parser.add_argument("--route-concurrency", type=int, default=None,
+                        help=f"Routes fetched at once (default: {Config.BATCH_ROUTE_CONCURRENCY})")
+    args = parser.parse_args(argv)
+
+    trips = load_trips(args.file)
+    if not trips:
+        logger.error(f"No trips found in {args.file}")
+        sys.exit(1)
+
+    stats = BatchRunner(trips, limit=args.limit, route_concurrency=args.route_concurrency).run()
+    print("\nBatch summary:")
+    print(json.dumps(stats, indent=4))
+
 def main():
+    Config.warn_missing()
+    if len(sys.argv) > 1 and sys.argv[1] == "cache":
+        return cache_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        return batch_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(description="Agent-Based Travel Guide")
     parser.add_argument("start", help="Start address")
     parser.add_argument("destination", help="Destination address")
     parser.add_argument("--limit", type=int, help="Limit the number of steps to process", default=None)
+    parser.add_argument("--max-llm-calls", type=int, default=Config.BUDGET_MAX_LLM_CALLS,
+                        help="LLM call budget for the trip; degrades gracefully as it runs down (0 = unlimited)")
+    parser.add_argument("--max-seconds", type=float, default=Config.BUDGET_MAX_SECONDS,
+                        help="Wall time budget for the trip in seconds (0 = unlimited)")
+    parser.add_argument("--max-tokens", type=int, default=Config.BUDGET_MAX_TOKENS,
+                        help="Estimated LLM token budget for the trip (0 = unlimited)")
+    parser.add_argument("--sample-every", type=int, default=Config.BUDGET_SAMPLE_EVERY,
+                        help="Once the budget is nearly spent, only process every k-th step")
+    parser.add_argument("--positions", metavar="FEED",
+                        help="Driving-horizon mode: schedule steps as the car approaches them, from a position feed "
+                             "(sim[:SPEEDUP], file:PATH or tcp:HOST:PORT)")
+    parser.add_argument("--horizon-seconds", type=float, default=Config.HORIZON_SECONDS,
+                        help="Schedule steps starting within this many seconds ahead of the car")
+    parser.add_argument("--horizon-meters", type=float, default=Config.HORIZON_METERS,
+                        help="Also schedule steps starting within this many meters ahead (0 = off)")
+    parser.add_argument("--via", action="append", default=[], metavar="STOP",
+                        help="Stop on the way (repeat for several, in order); legs are routed concurrently")
+    parser.add_argument("--alternatives", type=int, default=Config.ROUTE_ALTERNATIVES,
+                        help="Offer up to this many alternative routes (ORS allows 3); shared steps are processed once")
+    parser.add_argument("--record", metavar="ARCHIVE", help="Record ORS/Brave/Claude traffic into a fixture archive")
+    parser.add_argument("--replay", metavar="ARCHIVE", help="Serve ORS/Brave/Claude traffic from a fixture archive")
+    parser.add_argument("--replay-timing", choices=["original", "fast"], default="fast",
+                        help="Replay at the recorded latencies or as fast as possible")
     args = parser.parse_args()
 
+    recorder = None
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    if args.positions and args.alternatives > 1:
+        parser.error("--positions follows a single route and cannot be combined with --alternatives")
+    if args.via and args.alternatives > 1:
+        parser.error("ORS only offers alternatives between two points; --via cannot be combined with --alternatives")
+    if args.record:
+        recorder = set_recorder(TrafficRecorder("record", args.record))
+    elif args.replay:
+        recorder = set_recorder(TrafficRecorder("replay", args.replay, timing=args.replay_timing))
+    started_at = time.perf_counter()
+
     logger.info(f"Starting trip from '{args.start}' to '{args.destination}'")
 
-    # 1. Get Route
+    # 1. Get Route (steps are parsed lazily as they are scheduled)
+    baseline = stats_baseline()
     try:
         mapper = RouteFinder()
-        steps = mapper.get_route(args.start, args.destination)
+        if args.alternatives > 1:
+            routes = mapper.stream_alternatives(args.start, args.destination, args.alternatives)
+            route = routes[0] if routes else None
+        elif args.via:
+            # Returns after the first leg; later legs keep arriving while the agents run
+            route = mapper.stream_trip([args.start, *args.via, args.destination])
+        else:
+            route = mapper.stream_route(args.start, args.destination)
     except Exception as e:
         logger.error(f"Failed to get route: {e}")
         sys.exit(1)
 
-    if not steps:
+    if not route:
         logger.error("No route found.")
         sys.exit(1)
 
-    logger.info(f"Route found with {len(steps)} steps.")
-
-    if args.limit and args.limit > 0:
-        logger.info(f"Limiting processing to first {args.limit} steps.")
-        steps = steps[:args.limit]
+    if isinstance(route, TripStream):
+        logger.info(f"First leg found; {route.step_count} steps known so far.")
+    else:
+        logger.info(f"Route found with {route.step_count} steps.")
 
-    # 2. Initialize Queues
-    task_queue = queue.Queue()
-    collector_queue = queue.Queue()
+    alternatives = None
+    if args.alternatives > 1:
+        # Steps shared by several alternatives are scheduled once
+        alternatives = AlternativeRoutes(
+            [itertools.islice(r, args.limit) if args.limit and args.limit > 0 else r for r in routes]
+        )
+        total_steps = len(alternatives.steps)
+        steps = iter(alternatives.steps)
+    else:
+        total_steps = route.step_count
+        steps = iter(route)
+        if args.limit and args.limit > 0:
+            logger.info(f"Limiting processing to first {args.limit} steps.")
+            total_steps = min(total_steps, args.limit)
+            steps = itertools.islice(steps, args.limit)
 
-    # 3. Initialize Components
-    scheduler = Scheduler(task_queue)
-    orchestrator = Orchestrator(task_queue, collector_queue)
-    collector = Collector(collector_queue, total_steps=len(steps))
+    # 2. Initialize Queues (bounded: producers block instead of buffering the whole route)
+    task_queue = queue.Queue(maxsize=Config.TASK_QUEUE_SIZE)
+    collector_queue = queue.Queue(maxsize=Config.COLLECTOR_QUEUE_SIZE)
 
-    # 4. Schedule Tasks
-    scheduler.schedule_steps(steps)
+    # 3. Initialize Components (Ctrl-C cancels the run through the shared token)
+    token = CancellationToken()
+    budget = None
+    if args.max_llm_calls or args.max_seconds or args.max_tokens:
+        budget = BudgetGovernor(args.max_llm_calls, args.max_seconds, args.max_tokens, sample_every=args.sample_every)
+    passed = PassedSteps() if args.positions else None
+    if args.positions:
+        scheduler, steps = HorizonScheduler.for_route(
+            task_queue, route.geometry(), steps, args.positions, passed, token,
+            horizon_seconds=args.horizon_seconds, horizon_meters=args.horizon_meters
+        )
+    else:
+        scheduler = Scheduler(task_queue, cancel_token=token)
+    orchestrator = Orchestrator(task_queue, collector_queue, cancel_token=token, budget=budget, passed_steps=passed)
+    collector = Collector(collector_queue, total_steps=total_steps, cancel_token=token, budget=budget,
+                          total_final=not isinstance(route, TripStream), baseline=baseline)
+    if isinstance(route, TripStream):
+        def update_total(step_count, complete):
+            if args.limit and args.limit > 0 and step_count >= args.limit:
+                collector.set_total(args.limit)
+            else:
+                collector.set_total(step_count, final=complete)
+        route.on_progress(update_total)
 
-    # 5. Start Execution
-    collector.start()
-    orchestrator.start() # Blocks until agents are done
+    try:
+        # 4. Start Execution; the scheduler produces on its own thread (from positions in horizon mode)
+        collector.start()
+        scheduler.start(steps)
+        orchestrator.start() # Blocks until agents are done
 
-    # 6. Wait for Collector
-    collector.join()
+        # 5. Wait for Collector
+        collector.join()
+    except KeyboardInterrupt:
+        logger.warning("Interrupted, cancelling the run...")
+        token.cancel("interrupted")
+        collector.join(timeout=Config.CANCEL_JOIN_TIMEOUT)
     
-    # 7. Final Report
+    # 6. Final Report
     collector.generate_report()
+    if scheduler.error:
+        print(f"\nScheduling stopped early: {scheduler.error}")
+    if isinstance(route, TripStream) and route.failed_legs:
+        print("\nNo route found for: " + ", ".join(f"{a} -> {b}" for a, b in route.failed_legs))
+    if alternatives:
+        alternatives.print_report(collector.get_results())
+
+    if recorder:
+        recorder.save()
+        summary = recorder.summary()
+        summary["wall_clock_seconds"] = round(time.perf_counter() - started_at, 3)
+        print("\nTraffic summary:")
+        print(json.dumps(summary, indent=4))
 
 if __name__ == "__main__":
     main()
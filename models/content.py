@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class ContentCandidate:
     type: str  # "video", "music", "history"
     title: str
@@ -9,8 +9,18 @@ class ContentCandidate:
     reasoning: str
     url: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class SelectedContent:
     step_id: str
     chosen_candidate: ContentCandidate
     judge_reasoning: str
+    decided_by: str = "llm"  # "llm", "routing" (single candidate), "rule:<name>" or "budget"
+    budget_tier: str = "full"  # degradation tier in effect for this step (see core/budget.py)
+
+@dataclass(slots=True)
+class SkippedStep:
+    """
+    Sent to the collector for a step that was not processed (e.g. budget sampling).
+    """
+    step_id: str
+    reason: str
@@ -1,13 +1,58 @@
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
-@dataclass
+
+def step_id(index: int) -> str:
+    return f"step_{index}"
+
+
+def step_index(step_id: str) -> int:
+    """
+    Integer index of a "step_<n>" id (-1 if it is not one).
+    """
+    try:
+        return int(step_id.rsplit("_", 1)[1])
+    except (IndexError, ValueError):
+        return -1
+
+
+@dataclass(slots=True)
 class RouteStep:
-    id: str
+    index: int
     instruction: str
-    distance: str
-    duration: str
-    start_location: Dict[str, float]  # {lat: float, lng: float}
-    end_location: Dict[str, float]    # {lat: float, lng: float}
-    html_instructions: str
+    distance_m: float
+    duration_s: float
+    # Maneuver start/end coordinates (None when ORS sent no way points)
+    start_lat: Optional[float] = None
+    start_lng: Optional[float] = None
+    end_lat: Optional[float] = None
+    end_lng: Optional[float] = None
     address: Optional[str] = None
+    way_points: Optional[Tuple[int, int]] = None  # (first, last) index into the route geometry
+
+    @property
+    def id(self) -> str:
+        return step_id(self.index)
+
+    @property
+    def distance(self) -> str:
+        return f"{self.distance_m} m"
+
+    @property
+    def duration(self) -> str:
+        return f"{self.duration_s} s"
+
+    @property
+    def start_location(self) -> Dict[str, float]:
+        return {} if self.start_lat is None else {"lat": self.start_lat, "lng": self.start_lng}
+
+    @property
+    def end_location(self) -> Dict[str, float]:
+        return {} if self.end_lat is None else {"lat": self.end_lat, "lng": self.end_lng}
+
+    @property
+    def location(self) -> str:
+        """
+        Address if geocoded, otherwise "lat,lng" of the maneuver end.
+        """
+        return self.address if self.address else f"{self.end_lat},{self.end_lng}"
@@ -0,0 +1,154 @@
+import math
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+from models.step import RouteStep
+
+# Columns stored as float64 arrays (NaN = missing) and int64 arrays (-1 = missing)
+_FLOAT_COLUMNS = ("distance_m", "duration_s", "start_lat", "start_lng", "end_lat", "end_lng")
+_INT_COLUMNS = ("index", "way_start", "way_end")
+
+
+def _float(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class StepTable:
+    """
+    Column-wise storage for a route's steps.
+
+    Numbers live in parallel `array`s and instructions are interned into a
+    shared string table, so a step costs a few dozen bytes instead of a
+    dataclass plus its strings. Indexing materialises a RouteStep on demand;
+    slicing copies the arrays and shares the string table.
+    """
+    def __init__(self):
+        for name in _FLOAT_COLUMNS:
+            setattr(self, name, array("d"))
+        for name in _INT_COLUMNS:
+            setattr(self, name, array("q"))
+        self.instruction_id = array("I")
+        self.instructions: List[str] = []
+        self._instruction_ids: Dict[str, int] = {}
+        # Only a few steps are ever geocoded, so addresses are kept sparse
+        self.addresses: Dict[int, str] = {}
+
+    @classmethod
+    def from_steps(cls, steps: Iterable[RouteStep]) -> "StepTable":
+        table = cls()
+        table.extend(steps)
+        return table
+
+    def _intern(self, instruction: str) -> int:
+        instruction_id = self._instruction_ids.get(instruction)
+        if instruction_id is None:
+            instruction_id = len(self.instructions)
+            self.instructions.append(sys.intern(instruction))
+            self._instruction_ids[instruction] = instruction_id
+        return instruction_id
+
+    def append(self, step: RouteStep):
+        row = len(self)
+        self.instruction_id.append(self._intern(step.instruction))
+        self.distance_m.append(step.distance_m)
+        self.duration_s.append(step.duration_s)
+        self.start_lat.append(_float(step.start_lat))
+        self.start_lng.append(_float(step.start_lng))
+        self.end_lat.append(_float(step.end_lat))
+        self.end_lng.append(_float(step.end_lng))
+        first, last = step.way_points or (-1, -1)
+        self.way_start.append(first)
+        self.way_end.append(last)
+        if step.address:
+            self.addresses[row] = step.address
+        # Last, since it defines len(): readers on other threads only see complete rows
+        self.index.append(step.index)
+
+    def extend(self, steps: Iterable[RouteStep]):
+        for step in steps:
+            self.append(step)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def step(self, row: int) -> RouteStep:
+        first, last = self.way_start[row], self.way_end[row]
+        return RouteStep(
+            index=self.index[row],
+            instruction=self.instructions[self.instruction_id[row]],
+            distance_m=self.distance_m[row],
+            duration_s=self.duration_s[row],
+            start_lat=_optional(self.start_lat[row]),
+            start_lng=_optional(self.start_lng[row]),
+            end_lat=_optional(self.end_lat[row]),
+            end_lng=_optional(self.end_lng[row]),
+            address=self.addresses.get(row),
+            way_points=(first, last) if first >= 0 else None,
+        )
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[RouteStep, "StepTable"]:
+        if isinstance(key, slice):
+            return self._slice(key)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("step table index out of range")
+        return self.step(key)
+
+    def _slice(self, key: slice) -> "StepTable":
+        table = StepTable()
+        for name in _FLOAT_COLUMNS + _INT_COLUMNS + ("instruction_id",):
+            setattr(table, name, getattr(self, name)[key])
+        table.instructions = self.instructions
+        table._instruction_ids = self._instruction_ids
+        rows = range(len(self))[key]
+        table.addresses = {new: self.addresses[old] for new, old in enumerate(rows) if old in self.addresses}
+        return table
+
+    def __iter__(self) -> Iterator[RouteStep]:
+        for row in range(len(self)):
+            yield self.step(row)
+
+    def set_address(self, row: int, address: str):
+        self.addresses[row] = address
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the table (arrays, string table and addresses).
+        """
+        size = sum(getattr(self, name).itemsize * len(self) for name in _FLOAT_COLUMNS + _INT_COLUMNS)
+        size += self.instruction_id.itemsize * len(self)
+        size += sum(sys.getsizeof(s) for s in self.instructions)
+        size += sum(sys.getsizeof(a) for a in self.addresses.values())
+        return size
+
+    # --------------------------------------------------------- serialisation
+
+    def to_columns(self) -> Dict[str, Any]:
+        """
+        JSON-friendly columns (missing values as null); the inverse of from_columns().
+        """
+        columns: Dict[str, Any] = {name: list(getattr(self, name)) for name in _INT_COLUMNS}
+        for name in _FLOAT_COLUMNS:
+            columns[name] = [_optional(v) for v in getattr(self, name)]
+        columns["instruction_id"] = list(self.instruction_id)
+        columns["instructions"] = list(self.instructions)
+        columns["addresses"] = {str(row): address for row, address in self.addresses.items()}
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any]) -> "StepTable":
+        table = cls()
+        for name in _INT_COLUMNS:
+            getattr(table, name).extend(columns[name])
+        for name in _FLOAT_COLUMNS:
+            getattr(table, name).extend(_float(v) for v in columns[name])
+        table.instruction_id.extend(columns["instruction_id"])
+        for instruction in columns["instructions"]:
+            table._intern(instruction)
+        table.addresses = {int(row): address for row, address in columns.get("addresses", {}).items()}
+        return table
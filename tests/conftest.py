@@ -0,0 +1,44 @@
+import sys
+import os
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_upstreams import FakeORSServer, FakeBraveServer
+from config import Config
+
+# A fast, deterministic pipeline: mock LLM without latency or errors
+PIPELINE_CONFIG = {
+    "ORS_API_KEY": "test",
+    "BRAVE_SEARCH_API_KEY": "test",
+    "LLM_PROVIDER": "mock",
+    "MOCK_LLM_LATENCY_MS": 0,
+    "MOCK_LLM_ERROR_RATE": 0,
+}
+
+
+@pytest.fixture
+def fake_upstreams(tmp_path, monkeypatch):
+    """
+    Starts fake ORS and Brave servers and points Config at them, with the cache
+    in tmp_path and PIPELINE_CONFIG applied. Call it with the route length and
+    any Config overrides the test needs; returns (ors, brave). The servers are
+    stopped when the test ends.
+    """
+    servers = []
+
+    def start(route_steps: int = 10, brave_status=None, **config):
+        ors = FakeORSServer(route_steps=route_steps).start()
+        servers.append(ors)
+        brave = FakeBraveServer(fail_status=brave_status).start()
+        servers.append(brave)
+        settings = {**PIPELINE_CONFIG, "ORS_BASE_URL": ors.base_url, "BRAVE_BASE_URL": brave.base_url,
+                    "CACHE_DIR": str(tmp_path), **config}
+        for name, value in settings.items():
+            monkeypatch.setattr(Config, name, value)
+        return ors, brave
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_upstreams import build_synthetic_alternatives
+from config import Config
+from core.alternatives import AlternativeRoutes
+
+
+def test_shared_steps_are_scheduled_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ORS_API_KEY", "test")
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    from core.mapper import RouteFinder
+    finder = RouteFinder()
+    data = build_synthetic_alternatives([-74.00, 40.70], [-73.90, 40.80], steps=9, count=3)
+    routes = [list(finder.parse_route({"features": [feature]})) for feature in data["features"]]
+
+    alternatives = AlternativeRoutes(routes)
+    # Steps 3-5 are each alternative's detour; the other six are common to all three
+    assert len(alternatives.steps) == 9 + 3 + 3
+    assert alternatives.assignments[0] == list(range(9))
+    assert alternatives.assignments[1] == [0, 1, 2, 9, 10, 11, 6, 7, 8]
+    summary = alternatives.summary()
+    assert summary["steps"] == 27 and summary["unique_steps"] == 15
+    assert [route["shared_steps"] for route in summary["routes"]] == [6, 6, 6]
+
+
+def test_engine_fans_content_out_to_alternatives(fake_upstreams):
+    ors, _ = fake_upstreams(route_steps=9)
+    from core.engine import TravelGuideEngine
+
+    engine = TravelGuideEngine("Origin", "Destination", alternatives=3)
+    engine.start()
+    engine.join(timeout=30)
+
+    assert engine.is_complete and not engine.error
+    # Content was computed once per unique place, not once per route step
+    assert len(engine.collector.results) == 15
+    itineraries = engine.get_itineraries()
+    assert [len(itinerary) for itinerary in itineraries] == [9, 9, 9]
+    assert [r.step_id for r in itineraries[2]] == [f"step_{i}" for i in range(9)]
+    assert itineraries[1][0].chosen_candidate == itineraries[2][0].chosen_candidate
+
+    # A second run is served from the cache, one route per alternative
+    requests = ors.request_count
+    from core.mapper import RouteFinder
+    assert len(RouteFinder().stream_alternatives("Origin", "Destination", 3)) == 3
+    assert ors.request_count == requests
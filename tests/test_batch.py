@@ -0,0 +1,43 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.batch import BatchRunner, load_trips
+from utils.llm_router import QUERY, get_llm_router
+
+
+def test_load_trips(tmp_path):
+    csv_file = tmp_path / "trips.csv"
+    csv_file.write_text("Origin,Destination\n\"Times Square, NY\",Bryant Park\n")
+    jsonl_file = tmp_path / "trips.jsonl"
+    jsonl_file.write_text(json.dumps({"start": "A", "destination": "B"}) + "\n\n" + json.dumps(["C", "D"]) + "\n")
+
+    assert load_trips(str(csv_file)) == [("Times Square, NY", "Bryant Park")]
+    assert load_trips(str(jsonl_file)) == [("A", "B"), ("C", "D")]
+
+
+def test_batch_dedupes_and_warms_caches(fake_upstreams):
+    _, brave = fake_upstreams(route_steps=4, LLM_CACHE_ENABLED=True)
+
+    # "ab"/"ba" geocode to the same point on the fake server, so those routes share every step
+    trips = [("ab", "cd"), ("AB", "CD"), ("ba", "dc")]
+    stats = BatchRunner(trips, route_concurrency=2).run()
+
+    assert stats["unique_trips"] == 2
+    assert stats["steps"] == 8
+    assert stats["unique_steps"] == 4
+    assert stats["completed_steps"] == 4
+
+    brave_calls = brave.request_count
+    router = get_llm_router()
+    query_calls = router.summary()[QUERY]["calls"]
+    stats = BatchRunner(trips).run()
+    # Query streams are closed once the search query is read, but the query itself was cached,
+    # so the second pass makes no query calls and every later cache key matches too
+    assert router.summary()[QUERY]["calls"] == query_calls
+    assert stats["caches"]["llm"]["misses"] == 0 and stats["caches"]["llm"]["hits"] > 0
+    assert stats["caches"]["routes"]["misses"] == 0
+    assert brave.request_count == brave_calls
@@ -0,0 +1,93 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.budget import BudgetGovernor, Tier
+from models.step import RouteStep, step_index
+
+
+def make_step(i):
+    return RouteStep(index=i, instruction="Go", distance_m=1.0, duration_s=1.0)
+
+
+def test_tiers_follow_the_most_used_budget():
+    budget = BudgetGovernor(max_calls=10, max_tokens=1000, sample_every=3)
+    assert budget.tier() == Tier.FULL
+
+    for _ in range(5):
+        budget.record_call("x" * 40)
+    assert budget.tier("step_4") == Tier.NO_FOLLOWUP
+    budget.record_output(4000)
+    assert budget.tier("step_5") == Tier.SAMPLED
+    assert budget.summary()["tier_reached_at"] == {
+        "no_followup": "step_4", "cache_only": "step_5", "heuristic_judge": "step_5", "sampled": "step_5"}
+    assert budget.step_tier("step_4") == Tier.NO_FOLLOWUP
+
+    assert [budget.admit(make_step(i)) for i in range(6)] == [True, False, False, True, False, False]
+    assert budget.summary()["degradations"] == {"sampled_out": 4}
+
+
+def test_steps_without_llm_calls_still_run_down_the_budget():
+    budget = BudgetGovernor(max_calls=100, thresholds=[0.5, 0.7, 0.85, 0.95])
+    for i in range(17):
+        assert budget.admit(make_step(i))
+        for _ in range(5):
+            budget.record_call("x")
+    assert budget.tier("step_16") == Tier.HEURISTIC_JUDGE
+
+    # No more calls are made, but each step is charged the average of 5 calls
+    assert budget.admit(make_step(17)) and budget.tier() == Tier.HEURISTIC_JUDGE
+    assert not budget.admit(make_step(18))
+    assert budget.tier() == Tier.SAMPLED and budget.calls == 85
+    assert budget.summary()["tier_reached_at"]["sampled"] == "step_18"
+
+
+def test_pipeline_stays_within_call_budget(fake_upstreams, capsys):
+    fake_upstreams(route_steps=30, LLM_CACHE_ENABLED=False, ROUTER_ENABLED=False)
+    from core.engine import TravelGuideEngine
+    from utils.llm_client import get_llm_client
+
+    budget = BudgetGovernor(max_calls=40, sample_every=2, thresholds=[0.25, 0.5, 0.75, 0.9])
+    engine = TravelGuideEngine("Origin", "Destination", budget=budget)
+    engine.start()
+    engine.join(timeout=30)
+
+    collector = engine.collector
+    assert engine.is_complete and not engine.error
+    assert len(collector.results) + len(collector.skipped) == 30
+    # Calls already in flight when a tier kicks in may overshoot a little
+    calls = get_llm_client().call_count
+    assert calls == engine.budget.calls and calls <= 40 + 4
+    tiers = {r.budget_tier for r in engine.results}
+    assert "full" in tiers and len(tiers) > 1
+    assert any(r.decided_by == "budget" for r in engine.results)
+    assert collector.skipped and all(step_index(s.step_id) % 2 for s in collector.skipped)
+
+    collector.generate_report()
+    report = capsys.readouterr().out
+    assert "LLM BUDGET" in report and "Final tier: sampled" in report
+
+
+def test_cache_only_tier_serves_cached_queries(fake_upstreams):
+    fake_upstreams(route_steps=5, LLM_CACHE_ENABLED=True, ROUTER_ENABLED=False)
+    from core.engine import TravelGuideEngine
+    from utils.llm_client import get_llm_client
+
+    first = TravelGuideEngine("Origin", "Destination")
+    first.start()
+    first.join(timeout=30)
+    calls = get_llm_client().inner.call_count
+
+    # Thresholds of 0 put the trip in cache_only from the first step
+    budget = BudgetGovernor(max_calls=100, thresholds=[0, 0, 2, 2])
+    second = TravelGuideEngine("Origin", "Destination", budget=budget)
+    second.start()
+    second.join(timeout=30)
+
+    assert second.is_complete and {r.budget_tier for r in second.results} == {"cache_only"}
+    # Queries and follow-ups come from the first trip's responses, not from the fallbacks
+    assert get_llm_client().inner.call_count == calls
+    assert budget.summary()["degradations"] == {}
+    assert [r.chosen_candidate for r in second.results] == [r.chosen_candidate for r in first.results]
@@ -0,0 +1,77 @@
+import sys
+import os
+import json
+import threading
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.cache import CacheNamespace
+
+
+def test_lru_eviction_and_stats(tmp_path):
+    evicted = []
+    cache = CacheNamespace("test", str(tmp_path / "test.json"), max_entries=2,
+                           on_evict=lambda key, value: evicted.append(key), flush_interval=0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+
+    assert evicted == ["b"]
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["evictions"] == 1
+
+
+def test_byte_cap(tmp_path):
+    cache = CacheNamespace("test", str(tmp_path / "test.json"), max_bytes=100, flush_interval=0)
+    for i in range(10):
+        cache.put(f"k{i}", "x" * 30)
+    assert cache.stats()["bytes"] <= 100
+    assert cache.get("k9") is not None
+
+
+def test_ttl_expiry_and_persistence(tmp_path):
+    path = str(tmp_path / "test.json")
+    cache = CacheNamespace("test", path, ttl=0.05, flush_interval=0)
+    cache.put("old", [1, 2, 3])
+    time.sleep(0.1)
+    cache.put("new", [4])
+
+    assert cache.get("old") is None
+    assert cache.get("old", allow_expired=True) is None  # already removed by the first lookup
+    cache.flush()
+
+    reloaded = CacheNamespace("test", path, ttl=60)
+    assert reloaded.get("new") == [4]
+    stats = reloaded.stats()
+    assert stats["entries"] == 1
+    assert stats["expirations"] == 1
+
+
+def test_flush_does_not_block_readers(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.json")
+    cache = CacheNamespace("test", path, flush_interval=3600)
+    cache.put("a", [1])
+    reads = []
+
+    real_dump = json.dump
+
+    def slow_dump(data, f, **kwargs):
+        # Another thread uses the cache while the file is being written
+        reader = threading.Thread(target=lambda: reads.append((cache.get("a"), cache.put("b", [2]))))
+        reader.start()
+        reader.join(timeout=5)
+        real_dump(data, f, **kwargs)
+
+    monkeypatch.setattr(json, "dump", slow_dump)
+    cache.flush()
+    assert reads == [([1], None)]
+
+    # The entry written during the flush goes out with the next one
+    monkeypatch.setattr(json, "dump", real_dump)
+    cache.flush()
+    assert CacheNamespace("test", path).get("b") == [2]
@@ -0,0 +1,108 @@
+import sys
+import os
+import queue
+import threading
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from utils.cancellation import CancellationToken, bind_token, put_unless_cancelled
+from utils.claude_pool import ClaudeSessionPool, STREAM_ARGS
+from utils.llm_client import CANCELLED_RESPONSE, ClaudeCLIClient
+
+FAKE_CLAUDE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fake_claude.py"))
+PROMPT = open(os.path.join(os.path.dirname(__file__), "..", "agents", "prompts", "judge_agent.md")).read()
+
+
+def test_token_callbacks_and_queues():
+    token = CancellationToken()
+    calls = []
+    with token.on_cancel(lambda: calls.append("left")):
+        pass
+    with token.on_cancel(lambda: calls.append("open")):
+        token.cancel("test")
+        token.cancel("again")
+    assert calls == ["open"] and token.reason == "test"
+
+    # Already cancelled: the callback runs straight away
+    with token.on_cancel(lambda: calls.append("late")):
+        pass
+    assert calls == ["open", "late"]
+
+    full = queue.Queue(maxsize=1)
+    full.put("x")
+    assert put_unless_cancelled(full, "y", token) is False
+
+
+def _call_in_thread(token, call):
+    result = {}
+
+    def run():
+        bind_token(token)
+        start = time.monotonic()
+        result["value"] = call()
+        result["seconds"] = time.monotonic() - start
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, result
+
+
+def test_cancel_kills_oneshot_cli(monkeypatch):
+    monkeypatch.setenv("FAKE_CLAUDE_LATENCY_MS", "30000")
+    token = CancellationToken()
+    args = [sys.executable, FAKE_CLAUDE, "-p", PROMPT]
+    thread, result = _call_in_thread(token, lambda: ClaudeCLIClient._run_oneshot(args, timeout=60))
+    time.sleep(0.5)
+    token.cancel("test")
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert result["value"].returncode != 0 and result["value"].stdout == ""
+    assert result["seconds"] < 5
+
+
+def test_cancel_kills_persistent_session(monkeypatch):
+    monkeypatch.setenv("FAKE_CLAUDE_LATENCY_MS", "30000")
+    pool = ClaudeSessionPool(size=1, command=[sys.executable, FAKE_CLAUDE] + STREAM_ARGS, timeout=60)
+    client = ClaudeCLIClient(mode="persistent", pool=pool)
+    token = CancellationToken()
+    try:
+        spawned = []
+        spawn = pool._spawn
+        monkeypatch.setattr(pool, "_spawn", lambda: spawned.append(spawn()) or spawned[-1])
+        thread, result = _call_in_thread(token, lambda: client.generate_text(PROMPT))
+        time.sleep(0.5)
+        token.cancel("test")
+        thread.join(timeout=5)
+
+        assert not thread.is_alive()
+        assert result["value"] == CANCELLED_RESPONSE
+        # The killed session is not handed out again; a fresh one replaces it
+        idle = pool._idle.get_nowait()
+        assert not spawned[0].alive() and idle is spawned[1] and idle.alive()
+        pool._idle.put(idle)
+    finally:
+        pool.close()
+
+
+def test_engine_cancel_stops_all_threads(fake_upstreams):
+    fake_upstreams(route_steps=40, LLM_CACHE_ENABLED=False, MOCK_LLM_LATENCY_MS=100, MOCK_LLM_LATENCY_DIST="fixed")
+    from core.engine import TravelGuideEngine
+
+    engine = TravelGuideEngine("Origin", "Destination", heartbeat_timeout=0.5)
+    engine.start()
+    deadline = time.monotonic() + 10
+    while not (engine.collector and engine.collector.results) and time.monotonic() < deadline:
+        time.sleep(0.05)
+        engine.heartbeat()
+
+    # No more heartbeats: the watchdog cancels the run
+    engine.join(timeout=Config.CANCEL_JOIN_TIMEOUT + 3)
+    assert not engine.is_alive()
+    assert engine.cancelled and engine.error.startswith("Cancelled: no heartbeat")
+    assert 0 < len(engine.collector.results) < 40
+    assert not any(agent.is_alive() for agent in engine.orchestrator.agents)
+    assert not engine.collector.is_alive()
@@ -0,0 +1,84 @@
+import sys
+import os
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, breaker_snapshots, get_breaker, reset_breakers
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    # Breakers are process-wide; do not leak open ones into other tests
+    reset_breakers()
+    yield
+    reset_breakers()
+
+
+def test_breaker_opens_probes_and_closes():
+    now = [0.0]
+    breaker = CircuitBreaker("test", window=10, min_calls=4, error_rate=0.5, cooldown=30, clock=lambda: now[0])
+
+    for ok in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record_success() if ok else breaker.record_failure("boom")
+    assert breaker.state == OPEN
+    assert not breaker.allow() and breaker.snapshot()["short_circuited"] == 1
+
+    # After the cool-down a single probe goes out; it fails, so the breaker reopens
+    now[0] = 31
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure("still down")
+    assert breaker.state == OPEN and breaker.times_opened == 2
+
+    now[0] = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_snapshots_since_count_only_later_calls():
+    breaker = get_breaker("test")
+    breaker.record_failure("boom")
+    earlier = breaker_snapshots()
+    breaker.record_success()
+    # Counters cover the later call only; the state and error rate are current
+    assert breaker_snapshots(since=earlier) == [dict(earlier[0], calls=1, failures=0, recent_error_rate=0.5)]
+
+
+def _run_trip(fake_upstreams, brave_status=None, llm_error_rate=0):
+    _, brave = fake_upstreams(route_steps=20, brave_status=brave_status, LLM_CACHE_ENABLED=False,
+                              MOCK_LLM_ERROR_RATE=llm_error_rate, ROUTER_ENABLED=False)
+    from core.engine import TravelGuideEngine
+
+    engine = TravelGuideEngine("Origin", "Destination")
+    engine.start()
+    engine.join(timeout=30)
+    return engine, brave.request_count, {b["name"]: b for b in breaker_snapshots()}
+
+
+def test_llm_outage_short_circuits_to_fallbacks(fake_upstreams, capsys):
+    from utils.llm_client import get_llm_client
+    engine, _, states = _run_trip(fake_upstreams, llm_error_rate=1)
+
+    # Every step still gets a (fallback) result
+    assert engine.is_complete and len(engine.results) == 20
+    # Only the calls before the breaker opened (plus those already in flight) went out
+    assert get_llm_client().call_count <= Config.BREAKER_MIN_CALLS + 4
+    assert states["llm"]["state"] == OPEN and states["llm"]["short_circuited"] > 0
+    assert states["ors"]["state"] == CLOSED
+
+    engine.collector.generate_report()
+    assert "CIRCUIT BREAKERS" in capsys.readouterr().out
+
+
+def test_search_over_quota_stops_calling_brave(fake_upstreams):
+    engine, brave_requests, states = _run_trip(fake_upstreams, brave_status=429)
+
+    assert engine.is_complete and len(engine.results) == 20
+    assert brave_requests <= Config.BREAKER_MIN_CALLS + 3
+    assert states["brave"]["state"] == OPEN and states["brave"]["last_error"] == "HTTP 429"
+    assert states["llm"]["state"] == CLOSED
@@ -0,0 +1,53 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.claude_pool import ClaudeSessionPool, STREAM_ARGS
+from utils.llm_client import ClaudeCLIClient
+
+FAKE_CLAUDE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fake_claude.py"))
+PROMPT = open(os.path.join(os.path.dirname(__file__), "..", "agents", "prompts", "judge_agent.md")).read()
+
+
+def make_pool(**kwargs):
+    return ClaudeSessionPool(command=[sys.executable, FAKE_CLAUDE] + STREAM_ARGS, timeout=30, **kwargs)
+
+
+def test_each_prompt_gets_a_fresh_session():
+    pool = make_pool(size=1)
+    client = ClaudeCLIClient(mode="persistent", pool=pool)
+    try:
+        pids = []
+        for _ in range(3):
+            data = json.loads(client.generate_text(PROMPT))
+            assert data["selected_type"] in ("video", "music", "history")
+            # The next session is already started and has not seen a prompt
+            session = pool._idle.get_nowait()
+            assert session is not None and session.requests_served == 0 and session.alive()
+            pids.append(session.pid)
+            pool._idle.put(session)
+
+        assert len(set(pids)) == 3
+        assert pool.restarts == 0
+    finally:
+        pool.close()
+
+
+def test_session_that_died_idle_is_replaced():
+    pool = make_pool(size=1)
+    client = ClaudeCLIClient(mode="persistent", pool=pool)
+    try:
+        assert not client.generate_text(PROMPT).startswith("Error")
+        session = pool._idle.get_nowait()
+        session.process.kill()
+        session.process.wait()
+        pool._idle.put(session)
+
+        # Retried once on a new session
+        assert not client.generate_text(PROMPT).startswith("Error")
+        assert pool.restarts == 1
+    finally:
+        pool.close()
@@ -0,0 +1,60 @@
+import sys
+import os
+import math
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from core.geometry import SimplifiedRoute, clip_path, douglas_peucker, simplified_route, viewport, visible_rows
+
+
+def winding_route(points=20000):
+    # About 1100 km heading north-east, with bends every few km and GPS-like wobble
+    return [[-74.0 + i * 0.0005 + 0.01 * math.sin(i / 50) + 1e-6 * (i % 3), 40.0 + i * 0.0004]
+            for i in range(points)]
+
+
+def test_douglas_peucker_keeps_shape():
+    # An L shape with points along both legs: only the ends and the corner matter
+    leg = [[-74.0, 40.0 + i * 0.001] for i in range(10)] + [[-74.0 + i * 0.001, 40.009] for i in range(1, 10)]
+    assert douglas_peucker(leg, 5) == [0, 9, 18]
+    assert douglas_peucker(leg[:2], 5) == [0, 1]
+
+
+def test_levels_shrink_with_zoom():
+    geometry = winding_route()
+    route = SimplifiedRoute.build(geometry, {4: 5000, 10: 150, 16: 3})
+
+    sizes = [len(route.levels[z]) for z in (4, 10, 16)]
+    assert sizes[0] < sizes[1] < sizes[2] <= len(geometry)
+    assert sizes[0] < 200
+    assert route.levels[4][0] == [round(c, 6) for c in geometry[0]]
+    assert route.for_zoom(2) is route.levels[4] and route.for_zoom(12) is route.levels[10]
+
+    # Zoomed in, only the part of the line near the view is sent
+    lng, lat = geometry[10000]
+    bounds = viewport(lat, lng, 15)
+    assert 0 < sum(len(run) for run in clip_path(route.for_zoom(15), bounds)) < sizes[1] / 10
+
+
+def test_simplified_route_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    loads = []
+
+    def load():
+        loads.append(1)
+        return winding_route(2000)
+
+    first = simplified_route("route-key", load)
+    second = simplified_route("route-key", load)
+    assert len(loads) == 1 and second.levels == first.levels
+
+
+def test_visible_rows_limits_markers():
+    lats = [40.0 + i * 0.01 for i in range(100)] + [math.nan]
+    lngs = [-74.0] * 101
+    bounds = (-74.1, 40.0, -73.9, 40.5)
+    assert visible_rows(lats, lngs, bounds, 0) == list(range(51))
+    assert len(visible_rows(lats, lngs, bounds, 10)) == 10
+    assert visible_rows(lats, lngs, bounds, 0, rows=[3, 60, 100]) == [3]
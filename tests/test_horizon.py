@@ -0,0 +1,76 @@
+import sys
+import os
+import queue
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_upstreams import build_synthetic_route
+from config import Config
+from core.horizon import HorizonScheduler, PassedSteps, Position, RouteTracker, parse_position
+from models.content import SkippedStep
+
+ROUTE = build_synthetic_route([-74.00, 40.70], [-73.90, 40.80], steps=10)
+
+
+def make_tracker(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ORS_API_KEY", "test")
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    from core.mapper import RouteFinder
+    steps = list(RouteFinder().parse_route(ROUTE))
+    return RouteTracker(ROUTE["features"][0]["geometry"]["coordinates"], steps)
+
+
+def test_tracker_maps_positions_onto_route(tmp_path, monkeypatch):
+    tracker = make_tracker(tmp_path, monkeypatch)
+    assert tracker.steps[3].way_points == (12, 16)
+
+    # Slightly off the line, halfway along
+    progress = tracker.locate(Position(40.75 + 0.0002, -73.95))
+    assert abs(progress - tracker.total_m / 2) < 100
+    assert abs(tracker.seconds_at(progress) - tracker.total_s / 2) < 15
+
+    # Off-route positions and moving backwards do not change progress
+    assert tracker.locate(Position(41.5, -73.0)) == progress
+    assert tracker.locate(Position(40.71, -73.99)) == progress
+
+    assert parse_position('{"lat": 1.5, "lon": 2}') == Position(1.5, 2.0)
+    assert parse_position("1.5, 2") == Position(1.5, 2.0)
+    assert parse_position("# comment") is None
+
+
+def test_horizon_schedules_ahead_and_drops_passed_steps(tmp_path, monkeypatch):
+    tracker = make_tracker(tmp_path, monkeypatch)
+    task_queue = queue.Queue()
+    passed = PassedSteps()
+    scheduler = HorizonScheduler(task_queue, tracker, passed, horizon_seconds=30, horizon_meters=0)
+
+    scheduler.update(tracker.point_at(0))
+    assert [task_queue.get_nowait().id for _ in range(task_queue.qsize())] == ["step_0", "step_1"]
+
+    # Jump ahead: step_0/1 were queued (now passed), step_2..5 were never scheduled
+    scheduler.update(tracker.point_at(tracker.spans[6][0] + 1))
+    items = [task_queue.get_nowait() for _ in range(task_queue.qsize())]
+    assert [(type(i).__name__, i.step_id if isinstance(i, SkippedStep) else i.id) for i in items] == [
+        ("SkippedStep", "step_2"), ("SkippedStep", "step_3"), ("SkippedStep", "step_4"),
+        ("SkippedStep", "step_5"), ("RouteStep", "step_6"), ("RouteStep", "step_7")]
+    assert "step_0" in passed and "step_1" in passed and "step_6" not in passed
+
+    # Feed ends before arrival: the rest is accounted for as skipped
+    scheduler.schedule_positions([])
+    items = [task_queue.get_nowait() for _ in range(task_queue.qsize())]
+    assert [i.step_id for i in items[:-1]] == ["step_8", "step_9"] and items[-1] is None
+
+
+def test_engine_follows_simulated_drive(fake_upstreams):
+    fake_upstreams(route_steps=12, HORIZON_SECONDS=60, HORIZON_SIM_INTERVAL=0.01)
+    from core.engine import TravelGuideEngine
+
+    engine = TravelGuideEngine("Origin", "Destination", positions="sim:300")
+    engine.start()
+    engine.join(timeout=30)
+
+    collector = engine.collector
+    assert engine.is_complete and not engine.error
+    assert len(collector.results) + len(collector.skipped) == 12
+    assert len(collector.results) > 0
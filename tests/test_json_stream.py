@@ -0,0 +1,46 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.json_stream import IncrementalJSONParser, JSONFieldStream
+
+
+def test_fields_complete_as_they_stream():
+    text = '```json\n{"selected_type": "music", "score": 3, "nested": {"a": [1, "}"]}, "reasoning": "Fits \\"the\\" drive"}\n```'
+    parser = IncrementalJSONParser()
+    seen = []
+    for i, ch in enumerate(text):
+        for key, value in parser.feed(ch):
+            seen.append((key, value, i))
+
+    assert [key for key, _, _ in seen] == ["selected_type", "score", "nested", "reasoning"]
+    # selected_type is known right after its closing quote, long before the object ends
+    assert seen[0][1] == "music"
+    assert seen[0][2] == text.index('"music"') + len('"music"') - 1
+    assert seen[1][1] == 3
+    assert seen[2][1] == {"a": [1, "}"]}
+    assert parser.done
+    assert parser.result() == json.loads(text[text.index("{"):text.rindex("}") + 1])
+
+
+def test_field_stream_stops_reading_early():
+    consumed = []
+
+    def chunks():
+        for chunk in ['{"search_', 'query": "old ', 'town"', ', "extra": ', '"never read"}']:
+            consumed.append(chunk)
+            yield chunk
+
+    stream = JSONFieldStream(chunks())
+    assert stream.wait_for("search_query") == "old town"
+    stream.close()
+    assert len(consumed) == 3
+
+
+def test_field_stream_without_json():
+    stream = JSONFieldStream(iter(["Error calling Claude CLI: mock failure"]))
+    assert stream.wait_for("search_query") is None
+    assert stream.finish() == {}
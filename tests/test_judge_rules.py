@@ -0,0 +1,118 @@
+import sys
+import os
+import dataclasses
+import queue
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from agents.judge_rules import apply_rules, has_content
+from core.router import StepDispatch
+from models.content import ContentCandidate
+from models.step import RouteStep
+from utils.llm_client import BaseLLMClient
+
+
+def video(title="Drive Through Jersey", url="https://youtube.com/watch?v=1", description="A drive."):
+    return ContentCandidate(type="video", title=title, description=description, reasoning="r", url=url)
+
+
+def music(title="Born to Run by Bruce Springsteen", description="A song."):
+    return ContentCandidate(type="music", title=title, description=description, reasoning="r")
+
+
+def history(title="The Turnpike", description="A story."):
+    return ContentCandidate(type="history", title=title, description=description, reasoning="r")
+
+
+def test_placeholders_and_missing_urls_are_not_content():
+    assert has_content(video()) and has_content(music()) and has_content(history())
+    assert not has_content(video(title="Unknown Video"))
+    assert not has_content(music(title="Unknown by Unknown"))
+    assert not has_content(history(title="Unknown Story", description=""))
+    assert not has_content(video(url=None))
+
+
+def test_rules_resolve_clear_cases():
+    decision = apply_rules({"video": video(title="Unknown Video", url=None, description=""),
+                            "music": music(), "history": history(title="Unknown Story", description="")})
+    assert decision.selected_type == "music" and decision.rule == "single_real_candidate"
+
+    # A video without a URL loses to the only candidate with real content
+    decision = apply_rules({"video": video(url=None), "history": history(), "music": music(title="Unknown by Unknown")})
+    assert decision.selected_type == "history"
+
+    decision = apply_rules({"music": music(title="Unknown by Unknown"), "history": history(title="Unknown Story")})
+    assert decision.selected_type == "music" and decision.rule == "no_real_candidates"
+
+    # Ambiguous steps go to the LLM
+    assert apply_rules({"video": video(), "music": music(), "history": history()}) is None
+    assert apply_rules({"video": video(), "music": music(title="Unknown by Unknown")}, rules=[]) is None
+
+
+class _CountingClient(BaseLLMClient):
+    def __init__(self):
+        self.calls = 0
+
+    def generate_text(self, prompt):
+        return "".join(self.stream_text(prompt))
+
+    def stream_text(self, prompt):
+        self.calls += 1
+        yield '{"selected_type": "history", "reasoning": "Best story."}'
+
+
+def test_judge_escalates_only_ambiguous_steps(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "mock")
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    from agents.judge_agent import JudgeAgent
+    in_queue, out_queue = queue.Queue(), queue.Queue()
+    judge = JudgeAgent(in_queue, out_queue)
+    judge.llm_client = client = _CountingClient()
+    judge.start()
+
+    step = RouteStep(index=0, instruction="Go", distance_m=1.0, duration_s=1.0)
+    in_queue.put(StepDispatch(step, ("video", "music", "history")))
+    for candidate in (video(title="Unknown Video"), music(title="Unknown by Unknown"), history()):
+        in_queue.put(("step_0", candidate))
+    in_queue.put(StepDispatch(dataclasses.replace(step, index=1), ("video", "music", "history")))
+    for candidate in (video(), music(), history()):
+        in_queue.put(("step_1", candidate))
+    in_queue.put(None)
+    judge.join(timeout=10)
+
+    first, second = out_queue.get_nowait(), out_queue.get_nowait()
+    assert first.chosen_candidate.type == "history" and first.decided_by == "rule:single_real_candidate"
+    assert second.decided_by == "llm" and second.judge_reasoning == "Best story."
+    assert client.calls == 1
+    assert judge.decisions == {"rule:single_real_candidate": 1, "llm": 1}
+
+
+def test_judge_emits_result_with_reasoning(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "mock")
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    from agents.judge_agent import JudgeAgent
+    in_queue, out_queue = queue.Queue(), queue.Queue()
+    emitted_early = []
+
+    class _SlowReasoningClient(_CountingClient):
+        def stream_text(self, prompt):
+            yield '{"selected_type": "music", '
+            # The choice is known here, but nothing may reach the collector yet
+            emitted_early.append(not out_queue.empty())
+            yield '"reasoning": "Good song."}'
+
+    judge = JudgeAgent(in_queue, out_queue)
+    judge.llm_client = _SlowReasoningClient()
+    judge.start()
+    in_queue.put(StepDispatch(RouteStep(index=0, instruction="Go", distance_m=1.0, duration_s=1.0),
+                              ("video", "music", "history")))
+    for candidate in (video(), music(), history()):
+        in_queue.put(("step_0", candidate))
+    in_queue.put(None)
+    judge.join(timeout=10)
+
+    result = out_queue.get_nowait()
+    assert emitted_early == [False]
+    assert result.chosen_candidate.type == "music" and result.judge_reasoning == "Good song."
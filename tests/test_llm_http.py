@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_upstreams import FakeMessagesServer
+from config import Config
+from utils.llm_client import AnthropicHTTPClient, CachingLLMClient, get_llm_client
+
+
+def test_http_client_against_stub_reuses_connection():
+    server = FakeMessagesServer().start()
+    try:
+        client = AnthropicHTTPClient(base_url=server.base_url, api_key="test", max_concurrency=2)
+        prompt = open(os.path.join(os.path.dirname(__file__), "..", "agents", "prompts", "judge_agent.md")).read()
+
+        for _ in range(5):
+            data = json.loads(client.generate_text(prompt))
+            assert data["selected_type"] in ("video", "music", "history")
+
+        assert server.request_count == 5
+        assert len(server.connections) == 1
+        client.close()
+    finally:
+        server.stop()
+
+
+def test_http_client_reports_errors():
+    server = FakeMessagesServer().start()
+    try:
+        client = AnthropicHTTPClient(base_url=server.base_url + "/missing", api_key="test")
+        assert client.generate_text("hello").startswith("Error calling LLM API: 404")
+    finally:
+        server.stop()
+
+
+def test_provider_selection(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "anthropic")
+    monkeypatch.setattr(Config, "LLM_CACHE_ENABLED", False)
+    assert isinstance(get_llm_client(), AnthropicHTTPClient)
+
+    monkeypatch.setattr(Config, "LLM_CACHE_ENABLED", True)
+    client = get_llm_client()
+    assert isinstance(client, CachingLLMClient)
+    assert isinstance(client.inner, AnthropicHTTPClient)
+
+
+def test_http_client_streams_text():
+    server = FakeMessagesServer().start()
+    try:
+        client = AnthropicHTTPClient(base_url=server.base_url, api_key="test")
+        prompt = open(os.path.join(os.path.dirname(__file__), "..", "agents", "prompts", "judge_agent.md")).read()
+
+        chunks = list(client.stream_text(prompt))
+        assert len(chunks) > 1
+        assert json.loads("".join(chunks))["selected_type"] in ("video", "music", "history")
+        client.close()
+    finally:
+        server.stop()
+
+
+def test_caching_client_stops_streams_closed_early(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    closed = []
+
+    class _Inner:
+        model = ""
+
+        def stream_text(self, prompt):
+            try:
+                for chunk in ('{"search_query": "a"', ', "rest": "b"}'):
+                    yield chunk
+            finally:
+                closed.append(True)
+
+    client = CachingLLMClient(_Inner(), provider="mock")
+    stream = client.stream_text("prompt")
+    assert next(stream) == '{"search_query": "a"'
+    stream.close()
+    # The model stops generating and the partial response is not cached
+    assert closed == [True]
+    assert client.cached_text("prompt") is None
+
+    assert "".join(client.stream_text("prompt")) == '{"search_query": "a", "rest": "b"}'
+    assert client.cached_text("prompt") == '{"search_query": "a", "rest": "b"}'
@@ -0,0 +1,53 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.cancellation import CancellationToken
+from utils.llm_router import JUDGE, QUERY, SELECT, LLMRouter, TierSettings
+
+
+def test_tier_concurrency_limit():
+    router = LLMRouter({JUDGE: TierSettings(concurrency=1), QUERY: TierSettings()})
+    token = CancellationToken()
+    assert router.client(QUERY) is None
+
+    assert router.acquire(JUDGE, token)
+    # The only judge slot is taken, so a second caller waits until it is cancelled
+    token.cancel("test")
+    assert not router.acquire(JUDGE, token)
+    router.release(JUDGE)
+
+
+def test_calls_are_routed_per_task(fake_upstreams, capsys):
+    fake_upstreams(route_steps=10, LLM_CACHE_ENABLED=False, ROUTER_ENABLED=False, LLM_QUERY_PROVIDER="mock",
+                   LLM_QUERY_MODEL="fast", LLM_QUERY_COST_PER_MTOK=1.0, LLM_JUDGE_CONCURRENCY=1)
+    from core.engine import TravelGuideEngine
+    from utils.llm_client import get_llm_client
+    from utils.llm_router import get_llm_router
+
+    engine = TravelGuideEngine("Origin", "Destination")
+    engine.start()
+    engine.join(timeout=30)
+    assert engine.is_complete and len(engine.results) == 10
+
+    router = get_llm_router()
+    summary = router.summary()
+    # Every content agent makes one query and one selection call per step
+    assert summary[QUERY]["calls"] == summary[SELECT]["calls"] == 30
+    assert summary[QUERY]["model"] == "fast" and summary[QUERY]["estimated_cost"] > 0
+    assert router.client(QUERY).call_count == 30
+    # Selection and judging stay on the shared client
+    judge_calls = summary.get(JUDGE, {}).get("calls", 0)
+    assert get_llm_client().call_count == 30 + judge_calls
+
+    engine.collector.generate_report()
+    assert "LLM TIERS" in capsys.readouterr().out
+
+    # The router is shared by later trips, but each report only counts its own calls
+    second = TravelGuideEngine("Elsewhere", "Destination")
+    second.start()
+    second.join(timeout=30)
+    assert router.summary()[QUERY]["calls"] == 60
+    assert second.collector.llm_tiers()[QUERY]["calls"] == 30
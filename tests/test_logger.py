@@ -0,0 +1,68 @@
+import sys
+import os
+import logging
+import threading
+import time
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.logger import setup_logger, bind_run, resolve_level, LogBuffer, _StepSampler, attach_log_buffer
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_setup_logger_is_idempotent():
+    first = setup_logger("IdempotentTest")
+    handlers = list(first.handlers)
+    second = setup_logger("IdempotentTest")
+    assert first is second
+    assert second.handlers == handlers
+    assert len(handlers) == 1
+
+
+def test_run_buffers_are_bounded_and_isolated():
+    logger = setup_logger("BufferTest")
+    buffer_a = attach_log_buffer(LogBuffer("run-a", maxlen=5))
+    buffer_b = attach_log_buffer(LogBuffer("run-b", maxlen=5))
+
+    def log_for(run_id, count):
+        bind_run(run_id)
+        for i in range(count):
+            logger.info(f"{run_id} message {i}")
+
+    threads = [threading.Thread(target=log_for, args=("run-a", 20)),
+               threading.Thread(target=log_for, args=("run-b", 3))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert _wait_for(lambda: buffer_a.lines() and buffer_a.lines()[-1].endswith("run-a message 19"))
+    assert _wait_for(lambda: len(buffer_b.lines()) == 3)
+    assert len(buffer_a.lines()) == 5
+    assert all("run-a" in line for line in buffer_a.lines())
+    assert all("run-b" in line for line in buffer_b.lines())
+
+    seq, lines = buffer_b.since(1)
+    assert seq == 3 and len(lines) == 2
+
+
+def test_step_level_is_resolved_up_front():
+    assert resolve_level("debug") == logging.DEBUG and resolve_level(" 15 ") == 15
+    with pytest.raises(ValueError):
+        resolve_level("verbose")
+
+    sampler = _StepSampler("warning")
+    record = logging.LogRecord("Test", logging.INFO, __file__, 1, "step", None, None)
+    assert sampler.filter(record)
+    record.per_step = True
+    assert not sampler.filter(record)
@@ -1,52 +1,41 @@
 import sys
 import os
-import json
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.mapper import RouteFinder
-from config import Config
-
-def test_mapper():
-    print("Testing RouteFinder with OpenRouteService...")
-    
-    if not Config.ORS_API_KEY:
-        print("Error: ORS_API_KEY is not set in .env file.")
-        return
-
-    try:
-        finder = RouteFinder()
-        
-        # Test case: New York to Boston
-        origin = "New York, NY"
-        destination = "Boston, MA"
-        
-        print(f"Fetching route from {origin} to {destination}...")
-        steps = finder.get_route(origin, destination)
-        
-        if not steps:
-            print("Failed to get route.")
-            return
-            
-        print(f"Successfully retrieved {len(steps)} steps.")
-        
-        # Print first few steps
-        for i, step in enumerate(steps[:5]):
-            print(f"Step {i+1}: {step.instruction} ({step.distance})")
-            
-        # Verify cache
-        cache_file = "cache/route_cache.json"
-        if os.path.exists(cache_file):
-            print(f"Cache file exists at {cache_file}")
-            with open(cache_file, 'r') as f:
-                data = json.load(f)
-                print(f"Cache contains {len(data)} entries.")
-        else:
-            print("Cache file was not created.")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
-if __name__ == "__main__":
-    test_mapper()
+
+
+def test_route_steps_follow_the_geometry(fake_upstreams):
+    ors, _ = fake_upstreams(route_steps=6)
+    route = RouteFinder().stream_route("New York, NY", "Boston, MA")
+    # Origin and destination geocoded, then one directions request
+    assert ors.request_count == 3
+
+    steps = list(route)
+    geometry = route.geometry()
+    assert route.step_count == len(steps) == 6 and len(geometry) == 6 * 4 + 1
+    assert [step.id for step in steps] == [f"step_{i}" for i in range(6)]
+    assert steps[0].instruction == "Head north on Synthetic Avenue 0"
+    assert steps[2].instruction == "Turn left onto Route 2"
+    assert [step.distance_m for step in steps] == [250.0, 260.0, 270.0, 280.0, 290.0, 300.0]
+    assert steps[5].duration_s == 20.0
+    for i, step in enumerate(steps):
+        assert step.way_points == (i * 4, (i + 1) * 4)
+        assert [step.start_lng, step.start_lat] == geometry[i * 4]
+        assert [step.end_lng, step.end_lat] == geometry[(i + 1) * 4]
+    # Consecutive steps join up and the last one ends at the destination
+    assert all((a.end_lat, a.end_lng) == (b.start_lat, b.start_lng) for a, b in zip(steps, steps[1:]))
+    assert [steps[-1].end_lng, steps[-1].end_lat] == geometry[-1]
+
+
+def test_cached_route_is_served_without_ors(fake_upstreams):
+    ors, _ = fake_upstreams(route_steps=6)
+    fetched = list(RouteFinder().get_route("New York, NY", "Boston, MA"))
+
+    # A new finder (e.g. the next run) reads the same steps from the cache
+    ors.fail_status = 503
+    cached = list(RouteFinder().get_route("new york, ny", "Boston, MA"))
+    assert cached == fetched
+    assert ors.request_count == 3
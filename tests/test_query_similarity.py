@@ -0,0 +1,61 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_upstreams import FakeBraveServer
+from config import Config
+from utils.query_similarity import QueryIndex, normalize_query
+
+
+def test_normalisation_and_near_duplicates():
+    assert normalize_query("History of Times Square") == normalize_query("times square: the history")
+
+    index = QueryIndex("web", threshold=0.8)
+    index.add("Times Square history")
+    index.add("songs about Brooklyn")
+
+    assert index.match("square times HISTORY").similarity == 1.0
+    match = index.match("history of Times Square NYC")
+    assert match.query == "Times Square history" and match.similarity >= 0.8
+    # Same place, different subject
+    assert index.match("Times Square music") is None
+    assert index.match("Central Park") is None
+
+    summary = index.summary()
+    assert (summary["lookups"], summary["exact"], summary["near"]) == (4, 1, 1)
+    assert sum(summary["best_similarity"].values()) == 4
+
+
+def test_index_drops_oldest_queries():
+    index = QueryIndex("web", max_entries=2)
+    for query in ("Times Square history", "Brooklyn Bridge views", "Central Park zoo"):
+        index.add(query)
+    assert len(index) == 2
+    assert index.match("Times Square history") is None
+    assert index.match("central park zoo") is not None
+
+
+def test_search_client_reuses_near_duplicate_results(tmp_path, monkeypatch):
+    brave = FakeBraveServer().start()
+    try:
+        monkeypatch.setattr(Config, "BRAVE_SEARCH_API_KEY", "test")
+        monkeypatch.setattr(Config, "BRAVE_BASE_URL", brave.base_url)
+        monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+        from utils.brave_client import BraveSearchClient
+
+        client = BraveSearchClient()
+        first = client.search_web("Times Square history")
+        assert client.search_web("history of Times Square NYC") == first
+        assert client.search_videos("Times Square history") != first
+        assert client.search_web("Times Square music") != first
+        assert brave.request_count == 3
+
+        # A new client (e.g. the next run) finds the earlier query in the cache
+        from utils import query_similarity
+        monkeypatch.setattr(query_similarity, "_indexes", {})
+        assert BraveSearchClient().search_web("the history of times square, NYC") == first
+        assert brave.request_count == 3
+    finally:
+        brave.stop()
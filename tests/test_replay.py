@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from benchmarks.fake_upstreams import FakeORSServer
+from config import Config
+from core.mapper import RouteFinder
+from utils import replay
+from utils.replay import TrafficRecorder, ReplayMissError
+
+
+@pytest.fixture
+def ors_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ORS_API_KEY", "secret-key")
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(replay, "_recorder", None)
+    return tmp_path
+
+
+def test_record_then_replay_route(ors_config, monkeypatch):
+    archive = str(ors_config / "trip.jsonl.gz")
+    server = FakeORSServer(route_steps=12).start()
+    monkeypatch.setattr(Config, "ORS_BASE_URL", server.base_url)
+
+    recorder = replay.set_recorder(TrafficRecorder("record", archive))
+    recorded_steps = RouteFinder().get_route("Origin", "Destination")
+    recorder.save()
+    server.stop()
+
+    assert len(recorded_steps) == 12
+    assert recorder.calls["ors"] == 3  # two geocodes and one directions call
+
+    # Secrets are stripped from the archive
+    import gzip
+    with gzip.open(archive, "rt") as f:
+        assert "secret-key" not in f.read()
+
+    # Replay with the server gone and a cold route cache
+    monkeypatch.setattr(Config, "CACHE_DIR", str(ors_config / "cold_cache"))
+    player = replay.set_recorder(TrafficRecorder("replay", archive, timing="fast"))
+    replayed_steps = RouteFinder().get_route("Origin", "Destination")
+
+    assert [s.instruction for s in replayed_steps] == [s.instruction for s in recorded_steps]
+    summary = player.summary()
+    assert summary["channels"]["ors"]["calls"] == summary["channels"]["ors"]["recorded_calls"] == 3
+    assert summary["misses"] == 0
+
+
+def test_replay_command_timing(tmp_path):
+    archive = str(tmp_path / "cli.jsonl.gz")
+    args = [sys.executable, "-c", "print('hello')"]
+
+    recorder = TrafficRecorder("record", archive)
+    assert recorder.run_command("claude_cli", args).stdout.strip() == "hello"
+    recorder._entries[0]["latency"] = 0.2
+    recorder.save()
+
+    fast = TrafficRecorder("replay", archive, timing="fast")
+    start = time.perf_counter()
+    assert fast.run_command("claude_cli", args).stdout.strip() == "hello"
+    assert time.perf_counter() - start < 0.2
+
+    original = TrafficRecorder("replay", archive, timing="original")
+    start = time.perf_counter()
+    original.run_command("claude_cli", args)
+    assert time.perf_counter() - start >= 0.2
+
+    with pytest.raises(ReplayMissError):
+        fast.run_command("claude_cli", ["claude", "-p", "something else"])
@@ -0,0 +1,42 @@
+import sys
+import os
+import json
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_upstreams import build_synthetic_route
+from config import Config
+from core.mapper import RouteFinder
+from core.route_cache import RouteCache
+
+
+def test_cached_route_matches_parsed_route(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ORS_API_KEY", "test")
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    route_json = build_synthetic_route([-74.0, 40.7], [-73.9, 40.8], steps=25)
+
+    finder = RouteFinder()
+    finder.cache.put("trip", route_json)
+    expected = list(finder.parse_route(route_json))
+
+    cached = RouteCache(os.path.join(str(tmp_path), "routes")).get("trip")
+    assert cached.step_count == 25
+    with cached.open_geometry() as geometry:
+        assert len(geometry) == len(route_json["features"][0]["geometry"]["coordinates"])
+        steps = list(finder._build_steps(cached.steps(), geometry))
+
+    assert steps == expected
+    # Geometry is stored separately from the (much smaller) step metadata
+    assert os.path.getsize(tmp_path / "routes" / "trip.geo") == len(geometry) * 16
+
+
+def test_legacy_cache_is_migrated(tmp_path):
+    legacy_file = tmp_path / "route_cache.json"
+    legacy_file.write_text(json.dumps({"old": build_synthetic_route([0, 0], [1, 1], steps=3)}))
+
+    cache = RouteCache(str(tmp_path / "routes"), legacy_file=str(legacy_file))
+    assert "old" in cache
+    assert cache.get("old").step_count == 3
+    assert not legacy_file.exists()
+    assert (tmp_path / "route_cache.json.migrated").exists()
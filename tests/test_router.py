@@ -0,0 +1,80 @@
+import sys
+import os
+import queue
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from core.router import ALL_TYPES, AgentRouter, StepDispatch, step_context
+from models.content import ContentCandidate
+from models.step import RouteStep
+
+
+def make_step(i, instruction="Keep left to stay on Interstate 95", meters=4200.0):
+    return RouteStep(index=i, instruction=instruction, distance_m=meters, duration_s=60.0,
+                     end_lat=40.5, end_lng=-74.2)
+
+
+def make_router(tmp_path, monkeypatch, **kwargs):
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    return AgentRouter(min_samples=10, top1_confidence=0.8, top2_confidence=0.9, seed=1, **kwargs)
+
+
+def test_step_context():
+    assert step_context(make_step(0)) == "highway|rural|40:-75"
+    assert step_context(make_step(0, "Turn right onto Main Street", 120)) == "local|urban|40:-75"
+
+
+def test_router_skips_agents_once_confident(tmp_path, monkeypatch):
+    router = make_router(tmp_path, monkeypatch, exploration_rate=0.0)
+    assert router.select(make_step(0)) == ALL_TYPES
+
+    for i in range(10):
+        router.record(make_step(i), "music")
+    assert router.select(make_step(11)) == ("music",)
+
+    # Two types sharing the wins: run both
+    for i in range(10):
+        router.record(make_step(i), "history")
+    for i in range(2):
+        router.record(make_step(i), "video")
+    assert router.select(make_step(12)) == ("music", "history")
+
+    # Other contexts are unaffected
+    assert router.select(make_step(13, "Turn right onto Main Street", 120)) == ALL_TYPES
+    assert router.summary()["skipped_runs"] == 3
+
+
+def test_exploration_keeps_full_fanouts(tmp_path, monkeypatch):
+    router = make_router(tmp_path, monkeypatch, exploration_rate=1.0)
+    for i in range(20):
+        router.record(make_step(i), "video")
+    assert router.select(make_step(21)) == ALL_TYPES
+
+
+def test_judge_with_fewer_candidates(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "mock")
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    from agents.judge_agent import JudgeAgent
+
+    router = AgentRouter(seed=1)
+    in_queue, out_queue = queue.Queue(), queue.Queue()
+    judge = JudgeAgent(in_queue, out_queue, router=router)
+    judge.start()
+
+    # One candidate: chosen without an LLM call
+    in_queue.put(StepDispatch(make_step(0), ("music",)))
+    in_queue.put(("step_0", ContentCandidate(type="music", title="Song", description="d", reasoning="r")))
+    # Two candidates: judged between the two
+    in_queue.put(StepDispatch(make_step(1), ("music", "history")))
+    in_queue.put(("step_1", ContentCandidate(type="music", title="Song", description="d", reasoning="r")))
+    in_queue.put(("step_1", ContentCandidate(type="history", title="Story", description="d", reasoning="r")))
+    in_queue.put(None)
+    judge.join(timeout=10)
+
+    first, second = out_queue.get_nowait(), out_queue.get_nowait()
+    assert first.step_id == "step_0" and first.chosen_candidate.type == "music"
+    assert second.step_id == "step_1" and second.chosen_candidate.type in ("music", "history")
+    # Partial fan-outs are not recorded as evidence
+    assert router.stats.stats()["entries"] == 0
@@ -0,0 +1,79 @@
+import sys
+import os
+import queue
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.collector import Collector
+from core.mapper import RouteFinder
+from core.orchestrator import Orchestrator
+from core.scheduler import Scheduler
+
+
+def test_scheduler_blocks_on_full_queue():
+    produced = []
+
+    def steps():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    task_queue = queue.Queue(maxsize=2)
+    producer = Scheduler(task_queue).start(steps())
+    time.sleep(0.2)
+    # Two queued plus the one waiting to be put; the rest of the generator is untouched
+    assert len(produced) == 3
+
+    drained = []
+    while True:
+        item = task_queue.get()
+        if item is None:
+            break
+        drained.append(item)
+    producer.join(timeout=5)
+    assert drained == list(range(100))
+
+
+def test_pipeline_with_tiny_queues(fake_upstreams):
+    fake_upstreams(route_steps=30, AGENT_QUEUE_SIZE=1, JUDGE_QUEUE_SIZE=1)
+
+    route = RouteFinder().stream_route("Origin", "Destination")
+    assert route.step_count == 30
+
+    task_queue = queue.Queue(maxsize=1)
+    collector_queue = queue.Queue(maxsize=1)
+    orchestrator = Orchestrator(task_queue, collector_queue)
+    collector = Collector(collector_queue, total_steps=route.step_count)
+    collector.start()
+    Scheduler(task_queue).start(iter(route))
+    orchestrator.start()
+    collector.join(timeout=30)
+
+    assert len(collector.results) == 30
+
+
+def test_failing_route_still_ends_the_pipeline(fake_upstreams):
+    fake_upstreams(route_steps=10)
+    route = RouteFinder().stream_route("Origin", "Destination")
+
+    def steps():
+        for step in route:
+            if step.index == 4:
+                raise ValueError("corrupt route file")
+            yield step
+
+    task_queue = queue.Queue(maxsize=1)
+    collector_queue = queue.Queue()
+    scheduler = Scheduler(task_queue)
+    collector = Collector(collector_queue, total_steps=route.step_count)
+    collector.start()
+    producer = scheduler.start(steps())
+    Orchestrator(task_queue, collector_queue).start()
+    collector.join(timeout=10)
+
+    # The steps read before the failure are processed, then everything shuts down
+    assert not collector.is_alive() and not producer.is_alive()
+    assert [r.step_id for r in collector.get_results()] == [f"step_{i}" for i in range(4)]
+    assert scheduler.error == "Failed to read route step 4: corrupt route file"
@@ -0,0 +1,38 @@
+import sys
+import os
+import subprocess
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.base_agent import load_prompt
+from config import Config
+from utils.brave_client import get_search_client
+from utils.llm_client import get_llm_client
+
+
+def test_clients_are_shared(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "mock")
+    mock_client = get_llm_client()
+    assert get_llm_client() is mock_client
+    assert get_search_client() is get_search_client()
+
+    # Different settings get their own instance
+    monkeypatch.setattr(Config, "LLM_PROVIDER", "anthropic")
+    assert get_llm_client() is not mock_client
+
+
+def test_prompts_load_once_from_any_cwd(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    prompt = load_prompt("judge_agent.md")
+    assert "Judge Agent" in prompt
+    assert load_prompt("judge_agent.md") is prompt
+
+
+def test_config_import_is_quiet():
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+    result = subprocess.run([sys.executable, "-c", "import config"], cwd=root, env=env, capture_output=True, text=True)
+    assert result.returncode == 0
+    assert result.stdout == ""
@@ -0,0 +1,59 @@
+import sys
+import os
+import json
+import queue
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.collector import Collector
+from models.content import ContentCandidate, SelectedContent
+from models.step import RouteStep, step_index
+from models.step_table import StepTable
+
+
+def make_steps(n):
+    steps = []
+    for i in range(n):
+        step = RouteStep(index=i, instruction=["Turn left", "Turn right", "Continue"][i % 3],
+                         distance_m=100.0 + i, duration_s=10.0, end_lat=40.0 + i / 1000, end_lng=-74.0)
+        if i % 2:
+            step.start_lat, step.start_lng, step.way_points = 40.0, -74.0, (i * 4, i * 4 + 4)
+        steps.append(step)
+    steps[5].address = "Main St"
+    return steps
+
+
+def test_table_round_trips_steps():
+    steps = make_steps(10)
+    table = StepTable.from_steps(steps)
+
+    assert len(table) == 10 and list(table) == steps
+    assert table[-1] == steps[9] and table[3].id == "step_3"
+    assert len(table.instructions) == 3
+
+    # Slices keep their global step indices and addresses
+    tail = table[4:8]
+    assert [s.id for s in tail] == ["step_4", "step_5", "step_6", "step_7"]
+    assert tail[1].address == "Main St" and tail[0].start_lat is None
+
+    restored = StepTable.from_columns(json.loads(json.dumps(table.to_columns())))
+    assert list(restored) == steps
+
+
+def test_table_is_compact():
+    table = StepTable.from_steps(make_steps(10_000))
+    # 9 numeric columns of 8 bytes plus a 4-byte instruction id per step
+    assert table.nbytes() < 80 * len(table)
+
+
+def test_collector_orders_by_step_index():
+    collector = Collector(queue.Queue(), total_steps=5)
+    for step_id in ("step_10", "intro", "step_2", "outro", "step_1"):
+        collector.input_queue.put(SelectedContent(step_id, ContentCandidate("music", "t", "d", "r"), "j"))
+    collector.input_queue.put(None)
+    collector.run()
+
+    # Ids that are not "step_<n>" have no index, so they keep their arrival order after the numbered steps
+    assert step_index("intro") == -1
+    assert [r.step_id for r in collector.get_results()] == ["step_1", "step_2", "step_10", "intro", "outro"]
@@ -0,0 +1,66 @@
+import sys
+import os
+import queue
+from concurrent.futures import Future
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_upstreams import build_synthetic_route
+from config import Config
+from core.collector import Collector
+
+
+def test_trip_stream_yields_legs_as_they_arrive(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ORS_API_KEY", "test")
+    monkeypatch.setattr(Config, "CACHE_DIR", str(tmp_path))
+    from core.mapper import RouteFinder, TripStream
+    finder = RouteFinder()
+    first, second = Future(), Future()
+    first.set_result(finder._json_stream(build_synthetic_route([-74.0, 40.7], [-73.9, 40.8], 3), "a"))
+    trip = TripStream([("A", "B"), ("B", "C")], [first, second])
+
+    updates = []
+    trip.on_progress(lambda count, complete: updates.append((count, complete)))
+    steps = iter(trip)
+    # The first leg is consumed while the second is still being routed
+    assert [next(steps).id for _ in range(3)] == ["step_0", "step_1", "step_2"]
+    assert (trip.step_count, trip.complete) == (3, False)
+
+    second.set_result(finder._json_stream(build_synthetic_route([-73.9, 40.8], [-73.8, 40.9], 2), "b"))
+    rest = list(steps)
+    assert [s.index for s in rest] == [3, 4]
+    # Way points index the joined geometry (13 points for the first leg)
+    assert rest[0].way_points == (13, 17)
+    assert trip.geometry()[13] == [-73.9, 40.8]
+    assert updates == [(3, False), (5, True)]
+
+
+def test_engine_routes_legs_with_stops(fake_upstreams):
+    ors, _ = fake_upstreams(route_steps=4)
+    from core.engine import TravelGuideEngine
+
+    engine = TravelGuideEngine("Origin", "Destination", via=["Stop one", "Stop two"])
+    engine.start()
+    engine.join(timeout=30)
+
+    assert engine.is_complete and not engine.error
+    assert engine.collector.total_steps == 12 and engine.collector.total_final
+    assert [r.step_id for r in engine.results] == [f"step_{i}" for i in range(12)]
+    # Four stops geocoded once each, three legs
+    assert ors.request_count == 4 + 3
+
+    # Legs are cached on their own: a trip sharing the first leg only fetches the new one
+    from core.mapper import RouteFinder
+    steps = RouteFinder().get_route("Origin", "Elsewhere", via=["Stop one"])
+    assert len(steps) == 8 and list(steps.index) == list(range(8))
+    assert ors.request_count == 7 + 2 + 1
+
+
+def test_collector_keeps_final_total():
+    collector = Collector(queue.Queue(), total_steps=3, total_final=False)
+    # A late, stale update from another leg thread must not reopen the total
+    collector.set_total(12)
+    collector.set_total(7, final=False)
+    collector.set_total(5)
+    assert (collector.total_steps, collector.total_final) == (12, True)
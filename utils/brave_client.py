@@ -1,9 +1,13 @@
-import requests
 import os
-import json
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Optional, Tuple
 from config import Config
-from utils.logger import setup_logger
+from utils.cache import get_cache
+from utils.cancellation import current_token
+from utils.circuit_breaker import get_breaker, is_failure_status
+from utils.logger import setup_logger, STEP_LOG
+from utils.query_similarity import get_query_index
+from utils.replay import get_recorder
 
 logger = setup_logger("BraveSearchClient")
 
@@ -13,104 +17,144 @@ class BraveSearchClient:
             logger.warning("BRAVE_SEARCH_API_KEY is not set. Search functionality will fail.")
         
         self.api_key = Config.BRAVE_SEARCH_API_KEY
-        self.base_url = "https://api.search.brave.com/res/v1"
-        self.cache_dir = "cache"
-        self.cache_file = os.path.join(self.cache_dir, "search_cache.json")
+        self.base_url = Config.BRAVE_BASE_URL
+        self.cache_dir = Config.CACHE_DIR
+        # Over quota or a bad key fails every call; stop calling until a probe succeeds
+        self.breaker = get_breaker("brave", self.base_url)
         
         os.makedirs(self.cache_dir, exist_ok=True)
-        self.cache = self._load_cache()
-
-    def _load_cache(self) -> Dict[str, Any]:
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
-
-    def _save_cache(self):
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=4)
-        except Exception as e:
-            logger.error(f"Failed to save search cache: {e}")
+        # Shared "search" namespace (TTL, size caps, LRU); see utils/cache.py
+        self.cache = get_cache("search")
+        # One-off import of the old unbounded search_cache.json
+        self.cache.migrate_file(os.path.join(self.cache_dir, "search_cache.json"))
+        # Near-duplicate queries ("Times Square history" / "history of Times Square NYC")
+        # reuse each other's results; see utils/query_similarity.py
+        self.similar = {kind: get_query_index(kind) for kind in ("web", "video")} if Config.SEARCH_SIMILARITY_ENABLED else {}
+        self._seeded = set()
+        self._seed_lock = threading.Lock()
 
     def search_web(self, query: str, count: int = 5) -> List[Dict[str, str]]:
         """
         Searches the web for the given query.
         Returns a list of dicts with 'title', 'description', 'url'.
         """
-        cache_key = f"web:{query}"
-        if cache_key in self.cache:
-            logger.info(f"Returning cached web search results for: {query}")
-            return self.cache[cache_key]
-
-        headers = {
-            "Accept": "application/json",
-            "Accept-Encoding": "gzip",
-            "X-Subscription-Token": self.api_key
-        }
-        params = {"q": query, "count": count}
-        
-        try:
-            response = requests.get(f"{self.base_url}/web", headers=headers, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                if 'web' in data and 'results' in data['web']:
-                    for item in data['web']['results']:
-                        results.append({
-                            "title": item.get("title", ""),
-                            "description": item.get("description", ""),
-                            "url": item.get("url", "")
-                        })
-                
-                self.cache[cache_key] = results
-                self._save_cache()
-                return results
-            else:
-                logger.error(f"Brave Search API Error: {response.status_code} - {response.text}")
-                return []
-        except Exception as e:
-            logger.error(f"Search failed: {e}")
-            return []
+        similar = self._similar_results("web", query)
+        if similar is not None:
+            return similar
+        results, cached = self.cache.get_or_compute(
+            f"web:{query}", lambda: self._fetch("web", query, count, lambda data: data.get('web', {}).get('results', []))
+        )
+        if cached:
+            logger.info(f"Returning cached web search results for: {query}", extra=STEP_LOG)
+        if results:
+            self._index("web", query)
+        return results if results is not None else []
 
     def search_videos(self, query: str, count: int = 5) -> List[Dict[str, str]]:
         """
         Searches for videos.
         """
-        cache_key = f"video:{query}"
-        if cache_key in self.cache:
-            logger.info(f"Returning cached video search results for: {query}")
-            return self.cache[cache_key]
+        similar = self._similar_results("video", query)
+        if similar is not None:
+            return similar
+        results, cached = self.cache.get_or_compute(
+            f"video:{query}", lambda: self._fetch("videos", query, count, lambda data: data.get('results', []))
+        )
+        if cached:
+            logger.info(f"Returning cached video search results for: {query}", extra=STEP_LOG)
+        if results:
+            self._index("video", query)
+        return results if results is not None else []
 
+    def _index(self, kind: str, query: str):
+        if kind in self.similar:
+            self.similar[kind].add(query)
+
+    def _seed(self, kind: str):
+        """
+        Indexes the most recently used cached queries of this kind, once per
+        client, so near-duplicates of earlier runs' queries are found too.
+        """
+        with self._seed_lock:
+            if kind in self._seeded:
+                return
+            self._seeded.add(kind)
+            prefix = f"{kind}:"
+            queries = [key[len(prefix):] for key, _ in self.cache.items() if key.startswith(prefix)]
+            # items() is oldest access first
+            for query in queries[-Config.SEARCH_SIMILARITY_SEED:]:
+                self.similar[kind].add(query)
+
+    def _similar_results(self, kind: str, query: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Cached results of a near-duplicate query, or None (also when this exact
+        query is cached, which the normal lookup serves).
+        """
+        if kind not in self.similar or f"{kind}:{query}" in self.cache:
+            return None
+        self._seed(kind)
+        match = self.similar[kind].match(query)
+        if match is None or match.query == query:
+            return None
+        results = self.cache.get(f"{kind}:{match.query}")
+        if results is not None:
+            logger.info(f"Reusing {kind} results of '{match.query}' for: {query}", extra=STEP_LOG)
+        return results
+
+    def _fetch(self, endpoint: str, query: str, count: int, extract) -> Optional[List[Dict[str, str]]]:
+        """
+        Calls one Brave endpoint. Returns None on failure, so errors are not cached.
+        Concurrent identical queries share one call (see CacheNamespace.get_or_compute).
+        While the circuit breaker is open no request is made.
+        """
+        label = "Brave Video Search" if endpoint == "videos" else "Brave Search"
         headers = {
             "Accept": "application/json",
             "Accept-Encoding": "gzip",
             "X-Subscription-Token": self.api_key
         }
         params = {"q": query, "count": count}
+        if current_token().cancelled:
+            return None
+        if not self.breaker.allow():
+            logger.warning(f"{label} circuit open, skipping: {query}", extra=STEP_LOG)
+            return None
         
         try:
-            response = requests.get(f"{self.base_url}/videos", headers=headers, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                results = []
-                if 'results' in data:
-                    for item in data['results']:
-                        results.append({
-                            "title": item.get("title", ""),
-                            "description": item.get("description", ""),
-                            "url": item.get("url", "")
-                        })
-                
-                self.cache[cache_key] = results
-                self._save_cache()
-                return results
+            response = get_recorder().http_get("brave", f"{self.base_url}/{endpoint}", headers=headers, params=params)
+            if is_failure_status(response.status_code):
+                self.breaker.record_failure(f"HTTP {response.status_code}")
             else:
-                logger.error(f"Brave Video Search API Error: {response.status_code} - {response.text}")
-                return []
+                self.breaker.record_success()
+            if response.status_code == 200:
+                return [
+                    {
+                        "title": item.get("title", ""),
+                        "description": item.get("description", ""),
+                        "url": item.get("url", "")
+                    }
+                    for item in extract(response.json())
+                ]
+            logger.error(f"{label} API Error: {response.status_code} - {response.text}")
         except Exception as e:
-            logger.error(f"Video search failed: {e}")
-            return []
+            self.breaker.record_failure(str(e))
+            logger.error(f"{label} failed: {e}")
+        return None
+
+
+_clients: Dict[Tuple[str, str, str], BraveSearchClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_search_client() -> BraveSearchClient:
+    """
+    Returns the process-wide search client for the current settings, built on
+    first use. Agents share it (and its cache) instead of building their own.
+    """
+    key = (Config.BRAVE_BASE_URL, Config.BRAVE_SEARCH_API_KEY or "", Config.CACHE_DIR)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = BraveSearchClient()
+            _clients[key] = client
+        return client
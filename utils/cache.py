@@ -0,0 +1,338 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger("Cache")
+
+_STAT_FIELDS = ("hits", "misses", "evictions", "expirations")
+
+
+class CacheNamespace:
+    """
+    A named key/value cache with a TTL, entry and byte caps, and LRU eviction.
+
+    Entries are persisted to a single compact JSON file in LRU order, together
+    with cumulative hit/miss/eviction counters. The file is read on first
+    access, and writes are batched (at most one every `flush_interval`
+    seconds, plus one at exit).
+    `on_evict(key, value)` is called whenever an entry is removed, so a
+    namespace can own files on disk (see RouteCache).
+    """
+    def __init__(self, name: str, path: str, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 on_evict: Optional[Callable[[str, Any], None]] = None,
+                 flush_interval: Optional[float] = None):
+        self.name = name
+        self.path = path
+        self.ttl = ttl or None
+        self.max_entries = max_entries or None
+        self.max_bytes = max_bytes or None
+        self.on_evict = on_evict
+        self.flush_interval = Config.CACHE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+
+        # key -> [created, accessed, size, value], oldest access first
+        self._entries: Optional["OrderedDict[str, list]"] = None
+        self._bytes = 0
+        self._stats = {field: 0 for field in _STAT_FIELDS}
+        self._dirty = False
+        self._last_flush = time.time()
+        self._lock = threading.RLock()
+        # Serialises flushes, so an older snapshot never overwrites a newer one
+        self._flush_lock = threading.Lock()
+        # Per-key locks for get_or_compute, so concurrent misses compute once
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    # --------------------------------------------------------------- loading
+
+    def _ensure_loaded(self):
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            logger.warning(f"Cache file {self.path} is corrupted. Starting with empty '{self.name}' cache.")
+            return
+
+        now = time.time()
+        if isinstance(data, dict) and "entries" in data:
+            for key, created, accessed, size, value in data["entries"]:
+                self._entries[key] = [created, accessed, size, value]
+                self._bytes += size
+            for field in _STAT_FIELDS:
+                self._stats[field] = data.get("stats", {}).get(field, 0)
+        elif isinstance(data, dict):
+            # Plain {key: value} mapping (older cache files)
+            for key, value in data.items():
+                size = _sizeof(value)
+                self._entries[key] = [now, now, size, value]
+                self._bytes += size
+
+    def import_mapping(self, mapping: Dict[str, Any]):
+        """
+        Bulk-loads a {key: value} mapping, e.g. when migrating an old cache file.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            for key, value in mapping.items():
+                if key not in self._entries:
+                    self._store(key, value, _sizeof(value))
+            self._enforce_caps()
+            self._dirty = True
+        self.flush()
+
+    def migrate_file(self, legacy_file: str):
+        """
+        One-off import of an old plain-JSON cache file, which is then renamed to `.migrated`.
+        """
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, "r") as f:
+                mapping = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to migrate {legacy_file}: {e}")
+            return
+        logger.info(f"Migrating {len(mapping)} entries from {legacy_file} into '{self.name}' cache")
+        self.import_mapping(mapping)
+        os.replace(legacy_file, f"{legacy_file}.migrated")
+
+    # ------------------------------------------------------------ public API
+
+    def get(self, key: str, default: Any = None, allow_expired: bool = False) -> Any:
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            if self._is_expired(entry) and not allow_expired:
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                self._remove(key)
+                self._dirty = True
+                return default
+            entry[1] = time.time()
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            self._dirty = True
+            return entry[3]
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Returns (value, was_cached). On a miss `compute()` runs once per key
+        even when several threads ask at the same time; the others wait and
+        get its result. A None result is returned but not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and not self._is_expired(entry):
+                    # Computed by another thread while we waited
+                    self._stats["hits"] += 1
+                    return entry[3], True
+            try:
+                value = compute()
+                if value is not None:
+                    self.put(key, value)
+                return value, False
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            return entry is not None and not self._is_expired(entry)
+
+    def put(self, key: str, value: Any, size: Optional[int] = None):
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._entries:
+                self._remove(key, notify=False)
+            self._store(key, value, _sizeof(value) if size is None else size)
+            self._enforce_caps(protect=key)
+            self._dirty = True
+        self._maybe_flush()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._entries:
+                self._remove(key)
+                self._dirty = True
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            snapshot = [(key, entry[3]) for key, entry in self._entries.items()]
+        return iter(snapshot)
+
+    def prune(self) -> Dict[str, int]:
+        """
+        Drops expired entries and enforces the caps. Returns what was removed.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            before = dict(self._stats)
+            for key in [k for k, entry in self._entries.items() if self._is_expired(entry)]:
+                self._stats["expirations"] += 1
+                self._remove(key)
+            self._enforce_caps()
+            self._dirty = True
+            removed = {
+                "expired": self._stats["expirations"] - before["expirations"],
+                "evicted": self._stats["evictions"] - before["evictions"],
+            }
+        self.flush()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_loaded()
+            now = time.time()
+            created = [entry[0] for entry in self._entries.values()]
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "namespace": self.name,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "ttl_seconds": self.ttl,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "oldest_age_seconds": round(now - min(created), 1) if created else 0.0,
+                **self._stats,
+            }
+
+    def flush(self):
+        """
+        Writes the namespace to disk (atomically) if anything changed. The
+        entries are copied under the lock and written outside it, so readers
+        and writers are not blocked on the disk.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._entries is None or not self._dirty:
+                    return
+                data = {
+                    "version": 1,
+                    "stats": dict(self._stats),
+                    "entries": [[key, *entry] for key, entry in self._entries.items()],
+                }
+                self._dirty = False
+                self._last_flush = time.time()
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Failed to save '{self.name}' cache: {e}")
+
+    # --------------------------------------------------------------- helpers
+
+    def _is_expired(self, entry: list) -> bool:
+        return self.ttl is not None and time.time() - entry[0] > self.ttl
+
+    def _store(self, key: str, value: Any, size: int):
+        now = time.time()
+        self._entries[key] = [now, now, size, value]
+        self._bytes += size
+
+    def _remove(self, key: str, notify: bool = True):
+        created, accessed, size, value = self._entries.pop(key)
+        self._bytes -= size
+        if notify and self.on_evict:
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                logger.error(f"Eviction callback failed for '{self.name}' key {key}: {e}")
+
+    def _enforce_caps(self, protect: Optional[str] = None):
+        # Evict least recently used first; never the entry that was just written
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries) or
+            (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            if key == protect:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            self._stats["evictions"] += 1
+            self._remove(key)
+
+    def _maybe_flush(self):
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+
+def _sizeof(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":")))
+
+
+# Per-namespace settings, read from Config when the namespace is first used
+NAMESPACE_SETTINGS = {
+    "search": lambda: dict(ttl=Config.SEARCH_CACHE_TTL, max_entries=Config.SEARCH_CACHE_MAX_ENTRIES,
+                           max_bytes=Config.SEARCH_CACHE_MAX_BYTES),
+    "routes": lambda: dict(ttl=Config.ROUTE_CACHE_TTL, max_entries=Config.ROUTE_CACHE_MAX_ENTRIES,
+                           max_bytes=Config.ROUTE_CACHE_MAX_BYTES),
+    "llm": lambda: dict(ttl=Config.LLM_CACHE_TTL, max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+                        max_bytes=Config.LLM_CACHE_MAX_BYTES),
+    # Map polylines per route and zoom level; derived from the route cache, so same limits
+    "route_lod": lambda: dict(ttl=Config.ROUTE_CACHE_TTL, max_entries=Config.ROUTE_CACHE_MAX_ENTRIES),
+    # Agent routing win counts per context; small, and kept fresh by the router itself
+    "router": lambda: dict(max_entries=10000),
+}
+
+_namespaces: Dict[Tuple[str, str], CacheNamespace] = {}
+_namespaces_lock = threading.Lock()
+
+
+def get_cache(name: str, path: Optional[str] = None, **overrides) -> CacheNamespace:
+    """
+    Returns the shared CacheNamespace for `name`, so every client in the
+    process reads and writes the same entries.
+    By default it lives at <CACHE_DIR>/<name>.json.
+    """
+    path = path or os.path.join(Config.CACHE_DIR, f"{name}.json")
+    with _namespaces_lock:
+        namespace = _namespaces.get((name, path))
+        if namespace is None:
+            settings = NAMESPACE_SETTINGS.get(name, dict)()
+            settings.update(overrides)
+            namespace = CacheNamespace(name, path, **settings)
+            _namespaces[(name, path)] = namespace
+        return namespace
+
+
+def flush_all():
+    with _namespaces_lock:
+        namespaces = list(_namespaces.values())
+    for namespace in namespaces:
+        namespace.flush()
+
+
+atexit.register(flush_all)
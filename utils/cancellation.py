@@ -0,0 +1,157 @@
+import queue
+import threading
+from typing import Callable, Dict, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger("Cancellation")
+
+
+class CancelledError(Exception):
+    """
+    Raised by raise_if_cancelled() once a token has been cancelled.
+    """
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for one run.
+
+    Long waits poll `cancelled` (or use `wait()`), and anything that can
+    only be interrupted from outside (a subprocess, an open HTTP response)
+    registers a callback with `on_cancel()` for as long as it is in flight.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: Dict[int, Callable[[], None]] = {}
+        self._next_handle = 0
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        logger.info(f"Cancelling run: {reason}")
+        for callback in callbacks:
+            self._run_callback(callback)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Sleeps up to `timeout` seconds; returns True if cancelled meanwhile.
+        """
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise CancelledError(self.reason)
+
+    def on_cancel(self, callback: Callable[[], None]) -> "_Registration":
+        """
+        Runs `callback` if the token is cancelled while the returned context is open
+        (immediately if it already is).
+        """
+        with self._lock:
+            if not self._event.is_set():
+                handle = self._next_handle
+                self._next_handle += 1
+                self._callbacks[handle] = callback
+                return _Registration(self, handle)
+        self._run_callback(callback)
+        return _Registration(self, None)
+
+    def _unregister(self, handle: int):
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+    @staticmethod
+    def _run_callback(callback: Callable[[], None]):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Cancellation callback failed: {e}")
+
+
+class _Registration:
+    def __init__(self, token: CancellationToken, handle: Optional[int]):
+        self.token = token
+        self.handle = handle
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle is not None:
+            self.token._unregister(self.handle)
+        return False
+
+
+# Never cancelled; used when a thread has no token bound
+NEVER_CANCELLED = CancellationToken()
+
+_local = threading.local()
+
+
+def bind_token(token: Optional[CancellationToken]):
+    """
+    Makes `token` the current thread's token, so shared clients can find it
+    without every call passing it along (like logger.bind_run).
+    """
+    _local.token = token
+
+
+def current_token() -> CancellationToken:
+    return getattr(_local, "token", None) or NEVER_CANCELLED
+
+
+# How often blocked queue operations re-check the token
+POLL_SECONDS = 0.1
+
+
+def put_unless_cancelled(q: queue.Queue, item, token: CancellationToken) -> bool:
+    """
+    Puts onto a (possibly full, bounded) queue; gives up and returns False once cancelled.
+    """
+    while not token.cancelled:
+        try:
+            q.put(item, timeout=POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def get_unless_cancelled(q: queue.Queue, token: CancellationToken, timeout: Optional[float] = None):
+    """
+    Gets from a queue, re-checking the token while waiting.
+    Raises queue.Empty after `timeout` seconds and CancelledError once cancelled.
+    """
+    waited = 0.0
+    while True:
+        token.raise_if_cancelled()
+        try:
+            return q.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            waited += POLL_SECONDS
+            if timeout is not None and waited >= timeout:
+                raise
+
+
+def drain(q: queue.Queue) -> int:
+    """
+    Drops everything currently queued; returns how many items were dropped.
+    """
+    dropped = 0
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return dropped
+        dropped += 1
@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger("CircuitBreaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# HTTP statuses that mean the dependency itself is down, throttled or refusing our key
+# (other 4xx are problems with one request and do not count against it)
+FAILURE_STATUSES = {401, 403, 429}
+
+
+def is_failure_status(status_code: int) -> bool:
+    return status_code >= 500 or status_code in FAILURE_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is down.
+
+    Closed: calls go through and their outcomes fill a sliding window of the
+    last `window` calls. Once it holds at least `min_calls` outcomes and the
+    failure share reaches `error_rate`, the breaker opens.
+    Open: allow() is False, so callers use cached or fallback results at once.
+    After `cooldown` seconds the breaker goes half-open.
+    Half-open: `probes` calls at a time are let through; a success closes the
+    breaker, a failure opens it for another cool-down.
+    """
+    def __init__(self, name: str, window: Optional[int] = None, min_calls: Optional[int] = None,
+                 error_rate: Optional[float] = None, cooldown: Optional[float] = None,
+                 probes: int = 1, clock: Callable[[], float] = time.monotonic, scope: str = ""):
+        self.name = name
+        self.scope = scope
+        self.window = window or Config.BREAKER_WINDOW
+        self.min_calls = min_calls or Config.BREAKER_MIN_CALLS
+        self.error_rate = Config.BREAKER_ERROR_RATE if error_rate is None else error_rate
+        self.cooldown = Config.BREAKER_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.probes = probes
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: deque = deque(maxlen=self.window)  # True = failure
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.last_error: Optional[str] = None
+        # Lifetime counters, for the UI and the report
+        self.calls = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            logger.info(f"Circuit '{self.name}' half-open, probing")
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        True if a call may go out now. Every allowed call must be followed by
+        record_success(), record_failure() or release().
+        """
+        if not Config.BREAKER_ENABLED:
+            return True
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes_in_flight < self.probes:
+                self._probes_in_flight += 1
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.calls += 1
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+                logger.info(f"Circuit '{self.name}' closed, probe succeeded")
+            self._outcomes.append(False)
+
+    def release(self):
+        """
+        For an allowed call that ended without a verdict (e.g. it was cancelled).
+        """
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def record_failure(self, error: str = ""):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.last_error = error[:200] if error else self.last_error
+            if self._state == HALF_OPEN:
+                self._open(f"probe failed: {error}")
+                return
+            self._outcomes.append(True)
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+                rate = sum(self._outcomes) / len(self._outcomes)
+                if rate >= self.error_rate:
+                    self._open(f"{rate:.0%} of the last {len(self._outcomes)} calls failed: {error}")
+
+    def _open(self, why: str):
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._outcomes.clear()
+        self.times_opened += 1
+        logger.warning(f"Circuit '{self.name}' opened for {self.cooldown:g}s ({why[:200]})")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            recent = len(self._outcomes)
+            return {
+                "name": self.name,
+                "scope": self.scope,
+                "state": state,
+                "recent_error_rate": round(sum(self._outcomes) / recent, 2) if recent else 0.0,
+                "calls": self.calls,
+                "failures": self.failures,
+                "short_circuited": self.short_circuited,
+                "times_opened": self.times_opened,
+                "retry_in": round(max(0.0, self.cooldown - (self.clock() - self._opened_at)), 1) if state == OPEN else 0.0,
+                "last_error": self.last_error,
+            }
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, scope: str = "") -> CircuitBreaker:
+    """
+    The process-wide breaker for one dependency ("llm", "brave", "ors") at one
+    endpoint, so clients built for the same upstream share its state.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get((name, scope))
+        if breaker is None:
+            breaker = CircuitBreaker(name, scope=scope)
+            _breakers[(name, scope)] = breaker
+        return breaker
+
+
+# Lifetime counters in a snapshot, which breaker_snapshots(since=...) reports per trip
+COUNTERS = ("calls", "failures", "short_circuited", "times_opened")
+
+
+def breaker_snapshots(since: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Snapshots of every breaker. With `since` (earlier snapshots), the counters
+    only cover what happened after those were taken.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    snapshots = [breaker.snapshot() for breaker in breakers]
+    if since:
+        earlier = {(s["name"], s["scope"]): s for s in since}
+        for snapshot in snapshots:
+            before = earlier.get((snapshot["name"], snapshot["scope"]))
+            if before is not None:
+                snapshot.update({name: snapshot[name] - before[name] for name in COUNTERS})
+    return snapshots
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
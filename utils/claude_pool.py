@@ -0,0 +1,231 @@
+import atexit
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+from utils.cancellation import current_token
+from utils.logger import setup_logger, STEP_LOG
+
+logger = setup_logger("ClaudeSessionPool")
+
+STREAM_ARGS = [
+    '--dangerously-skip-permissions', '-p',
+    '--input-format', 'stream-json',
+    '--output-format', 'stream-json',
+    '--verbose',
+]
+
+
+class ClaudeSessionError(Exception):
+    """
+    Raised when a session dies, times out or reports an error.
+    """
+
+
+class ClaudeSession:
+    """
+    One `claude` process in streaming JSON mode.
+
+    Each prompt is written to stdin as a `user` message line; stdout lines are
+    read by a background thread, and a turn ends at the `result` message.
+    """
+    def __init__(self, command: List[str], env: Dict[str, str]):
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            env=env
+        )
+        self.requests_served = 0
+        # Set after a failed turn: the stream may be out of sync, so never reuse it
+        self.broken = False
+        self.timed_out = False
+        self.started_at = time.time()
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._reader = threading.Thread(target=self._read_stdout, daemon=True)
+        self._reader.start()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            self._lines.put(line)
+        # EOF: the process exited
+        self._lines.put(None)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(self, prompt: str, timeout: float) -> str:
+        message = {
+            "type": "user",
+            "message": {"role": "user", "content": [{"type": "text", "text": prompt}]}
+        }
+        try:
+            self.process.stdin.write(json.dumps(message) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ClaudeSessionError(f"session {self.pid} is not accepting input: {e}")
+
+        # Cancelling the run kills the session mid-turn; the pool then replaces it
+        with current_token().on_cancel(self.process.kill):
+            return self._read_result(timeout)
+
+    def _read_result(self, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.timed_out = True
+                raise ClaudeSessionError(f"session {self.pid} timed out after {timeout}s")
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                raise ClaudeSessionError(f"session {self.pid} exited with code {self.process.poll()}")
+
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                # Non-protocol output; ignore it
+                continue
+
+            if event.get("type") == "result":
+                self.requests_served += 1
+                if event.get("is_error"):
+                    raise ClaudeSessionError(f"session {self.pid} returned an error: {event.get('result')}")
+                return (event.get("result") or "").strip()
+
+    def close(self):
+        if self.alive():
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=2)
+            except Exception:
+                self.process.kill()
+        else:
+            self.process.wait()
+
+
+class ClaudeSessionPool:
+    """
+    Pool of warm `claude` sessions shared by all agent workers.
+
+    A stream-json session is one conversation, so a session answers a single
+    prompt: anything more would carry one step's prompts into the next one's
+    context and grow every call's tokens. On check-in the used session is
+    closed and its replacement is started at once, so the next prompt still
+    finds a process that has already booted. Sessions that crash or time out
+    are replaced the same way.
+    """
+    def __init__(self, size: Optional[int] = None, timeout: Optional[float] = None,
+                 command: Optional[List[str]] = None):
+        self.size = size or Config.CLAUDE_POOL_SIZE
+        self.timeout = timeout or Config.CLAUDE_CLI_TIMEOUT
+        self.command = command or [Config.CLAUDE_CLI_PATH] + STREAM_ARGS
+        self.restarts = 0
+        self._lock = threading.Lock()
+
+        self.env = os.environ.copy()
+        if Config.LLM_API_KEY:
+            self.env["ANTHROPIC_API_KEY"] = Config.LLM_API_KEY
+
+        # Sessions are started lazily, on first checkout
+        self._idle: "queue.LifoQueue[Optional[ClaudeSession]]" = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(None)
+        self._closed = False
+
+    def _spawn(self) -> ClaudeSession:
+        session = ClaudeSession(self.command, self.env)
+        logger.debug(f"Started claude session {session.pid}")
+        return session
+
+    def generate(self, prompt: str) -> str:
+        session = self._idle.get()
+        try:
+            # A warm session may have died while idle; retry that once on a fresh one
+            for attempt in range(2):
+                spawned = session is None
+                if spawned:
+                    session = self._spawn()
+                logger.info(f"Claude session {session.pid} received prompt length: {len(prompt)}", extra=STEP_LOG)
+                try:
+                    return session.request(prompt, self.timeout)
+                except ClaudeSessionError as e:
+                    session.broken = True
+                    session.process.kill()
+                    if attempt == 0 and not spawned and not session.timed_out and not current_token().cancelled:
+                        logger.warning(f"Claude session error, retrying on a new session: {e}")
+                        self._recycle(session, failed=True)
+                        session = None
+                        continue
+                    if current_token().cancelled:
+                        logger.info(f"Claude session {session.pid} killed: run cancelled")
+                    else:
+                        logger.error(f"Claude session error: {e}")
+                    raise
+        finally:
+            replacement = None
+            if session is not None:
+                self._recycle(session, failed=session.broken)
+                if not self._closed:
+                    # Boots while the caller works with this answer
+                    try:
+                        replacement = self._spawn()
+                    except OSError as e:
+                        logger.error(f"Could not start a claude session: {e}")
+            self._idle.put(replacement)
+
+    def _recycle(self, session: ClaudeSession, failed: bool = False):
+        session.close()
+        if failed:
+            # Sessions replaced because they broke, not the routine one-prompt turnover
+            logger.info(f"Replacing failed claude session {session.pid}")
+            with self._lock:
+                self.restarts += 1
+
+    def close(self):
+        """
+        Stops idle sessions; sessions in use are stopped when they are checked in.
+        """
+        self._closed = True
+        sessions = []
+        while True:
+            try:
+                sessions.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for session in sessions:
+            if session is not None:
+                session.close()
+            self._idle.put(None)
+
+
+_pool: Optional[ClaudeSessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> ClaudeSessionPool:
+    """
+    Returns the process-wide session pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClaudeSessionPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,160 @@
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from utils.logger import setup_logger
+
+logger = setup_logger("JSONStream")
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for the single JSON object an LLM is asked to return.
+
+    Text before the first `{` (e.g. a markdown fence) is skipped. `feed()`
+    returns the top-level fields whose values were completed by that chunk,
+    so callers can act on a field before the rest of the object arrives.
+    """
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._start = -1
+        self._end = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # key -> colon -> value -> (string | nested | scalar) -> comma -> key ...
+        self._state = "key"
+        self._key: Optional[str] = None
+        self._token_start = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.text += chunk
+        completed = []
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            i = self._pos
+            c = text[i]
+            self._pos += 1
+
+            if self._start < 0:
+                if c == "{":
+                    self._start = i
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key":
+                        self._key = json.loads(text[self._token_start:i + 1])
+                        self._state = "colon"
+                    elif self._depth == 1 and self._state == "string":
+                        completed.append(self._complete(text[self._token_start:i + 1]))
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state in ("key", "value"):
+                    self._token_start = i
+                    if self._state == "value":
+                        self._state = "string"
+            elif c in "{[":
+                if self._depth == 1 and self._state == "value":
+                    self._token_start = i
+                    self._state = "nested"
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._state == "nested":
+                    completed.append(self._complete(text[self._token_start:i + 1]))
+                elif self._depth == 0:
+                    if self._state == "scalar":
+                        completed.append(self._complete(text[self._token_start:i]))
+                    self._end = i
+                    self.done = True
+            elif self._depth == 1:
+                if c == ":" and self._state == "colon":
+                    self._state = "value"
+                elif c == ",":
+                    if self._state == "scalar":
+                        completed.append(self._complete(text[self._token_start:i]))
+                    self._state = "key"
+                elif self._state == "value" and not c.isspace():
+                    self._token_start = i
+                    self._state = "scalar"
+        return completed
+
+    def _complete(self, raw: str) -> Tuple[str, Any]:
+        raw = raw.strip()
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        self.fields[self._key] = value
+        self._state = "comma"
+        return self._key, value
+
+    def result(self) -> Dict[str, Any]:
+        """
+        The whole object once it is closed, otherwise the fields seen so far.
+        """
+        if self.done:
+            try:
+                return json.loads(self.text[self._start:self._end + 1])
+            except json.JSONDecodeError:
+                pass
+        return dict(self.fields)
+
+
+class JSONFieldStream:
+    """
+    Reads a streamed completion through an IncrementalJSONParser on demand.
+    `wait_for(field)` consumes only as much of the stream as needed to know
+    that field; `finish()` reads the rest and returns the parsed object.
+    """
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = iter(chunks)
+        self.parser = IncrementalJSONParser()
+        self.exhausted = False
+
+    def _read_chunk(self) -> bool:
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.exhausted = True
+            return False
+        self.parser.feed(chunk)
+        return True
+
+    def wait_for(self, field: str) -> Optional[Any]:
+        """
+        Returns the field's value as soon as it is complete, or None if the
+        object ends (or the stream runs out) without it.
+        """
+        while field not in self.parser.fields:
+            if self.parser.done or self.exhausted or not self._read_chunk():
+                return None
+        return self.parser.fields[field]
+
+    def finish(self) -> Dict[str, Any]:
+        while not self.exhausted and self._read_chunk():
+            pass
+        self.close()
+        data = self.parser.result()
+        if not data and self.parser.text.strip():
+            logger.error(f"Failed to parse JSON response: {self.parser.text}")
+        return data
+
+    def close(self):
+        """
+        Stops reading; generator-based streams release their connection or process.
+        """
+        close = getattr(self._chunks, "close", None)
+        if close:
+            close()
+        self.exhausted = True
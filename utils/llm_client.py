@@ -1,24 +1,223 @@
 import abc
+import atexit
+import hashlib
+import json
+import math
 import os
+import random
+import re
 import subprocess
+import threading
+from typing import Any, Dict, Iterator, Optional
+import requests
+from requests.adapters import HTTPAdapter
 from config import Config
-from utils.logger import setup_logger
+from utils.cache import get_cache
+from utils.cancellation import current_token
+from utils.claude_pool import STREAM_ARGS, ClaudeSessionError, ClaudeSessionPool, get_session_pool
+from utils.logger import setup_logger, STEP_LOG
+from utils.replay import get_recorder
 
 logger = setup_logger("LLMClient")
 
+# Returned instead of a completion once the run is cancelled (never cached)
+CANCELLED_RESPONSE = "Error: cancelled"
+
 class BaseLLMClient(abc.ABC):
     @abc.abstractmethod
     def generate_text(self, prompt: str) -> str:
         pass
 
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """
+        Yields the completion in chunks as it is produced.
+        Clients without a streaming transport yield the whole text at once.
+        """
+        yield self.generate_text(prompt)
+
+    def cached_text(self, prompt: str) -> Optional[str]:
+        """
+        The response if it can be served without calling the model, else None.
+        """
+        return None
+
+    def store_text(self, prompt: str, text: str):
+        """
+        Remembers `text` as the response to `prompt`, for clients with a cache.
+        """
+
 class MockLLMClient(BaseLLMClient):
+    """
+    Offline stand-in for the real LLM.
+    Recognises the agent/judge prompts and answers with JSON in the shape each
+    one expects, after sleeping for a latency drawn from a configurable
+    distribution. A fraction of calls can be made to fail like the CLI does.
+    """
+    # Characters per streamed chunk (roughly a few tokens)
+    STREAM_CHUNK_CHARS = 8
+
+    def __init__(self, latency_dist: Optional[str] = None, latency_ms: Optional[float] = None,
+                 jitter_ms: Optional[float] = None, error_rate: Optional[float] = None,
+                 seed: Optional[int] = None, model: Optional[str] = None):
+        # Only part of the cache key; the mock answers the same for every model
+        self.model = model or ""
+        self.latency_dist = (latency_dist or Config.MOCK_LLM_LATENCY_DIST).lower()
+        self.latency_ms = Config.MOCK_LLM_LATENCY_MS if latency_ms is None else latency_ms
+        self.jitter_ms = Config.MOCK_LLM_LATENCY_JITTER_MS if jitter_ms is None else jitter_ms
+        self.error_rate = Config.MOCK_LLM_ERROR_RATE if error_rate is None else error_rate
+        if seed is None and Config.MOCK_LLM_SEED:
+            seed = int(Config.MOCK_LLM_SEED)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.call_count = 0
+
+    def _sample_latency(self) -> float:
+        """
+        Returns a latency in seconds according to the configured distribution.
+        """
+        mean = max(self.latency_ms, 0.0)
+        with self._lock:
+            if self.latency_dist == "uniform":
+                value = self._random.uniform(mean - self.jitter_ms, mean + self.jitter_ms)
+            elif self.latency_dist == "exponential":
+                value = self._random.expovariate(1.0 / mean) if mean > 0 else 0.0
+            elif self.latency_dist == "lognormal":
+                # jitter_ms is used as the standard deviation of the underlying distribution
+                if mean > 0:
+                    sigma = math.sqrt(math.log(1 + (self.jitter_ms / mean) ** 2))
+                    mu = math.log(mean) - sigma ** 2 / 2
+                    value = self._random.lognormvariate(mu, sigma)
+                else:
+                    value = 0.0
+            else:
+                value = mean
+        return max(value, 0.0) / 1000.0
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _build_response(self, prompt: str) -> Dict[str, Any]:
+        if "Judge Agent" in prompt:
+            with self._lock:
+                selected_type = self._random.choice(["video", "music", "history"])
+            return {"selected_type": selected_type, "reasoning": "Mock judge decision."}
+
+        # Content agents: the first call asks for a search query, the
+        # follow-up (which carries the search results) asks for a selection.
+        if "Search Results:" not in prompt:
+            location = re.search(r"Location: (.*)", prompt)
+            place = location.group(1).strip() if location else "somewhere"
+            return {"search_query": f"things to know about {place}"}
+
+        if "YouTube Agent" in prompt:
+            url = re.search(r"\((https?://[^)]+)\)", prompt)
+            return {"selected_video": {
+                "title": "Mock travel vlog",
+                "url": url.group(1) if url else "https://example.com/video",
+                "description": "A mock video.",
+                "reasoning": "Mock selection."
+            }}
+        if "Music Agent" in prompt:
+            return {"selected_song": {
+                "title": "Mock Song",
+                "artist": "Mock Artist",
+                "description": "A mock song.",
+                "reasoning": "Mock selection."
+            }}
+        return {"selected_story": {
+            "title": "Mock Story",
+            "content": "A mock historical fact.",
+            "reasoning": "Mock selection."
+        }}
+
     def generate_text(self, prompt: str) -> str:
-        logger.info(f"Mock LLM received prompt: {prompt[:50]}...")
-        return "This is a mock response from the LLM."
+        logger.info(f"Mock LLM received prompt: {prompt[:50]}...", extra=STEP_LOG)
+        with self._lock:
+            self.call_count += 1
+
+        latency = self._sample_latency()
+        if latency > 0 and current_token().wait(latency):
+            return CANCELLED_RESPONSE
+
+        if self._should_fail():
+            return "Error calling Claude CLI: mock failure"
+
+        return json.dumps(self._build_response(prompt))
+
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """
+        Same response as generate_text, emitted in small chunks with the
+        sampled latency spread evenly across them, like tokens arriving.
+        """
+        logger.info(f"Mock LLM received prompt: {prompt[:50]}...", extra=STEP_LOG)
+        with self._lock:
+            self.call_count += 1
+
+        token = current_token()
+        latency = self._sample_latency()
+        if self._should_fail():
+            if not token.wait(latency):
+                yield "Error calling Claude CLI: mock failure"
+            return
+
+        text = json.dumps(self._build_response(prompt))
+        chunks = [text[i:i + self.STREAM_CHUNK_CHARS] for i in range(0, len(text), self.STREAM_CHUNK_CHARS)]
+        for chunk in chunks:
+            if latency > 0 and token.wait(latency / len(chunks)):
+                return
+            yield chunk
 
 class ClaudeCLIClient(BaseLLMClient):
+    """
+    Runs prompts through the `claude` CLI.
+    In "oneshot" mode every call starts a new process; in "persistent" mode
+    calls are served by a shared pool of warm stream-json sessions
+    (see utils/claude_pool.py).
+    """
+    def __init__(self, mode: Optional[str] = None, pool: Optional[ClaudeSessionPool] = None,
+                 model: Optional[str] = None, timeout: Optional[float] = None):
+        self.mode = (mode or Config.CLAUDE_CLI_MODE).lower()
+        # None uses the CLI's default model
+        self.model = model
+        self.timeout = timeout or Config.CLAUDE_CLI_TIMEOUT
+        if pool is None and self.mode == "persistent" and (model or timeout):
+            # Sessions are started with their model, so they cannot come from the shared pool
+            model_args = ["--model", model] if model else []
+            pool = ClaudeSessionPool(command=[Config.CLAUDE_CLI_PATH] + STREAM_ARGS + model_args, timeout=self.timeout)
+            atexit.register(pool.close)
+        self._pool = pool
+
+    @staticmethod
+    def _run_oneshot(args, timeout=None, env=None) -> subprocess.CompletedProcess:
+        """
+        Like subprocess.run, but the process is killed when the current run is cancelled.
+        """
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+        token = current_token()
+        with token.on_cancel(process.kill):
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+        if token.cancelled:
+            return subprocess.CompletedProcess(args, process.returncode, "", "cancelled")
+        return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+    def _run_in_session(self, args, timeout=None, env=None) -> subprocess.CompletedProcess:
+        pool = self._pool or get_session_pool()
+        try:
+            text = pool.generate(args[-1])
+        except ClaudeSessionError as e:
+            return subprocess.CompletedProcess(args, 1, "", str(e))
+        return subprocess.CompletedProcess(args, 0, text, "")
+
     def generate_text(self, prompt: str) -> str:
-        logger.info(f"Claude CLI received prompt length: {len(prompt)}")
+        if current_token().cancelled:
+            return CANCELLED_RESPONSE
+        logger.info(f"Claude CLI received prompt length: {len(prompt)}", extra=STEP_LOG)
         
         try:
             # We assume 'claude' is in the PATH.
@@ -58,14 +257,18 @@ class ClaudeCLIClient(BaseLLMClient):
             # Run claude with the prompt
             # User instructions: use -p for print mode and --dangerously-skip-permissions for headless
             
-            result = subprocess.run(
-                ['claude', '--dangerously-skip-permissions', '-p', prompt], 
-                capture_output=True, 
-                text=True,
-                timeout=120, # Increased timeout for safety
+            # Both modes are recorded under the one-shot command line, so archives work with either
+            model_args = ['--model', self.model] if self.model else []
+            result = get_recorder().run_command(
+                "claude_cli",
+                [Config.CLAUDE_CLI_PATH, '--dangerously-skip-permissions'] + model_args + ['-p', prompt],
+                runner=self._run_in_session if self.mode == "persistent" else self._run_oneshot,
+                timeout=self.timeout,
                 env=env
             )
             
+            if current_token().cancelled:
+                return CANCELLED_RESPONSE
             if result.returncode != 0:
                 logger.error(f"Claude CLI Error: {result.stderr}")
                 return f"Error calling Claude CLI: {result.stderr}"
@@ -79,13 +282,226 @@ class ClaudeCLIClient(BaseLLMClient):
             logger.error(f"Error executing Claude CLI: {e}")
             return f"Error: {e}"
 
+class AnthropicHTTPClient(BaseLLMClient):
+    """
+    Calls an Anthropic-style HTTP messages API directly.
+    A single requests.Session keeps a pool of keep-alive connections, so the
+    per-call cost is one HTTP round trip instead of a process start + auth.
+    Concurrency is capped with a semaphore sized like the connection pool.
+    """
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None,
+                 max_concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                 max_tokens: Optional[int] = None, api_key: Optional[str] = None):
+        self.url = f"{(base_url or Config.LLM_BASE_URL).rstrip('/')}/v1/messages"
+        self.model = model or Config.LLM_MODEL
+        self.timeout = timeout or Config.LLM_TIMEOUT
+        self.max_tokens = max_tokens or Config.LLM_MAX_TOKENS
+        self.api_key = api_key or Config.LLM_API_KEY
+        concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self._slots = threading.BoundedSemaphore(concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "x-api-key": self.api_key or "",
+            "anthropic-version": Config.LLM_API_VERSION,
+            "content-type": "application/json",
+        })
+
+    def _body(self, prompt: str) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+
+    def generate_text(self, prompt: str) -> str:
+        # A buffered request cannot be interrupted; it is bounded by self.timeout
+        if current_token().cancelled:
+            return CANCELLED_RESPONSE
+        logger.info(f"LLM API received prompt length: {len(prompt)}", extra=STEP_LOG)
+        body = self._body(prompt)
+
+        try:
+            with self._slots:
+                response = get_recorder().http_request(
+                    "llm_http", "POST", self.url, json_body=body, session=self.session, timeout=self.timeout
+                )
+
+            if response.status_code != 200:
+                logger.error(f"LLM API Error: {response.status_code} - {response.text}")
+                return f"Error calling LLM API: {response.status_code} {response.text}"
+
+            data = response.json()
+            return "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text").strip()
+
+        except Exception as e:
+            logger.error(f"Error calling LLM API: {e}")
+            return f"Error: {e}"
+
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """
+        Streams text deltas from the server-sent events of a `"stream": true` request.
+        Closing the generator early, or cancelling the run, closes the response,
+        so the model stops generating.
+        Recorded/replayed runs use the buffered call (archives hold whole responses).
+        """
+        token = current_token()
+        if token.cancelled:
+            return
+        if get_recorder().mode != "live":
+            yield self.generate_text(prompt)
+            return
+
+        logger.info(f"LLM API received streaming prompt length: {len(prompt)}", extra=STEP_LOG)
+        body = self._body(prompt)
+        body["stream"] = True
+
+        with self._slots:
+            try:
+                response = self.session.post(self.url, json=body, timeout=self.timeout, stream=True)
+            except Exception as e:
+                logger.error(f"Error calling LLM API: {e}")
+                yield f"Error: {e}"
+                return
+
+            try:
+                if response.status_code != 200:
+                    logger.error(f"LLM API Error: {response.status_code} - {response.text}")
+                    yield f"Error calling LLM API: {response.status_code} {response.text}"
+                    return
+
+                with token.on_cancel(response.close):
+                    yield from self._iter_text(response, token)
+            finally:
+                response.close()
+
+    @staticmethod
+    def _iter_text(response, token) -> Iterator[str]:
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):].strip())
+                if event.get("type") == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    yield event["delta"]["text"]
+                elif event.get("type") == "error":
+                    logger.error(f"LLM API stream error: {event.get('error')}")
+                    yield f"Error calling LLM API: {event.get('error')}"
+                    return
+                elif event.get("type") == "message_stop":
+                    return
+        except Exception:
+            # Closing the response from another thread breaks the read
+            if not token.cancelled:
+                raise
+
+    def close(self):
+        self.session.close()
+
+class CachingLLMClient(BaseLLMClient):
+    """
+    Serves repeated prompts from the shared "llm" cache namespace.
+    Concurrent identical prompts reach the wrapped client once; error
+    responses are not cached.
+    """
+    def __init__(self, inner: BaseLLMClient, namespace: Optional[str] = None, provider: Optional[str] = None):
+        self.inner = inner
+        self.cache = get_cache(namespace or "llm")
+        # Provider and model are part of the key, so switching either never serves stale answers
+        self.key_prefix = f"{(provider or Config.LLM_PROVIDER).lower()}|{getattr(inner, 'model', '') or ''}|"
+
+    def _key(self, prompt: str) -> str:
+        return hashlib.sha1((self.key_prefix + prompt).encode()).hexdigest()
+
+    @staticmethod
+    def _cacheable(text: str) -> bool:
+        return bool(text) and not text.startswith("Error")
+
+    def generate_text(self, prompt: str) -> str:
+        response = {}
+
+        def compute():
+            response["text"] = self.inner.generate_text(prompt)
+            # None tells the cache not to store it; the caller still gets the error text
+            return response["text"] if self._cacheable(response["text"]) else None
+
+        value, cached = self.cache.get_or_compute(self._key(prompt), compute)
+        if cached:
+            logger.info(f"LLM cache hit for prompt length: {len(prompt)}", extra=STEP_LOG)
+        return value if value is not None else response["text"]
+
+    def cached_text(self, prompt: str) -> Optional[str]:
+        return self.cache.get(self._key(prompt))
+
+    def store_text(self, prompt: str, text: str):
+        self._store(self._key(prompt), text)
+
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"LLM cache hit for prompt length: {len(prompt)}", extra=STEP_LOG)
+            yield cached
+            return
+
+        chunks = []
+        token = current_token()
+        stream = self.inner.stream_text(prompt)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # The caller stopped early (e.g. once it had the field it needed, or the
+            # run was cancelled): stop generating, and leave the partial response uncached.
+            # Callers store the fields they used instead (see BaseAgent._cache_fields).
+            stream.close()
+            raise
+        # A cancelled stream may have stopped part-way
+        if not token.cancelled:
+            self._store(key, "".join(chunks))
+
+    def _store(self, key: str, text: str):
+        if self._cacheable(text):
+            self.cache.put(key, text)
+
+_clients: Dict[tuple, BaseLLMClient] = {}
+_clients_lock = threading.Lock()
+
 def get_llm_client() -> BaseLLMClient:
+    """
+    Returns the process-wide LLM client for the current settings, built on
+    first use and shared by all agents (clients are thread-safe).
+    """
+    key = (Config.LLM_PROVIDER.lower(), Config.LLM_CACHE_ENABLED, Config.CACHE_DIR)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = build_llm_client()
+            _clients[key] = client
+        return client
+
+def build_llm_client(provider: Optional[str] = None, model: Optional[str] = None,
+                     timeout: Optional[float] = None, concurrency: Optional[int] = None) -> BaseLLMClient:
+    """
+    A new client for `provider` (default LLM_PROVIDER), wrapped in the response
+    cache when it is enabled. Unset options use the provider's defaults.
+    """
     # Default to ClaudeCLIClient as per new requirements
     # But we can check LLM_PROVIDER if we want to keep flexibility
-    provider = Config.LLM_PROVIDER.lower()
+    provider = (provider or Config.LLM_PROVIDER).lower()
     
     if provider == "mock":
-        return MockLLMClient()
-    
-    # Default to Claude CLI
-    return ClaudeCLIClient()
+        client = MockLLMClient(model=model)
+    elif provider in ("anthropic", "http"):
+        client = AnthropicHTTPClient(model=model, timeout=timeout, max_concurrency=concurrency)
+    else:
+        # Default to Claude CLI
+        client = ClaudeCLIClient(model=model, timeout=timeout)
+
+    if Config.LLM_CACHE_ENABLED:
+        return CachingLLMClient(client, provider=provider)
+    return client
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from config import Config
+from core.budget import CHARS_PER_TOKEN
+from utils.cancellation import POLL_SECONDS, CancellationToken
+from utils.llm_client import BaseLLMClient, build_llm_client
+from utils.logger import setup_logger
+
+logger = setup_logger("LLMRouter")
+
+# Task classes, declared by each LLM call site
+QUERY = "query"    # ContentAgent's first call: only needs to emit {"search_query": ...}
+SELECT = "select"  # ContentAgent's pick from the search results
+JUDGE = "judge"    # JudgeAgent's decision
+TASKS = (QUERY, SELECT, JUDGE)
+
+# Latencies kept per tier for the percentiles
+LATENCY_SAMPLES = 1000
+
+
+@dataclass(frozen=True)
+class TierSettings:
+    provider: str = ""
+    model: str = ""
+    timeout: float = 0.0
+    concurrency: int = 0
+    cost_per_mtok: float = 0.0
+
+    @classmethod
+    def from_config(cls, task: str) -> "TierSettings":
+        prefix = f"LLM_{task.upper()}_"
+        return cls(
+            provider=getattr(Config, prefix + "PROVIDER").lower(),
+            model=getattr(Config, prefix + "MODEL"),
+            timeout=getattr(Config, prefix + "TIMEOUT"),
+            concurrency=getattr(Config, prefix + "CONCURRENCY"),
+            cost_per_mtok=getattr(Config, prefix + "COST_PER_MTOK"),
+        )
+
+    @property
+    def dedicated(self) -> bool:
+        """
+        Whether the tier needs a client of its own (otherwise the shared one is used).
+        """
+        return bool(self.provider or self.model or self.timeout)
+
+
+class _TierStats:
+    def __init__(self):
+        self.calls = 0
+        self.cached = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.prompt_chars = 0
+        self.output_chars = 0
+        self.latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+
+    COUNTERS = ("calls", "cached", "errors", "seconds", "prompt_chars", "output_chars")
+
+    def copy(self) -> "_TierStats":
+        copy = _TierStats()
+        for name in self.COUNTERS:
+            setattr(copy, name, getattr(self, name))
+        copy.latencies.extend(self.latencies)
+        return copy
+
+    def since(self, earlier: "_TierStats") -> "_TierStats":
+        """
+        What was recorded after `earlier` (a copy of these stats).
+        """
+        diff = _TierStats()
+        for name in self.COUNTERS:
+            setattr(diff, name, getattr(self, name) - getattr(earlier, name))
+        # One latency per call, newest last
+        if diff.calls > 0:
+            diff.latencies.extend(list(self.latencies)[-diff.calls:])
+        return diff
+
+
+class LLMRouter:
+    """
+    Maps each task class to its LLM client, concurrency limit and stats.
+
+    Tiers without their own provider/model/timeout return None from client(),
+    and the caller uses the shared get_llm_client(). A concurrency limit
+    applies either way, so e.g. judge calls cannot crowd out query calls.
+    """
+    def __init__(self, tiers: Optional[Dict[str, TierSettings]] = None):
+        self.tiers = tiers or {task: TierSettings.from_config(task) for task in TASKS}
+        self._lock = threading.Lock()
+        self._clients: Dict[str, BaseLLMClient] = {}
+        self._slots = {task: threading.BoundedSemaphore(settings.concurrency)
+                       for task, settings in self.tiers.items() if settings.concurrency > 0}
+        self._stats = {task: _TierStats() for task in self.tiers}
+
+    def provider(self, task: str) -> str:
+        return self.tiers[task].provider or Config.LLM_PROVIDER.lower()
+
+    def client(self, task: str) -> Optional[BaseLLMClient]:
+        settings = self.tiers[task]
+        if not settings.dedicated:
+            return None
+        with self._lock:
+            client = self._clients.get(task)
+            if client is None:
+                client = build_llm_client(settings.provider or None, settings.model or None,
+                                          settings.timeout or None, settings.concurrency or None)
+                logger.info(f"LLM tier '{task}': {self.provider(task)} {settings.model or '(default model)'}")
+                self._clients[task] = client
+            return client
+
+    def acquire(self, task: str, token: CancellationToken) -> bool:
+        """
+        Waits for a free slot in the tier; False if the run was cancelled meanwhile.
+        """
+        slots = self._slots.get(task)
+        if slots is None:
+            return not token.cancelled
+        while not token.cancelled:
+            if slots.acquire(timeout=POLL_SECONDS):
+                return True
+        return False
+
+    def release(self, task: str):
+        slots = self._slots.get(task)
+        if slots is not None:
+            slots.release()
+
+    def record(self, task: str, seconds: float, prompt_chars: int, output_chars: int, error: bool = False):
+        with self._lock:
+            stats = self._stats[task]
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.seconds += seconds
+            stats.prompt_chars += prompt_chars
+            stats.output_chars += output_chars
+            stats.latencies.append(seconds)
+
+    def record_cached(self, task: str):
+        with self._lock:
+            self._stats[task].cached += 1
+
+    def snapshot(self) -> Dict[str, _TierStats]:
+        """
+        A copy of the per-tier stats, for summary(since=...) to report one trip.
+        """
+        with self._lock:
+            return {task: stats.copy() for task, stats in self._stats.items()}
+
+    def summary(self, since: Optional[Dict[str, _TierStats]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-tier calls, latency (ms) and estimated tokens/cost, for tiers that were used
+        (since the snapshot() `since`, if given).
+        """
+        summary = {}
+        with self._lock:
+            for task, stats in self._stats.items():
+                if since and task in since:
+                    stats = stats.since(since[task])
+                if not (stats.calls or stats.cached):
+                    continue
+                settings = self.tiers[task]
+                latencies = sorted(stats.latencies)
+                tokens = (stats.prompt_chars + stats.output_chars) // CHARS_PER_TOKEN
+                summary[task] = {
+                    "provider": self.provider(task),
+                    "model": settings.model or None,
+                    "calls": stats.calls,
+                    "cached": stats.cached,
+                    "errors": stats.errors,
+                    "mean_ms": round(1000 * stats.seconds / stats.calls, 1) if stats.calls else 0.0,
+                    "p50_ms": round(1000 * latencies[len(latencies) // 2], 1) if latencies else 0.0,
+                    "p95_ms": round(1000 * latencies[int(len(latencies) * 0.95)], 1) if latencies else 0.0,
+                    "estimated_tokens": tokens,
+                    "estimated_cost": round(tokens * settings.cost_per_mtok / 1e6, 4) if settings.cost_per_mtok else None,
+                }
+        return summary
+
+
+_routers: Dict[tuple, LLMRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_llm_router() -> LLMRouter:
+    """
+    Returns the process-wide router for the current settings (like get_llm_client()).
+    """
+    key = (tuple(TierSettings.from_config(task) for task in TASKS),
+           Config.LLM_PROVIDER.lower(), Config.LLM_CACHE_ENABLED, Config.CACHE_DIR)
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = LLMRouter()
+            _routers[key] = router
+        return router
@@ -1,36 +1,208 @@
+import atexit
+import itertools
 import logging
 import sys
 import queue
-from logging.handlers import QueueHandler
+import threading
+import weakref
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional, Tuple
+from config import Config
 
-# Global log queue for UI
-log_queue = queue.Queue()
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
-def setup_logger(name: str, level=logging.INFO):
+# Pass as `extra=STEP_LOG` on chatty per-step messages so they can be
+# sampled or gated by level without touching the important ones.
+STEP_LOG = {"per_step": True}
+
+# Bounded hand-off queue between the logging call sites and the listener thread.
+# When it is full, records are dropped (and counted) instead of growing memory.
+_record_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+# Weak so that a finished run's buffer is freed together with its engine
+_buffers: "weakref.WeakSet[LogBuffer]" = weakref.WeakSet()
+_buffers_lock = threading.Lock()
+_context = threading.local()
+_dropped = itertools.count(1)
+_dropped_total = 0
+
+
+class LogBuffer:
+    """
+    Bounded ring buffer of formatted log lines for a single engine run.
+    Only records emitted from threads bound to `run_id` are kept
+    (all records if `run_id` is None).
+    """
+    def __init__(self, run_id: Optional[str] = None, maxlen: Optional[int] = None):
+        self.run_id = run_id
+        self._lines: deque = deque(maxlen=maxlen or Config.LOG_BUFFER_SIZE)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, line: str):
+        with self._lock:
+            self._lines.append((self._seq, line))
+            self._seq += 1
+
+    def lines(self, last: Optional[int] = None) -> List[str]:
+        with self._lock:
+            items = list(self._lines)
+        if last is not None:
+            items = items[-last:]
+        return [line for _, line in items]
+
+    def since(self, seq: int) -> Tuple[int, List[str]]:
+        """
+        Returns (next_seq, lines appended at or after `seq`) for incremental readers.
+        """
+        with self._lock:
+            return self._seq, [line for s, line in self._lines if s >= seq]
+
+
+def bind_run(run_id: Optional[str]):
+    """
+    Tags every record logged from the current thread with `run_id`.
+    """
+    _context.run_id = run_id
+
+
+def current_run_id() -> Optional[str]:
+    return getattr(_context, "run_id", None)
+
+
+def attach_log_buffer(buffer: LogBuffer) -> LogBuffer:
+    _ensure_listener()
+    with _buffers_lock:
+        _buffers.add(buffer)
+    return buffer
+
+
+def detach_log_buffer(buffer: LogBuffer):
+    with _buffers_lock:
+        _buffers.discard(buffer)
+
+
+def dropped_records() -> int:
+    """
+    Number of records dropped because the log queue was full.
+    """
+    return _dropped_total
+
+
+class _HotPathQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them; the listener thread formats.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.run_id = current_run_id()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        global _dropped_total
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped_total = next(_dropped)
+
+
+def resolve_level(name: str) -> int:
+    """
+    The numeric logging level for a name such as "info" (or a number such as "15").
+    """
+    name = name.strip().upper()
+    if name.isdigit():
+        return int(name)
+    # getLevelName returns the string "Level X" for unknown names
+    level = logging.getLevelName(name)
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level {name!r}")
+    return level
+
+
+class _StepSampler(logging.Filter):
+    """
+    Applies level gating and 1-in-k sampling to records tagged with STEP_LOG.
+    Warnings and errors always pass.
+    """
+    def __init__(self, min_level: str):
+        super().__init__()
+        self.min_level = resolve_level(min_level)
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "per_step", False) or record.levelno >= logging.WARNING:
+            return True
+        if record.levelno < self.min_level:
+            return False
+        every = max(1, Config.LOG_STEP_SAMPLE_EVERY)
+        return next(self._counter) % every == 0
+
+
+class _ConsoleHandler(logging.StreamHandler):
+    """
+    Writes to whatever sys.stdout currently is (it may be swapped by test runners).
+    """
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _BufferFanoutHandler(logging.Handler):
+    """
+    Runs on the listener thread and copies formatted lines into the attached run buffers.
+    """
+    def emit(self, record: logging.LogRecord):
+        with _buffers_lock:
+            buffers = list(_buffers)
+        if not buffers:
+            return
+        line = self.format(record)
+        run_id = getattr(record, "run_id", None)
+        for buffer in buffers:
+            if buffer.run_id is None or buffer.run_id == run_id:
+                buffer.append(line)
+
+
+def _ensure_listener():
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        formatter = logging.Formatter(LOG_FORMAT)
+
+        console_handler = _ConsoleHandler()
+        console_handler.setFormatter(formatter)
+
+        buffer_handler = _BufferFanoutHandler()
+        buffer_handler.setFormatter(formatter)
+
+        _listener = QueueListener(_record_queue, console_handler, buffer_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+_queue_handler = _HotPathQueueHandler(_record_queue)
+_queue_handler.addFilter(_StepSampler(Config.LOG_STEP_MIN_LEVEL))
+
+
+def setup_logger(name: str, level=None):
     """
     Sets up a logger with the specified name and level.
+    Safe to call repeatedly: handlers are only attached once.
     """
+    _ensure_listener()
     logger = logging.getLogger(name)
-    logger.setLevel(level)
-    
-    # Create formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-    # Console Handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level) # Set level for console handler
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Queue Handler for UI
-    queue_handler = QueueHandler(log_queue)
-    queue_handler.setLevel(level) # Set level for queue handler
-    queue_handler.setFormatter(formatter)
-    logger.addHandler(queue_handler)
-    
-    # The original check `if not logger.handlers:` is now redundant as handlers are added unconditionally.
-    # If the intent was to prevent duplicate handlers on subsequent calls,
-    # a more robust check would be needed, e.g., checking handler types.
-    # For now, we'll remove the old conditional add and ensure handlers are added.
-        
+    logger.setLevel(level if level is not None else Config.LOG_LEVEL.upper())
+
+    if _queue_handler not in logger.handlers:
+        logger.addHandler(_queue_handler)
+        # Records are handled by our listener; don't duplicate them via the root logger
+        logger.propagate = False
+
     return logger
@@ -0,0 +1,196 @@
+import hashlib
+import random
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config import Config
+from utils.logger import setup_logger, STEP_LOG
+
+logger = setup_logger("QuerySimilarity")
+
+# Words that do not change what a search query is about
+STOPWORDS = frozenset("""
+a about an and are as at be by for from how in into is it its near of on or the this to what when where which who
+why with
+""".split())
+
+_WORD = re.compile(r"[^\W_]+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def query_tokens(query: str) -> List[str]:
+    """
+    Lower-cased words without stopwords, deduplicated and sorted, so case,
+    filler words and word order do not matter.
+    """
+    return sorted({word for word in _WORD.findall(query.lower()) if word not in STOPWORDS})
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query_tokens(query))
+
+
+def shingles(tokens: List[str], k: int = 3) -> Set[str]:
+    """
+    Character k-grams of each (padded) token, so "museum" and "museums" still overlap.
+    """
+    grams = set()
+    for token in tokens:
+        padded = f"#{token}#"
+        grams.update(padded[i:i + k] for i in range(max(1, len(padded) - k + 1)))
+    return grams
+
+
+class MinHasher:
+    """
+    MinHash signatures: the share of equal positions in two signatures
+    estimates the Jaccard similarity of the two shingle sets.
+    """
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, grams: Set[str]) -> Tuple[int, ...]:
+        if not grams:
+            return (_MAX_HASH,) * self.num_perm
+        hashes = [int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "little") for g in grams]
+        return tuple(min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in self._perms)
+
+    @staticmethod
+    def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+        return sum(x == y for x, y in zip(a, b)) / len(a) if a else 0.0
+
+
+@dataclass(frozen=True)
+class QueryMatch:
+    query: str          # The indexed query whose results can be reused
+    similarity: float   # Estimated Jaccard similarity (1.0 for the same normalised form)
+
+
+class QueryIndex:
+    """
+    Finds an earlier query that is close enough to a new one to share its results.
+
+    Queries with the same normalised form (see normalize_query) always match.
+    Otherwise MinHash signatures are bucketed by LSH bands of `num_perm / bands`
+    rows, and candidates from shared buckets match when their estimated
+    similarity is at least `threshold`. At most `max_entries` queries are
+    kept, oldest dropped first.
+    """
+    def __init__(self, name: str = "", threshold: Optional[float] = None, num_perm: Optional[int] = None,
+                 bands: Optional[int] = None, max_entries: Optional[int] = None):
+        self.name = name
+        self.threshold = Config.SEARCH_SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.hasher = MinHasher(num_perm or Config.SEARCH_SIMILARITY_PERMUTATIONS)
+        self.bands = bands or Config.SEARCH_SIMILARITY_BANDS
+        self.rows = max(1, self.hasher.num_perm // self.bands)
+        self.max_entries = max_entries or Config.SEARCH_SIMILARITY_MAX_ENTRIES
+        self._lock = threading.Lock()
+        # normalised form -> (representative query, signature), oldest first
+        self._entries: "OrderedDict[str, Tuple[str, Tuple[int, ...]]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self.lookups = 0
+        self.exact = 0
+        self.near = 0
+        # Best candidate similarity per lookup, in tenths, for tuning the threshold
+        self.best_similarity: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, query: str):
+        normalized = normalize_query(query)
+        with self._lock:
+            if normalized in self._entries:
+                return
+        signature = self.hasher.signature(shingles(normalized.split()))
+        with self._lock:
+            if normalized in self._entries:
+                return
+            self._entries[normalized] = (query, signature)
+            for bucket in self._bands(signature):
+                self._buckets.setdefault(bucket, set()).add(normalized)
+            while len(self._entries) > self.max_entries:
+                oldest, (_, old_signature) = self._entries.popitem(last=False)
+                for bucket in self._bands(old_signature):
+                    members = self._buckets.get(bucket)
+                    if members is not None:
+                        members.discard(oldest)
+                        if not members:
+                            del self._buckets[bucket]
+
+    def match(self, query: str) -> Optional[QueryMatch]:
+        normalized = normalize_query(query)
+        with self._lock:
+            self.lookups += 1
+            entry = self._entries.get(normalized)
+            if entry is not None:
+                self.exact += 1
+                self.best_similarity[10] += 1
+                return QueryMatch(entry[0], 1.0)
+        signature = self.hasher.signature(shingles(normalized.split()))
+        with self._lock:
+            candidates = set()
+            for bucket in self._bands(signature):
+                candidates |= self._buckets.get(bucket, set())
+            best, best_similarity = None, 0.0
+            for candidate in candidates:
+                similarity = self.hasher.similarity(signature, self._entries[candidate][1])
+                if similarity > best_similarity:
+                    best, best_similarity = candidate, similarity
+            self.best_similarity[int(best_similarity * 10)] += 1
+            if best is None or best_similarity < self.threshold:
+                if best is not None:
+                    logger.debug(f"No {self.name} match for '{query}': best '{best}' at {best_similarity:.2f}")
+                return None
+            self.near += 1
+            representative = self._entries[best][0]
+        logger.info(f"{self.name} query '{query}' matched '{representative}' (similarity {best_similarity:.2f})",
+                    extra=STEP_LOG)
+        return QueryMatch(representative, best_similarity)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            matched = self.exact + self.near
+            return {
+                "name": self.name,
+                "threshold": self.threshold,
+                "queries": len(self._entries),
+                "lookups": self.lookups,
+                "exact": self.exact,
+                "near": self.near,
+                "match_rate": round(matched / self.lookups, 3) if self.lookups else 0.0,
+                # "0.7" -> lookups whose best candidate scored in [0.7, 0.8)
+                "best_similarity": {f"{tenth / 10:.1f}": n for tenth, n in sorted(self.best_similarity.items())},
+            }
+
+
+_indexes: Dict[Tuple[str, str], QueryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_query_index(name: str) -> QueryIndex:
+    """
+    The process-wide index for one kind of search ("web", "video").
+    """
+    key = (name, Config.CACHE_DIR)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = QueryIndex(name)
+            _indexes[key] = index
+        return index
+
+
+def query_index_summaries() -> List[Dict[str, Any]]:
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    return [index.summary() for index in indexes if index.lookups]
@@ -0,0 +1,257 @@
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional
+import requests
+from config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger("TrafficRecorder")
+
+# Query parameters that must never end up in a fixture archive.
+# Headers (which carry the Brave token) are not recorded at all.
+SECRET_PARAMS = {"api_key", "key", "token"}
+
+
+class ReplayMissError(Exception):
+    """
+    Raised in replay mode when a request has no recorded response.
+    """
+
+
+class RecordedResponse:
+    """
+    Minimal stand-in for `requests.Response` served from a fixture archive.
+    """
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class TrafficRecorder:
+    """
+    Record/replay transport for the external dependencies (ORS, Brave, Claude CLI).
+
+    - live:   calls go straight through.
+    - record: calls go through and each request/response pair is captured with
+              its latency, then written to a gzipped JSONL archive.
+    - replay: calls are served from the archive. With timing="original" each
+              response is delayed by its recorded latency, with "fast" it is
+              returned immediately.
+    """
+    def __init__(self, mode: str = "live", archive_path: Optional[str] = None, timing: str = "fast"):
+        if mode not in ("live", "record", "replay"):
+            raise ValueError(f"Unknown traffic mode: {mode}")
+        if mode != "live" and not archive_path:
+            raise ValueError(f"Traffic mode '{mode}' requires an archive path.")
+
+        self.mode = mode
+        self.archive_path = archive_path
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._replay: Dict[str, deque] = {}
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.recorded_calls: Dict[str, int] = defaultdict(int)
+        self.recorded_seconds: Dict[str, float] = defaultdict(float)
+        self.misses = 0
+
+        if mode == "replay":
+            self._load()
+
+    # ------------------------------------------------------------------ keys
+
+    @staticmethod
+    def _key(channel: str, request: Dict[str, Any]) -> str:
+        payload = json.dumps([channel, request], sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _redact(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {k: v for k, v in (params or {}).items() if k.lower() not in SECRET_PARAMS}
+
+    # --------------------------------------------------------------- archive
+
+    def _load(self):
+        if not os.path.exists(self.archive_path):
+            raise FileNotFoundError(f"Fixture archive not found: {self.archive_path}")
+        with gzip.open(self.archive_path, "rt") as f:
+            for line in f:
+                entry = json.loads(line)
+                self._replay.setdefault(entry["key"], deque()).append(entry)
+                self.recorded_calls[entry["channel"]] += 1
+                self.recorded_seconds[entry["channel"]] += entry["latency"]
+        logger.info(f"Loaded {sum(self.recorded_calls.values())} recorded calls from {self.archive_path}")
+
+    def save(self):
+        """
+        Writes all captured calls to the archive (record mode only).
+        """
+        if self.mode != "record":
+            return
+        with self._lock:
+            entries = list(self._entries)
+        directory = os.path.dirname(self.archive_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(self.archive_path, "wt") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        logger.info(f"Saved {len(entries)} recorded calls to {self.archive_path}")
+
+    # ------------------------------------------------------------ transport
+
+    def _call(self, channel: str, request: Dict[str, Any], live_call) -> Dict[str, Any]:
+        """
+        Runs (or replays) one call. `live_call` returns a JSON-serialisable dict.
+        """
+        with self._lock:
+            self.calls[channel] += 1
+
+        if self.mode == "live":
+            return live_call()
+
+        key = self._key(channel, request)
+
+        if self.mode == "record":
+            start = time.perf_counter()
+            response = live_call()
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._entries.append({
+                    "channel": channel,
+                    "key": key,
+                    "request": request,
+                    "response": response,
+                    "latency": round(latency, 4)
+                })
+                self.recorded_calls[channel] += 1
+                self.recorded_seconds[channel] += latency
+            return response
+
+        # Replay: serve recordings for this key in order, then keep repeating the last one
+        with self._lock:
+            pending = self._replay.get(key)
+            if pending:
+                entry = pending.popleft()
+                self._last[key] = entry
+            else:
+                entry = self._last.get(key)
+            if entry is None:
+                self.misses += 1
+
+        if entry is None:
+            raise ReplayMissError(f"No recorded {channel} response for request {request}")
+
+        if self.timing == "original" and entry["latency"] > 0:
+            time.sleep(entry["latency"])
+        return entry["response"]
+
+    def http_request(self, channel: str, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                     json_body: Optional[Any] = None, headers: Optional[Dict[str, str]] = None,
+                     session: Optional[requests.Session] = None, **kwargs) -> Any:
+        """
+        Drop-in replacement for `requests.request` (or `session.request`).
+        Returns the real response in live mode and a RecordedResponse otherwise.
+        """
+        sender = session or requests
+        request = {"method": method, "url": url, "params": self._redact(params)}
+        if json_body is not None:
+            request["json"] = json_body
+
+        if self.mode == "live":
+            with self._lock:
+                self.calls[channel] += 1
+            return sender.request(method, url, params=params, json=json_body, headers=headers, **kwargs)
+
+        def live_call():
+            response = sender.request(method, url, params=params, json=json_body, headers=headers, **kwargs)
+            return {"status_code": response.status_code, "text": response.text}
+
+        response = self._call(channel, request, live_call)
+        return RecordedResponse(response["status_code"], response["text"])
+
+    def http_get(self, channel: str, url: str, params: Optional[Dict[str, Any]] = None,
+                 headers: Optional[Dict[str, str]] = None, **kwargs) -> Any:
+        """
+        Drop-in replacement for `requests.get`.
+        """
+        return self.http_request(channel, "GET", url, params=params, headers=headers, **kwargs)
+
+    def run_command(self, channel: str, args: List[str], runner=None, **kwargs) -> subprocess.CompletedProcess:
+        """
+        Drop-in replacement for `subprocess.run(..., capture_output=True, text=True)`.
+        `runner(args, **kwargs)` can stand in for subprocess.run (e.g. a warm
+        session pool); it is keyed and recorded the same way.
+        """
+        request = {"args": list(args)}
+
+        def live_call():
+            if runner is not None:
+                result = runner(args, **kwargs)
+            else:
+                result = subprocess.run(args, capture_output=True, text=True, **kwargs)
+            return {"returncode": result.returncode, "stdout": result.stdout, "stderr": result.stderr}
+
+        response = self._call(channel, request, live_call)
+        return subprocess.CompletedProcess(args, response["returncode"], response["stdout"], response["stderr"])
+
+    # ---------------------------------------------------------------- stats
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Call counts and time spent per channel, for comparing a replayed run
+        against the recording.
+        """
+        channels = sorted(set(self.calls) | set(self.recorded_calls))
+        return {
+            "mode": self.mode,
+            "timing": self.timing,
+            "misses": self.misses,
+            "channels": {
+                channel: {
+                    "calls": self.calls.get(channel, 0),
+                    "recorded_calls": self.recorded_calls.get(channel, 0),
+                    "recorded_seconds": round(self.recorded_seconds.get(channel, 0.0), 3)
+                }
+                for channel in channels
+            }
+        }
+
+
+_recorder: Optional[TrafficRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> TrafficRecorder:
+    """
+    Returns the process-wide recorder configured from TRAFFIC_* settings.
+    """
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TrafficRecorder(Config.TRAFFIC_MODE, Config.TRAFFIC_ARCHIVE, Config.TRAFFIC_REPLAY_TIMING)
+            if _recorder.mode == "record":
+                atexit.register(_recorder.save)
+        return _recorder
+
+
+def set_recorder(recorder: TrafficRecorder) -> TrafficRecorder:
+    """
+    Installs a recorder explicitly (used by main.py flags and tests).
+    The caller is responsible for calling `save()` in record mode.
+    """
+    global _recorder
+    with _recorder_lock:
+        _recorder = recorder
+    return recorder